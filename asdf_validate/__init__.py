@@ -0,0 +1,19 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Validator for ASDF files.
+
+    >>> from asdf_validate import Validator  # doctest: +SKIP
+    >>> Validator().validate("seismo.h5").is_valid  # doctest: +SKIP
+    True
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from .report import Finding, ValidationReport  # NOQA
+from .validator import Validator, check  # NOQA
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Backends used by the validator to access HDF5 files.
+
+Each backend offers the same set of methods. The default one shells out to
+the ``h5dump`` and ``h5ls`` programs, the ``h5py`` backend does everything
+in-process.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+
+class HDF5Backend(object):
+    """
+    Interface of all HDF5 backends.
+
+    Subclasses set ``_module`` to a module implementing the functions of
+    :mod:`asdf_validate.h5dump_wrapper` - the methods just forward to it.
+    """
+    name = None
+
+    @property
+    def _module(self):
+        raise NotImplementedError
+
+    def is_hdf5_file(self, filename):
+        return self._module.is_hdf5_file(filename)
+
+    def get_header_as_dict(self, filename):
+        """
+        The structure of the file in the form expected by the JSON schemas.
+        """
+        return self._module.get_header_as_dict(filename)
+
+    def get_string_attribute(self, filename, path):
+        return self._module.get_string_attribute(filename, path)
+
+    def get_float_attribute(self, filename, path):
+        return self._module.get_float_attribute(filename, path)
+
+    def get_attributes(self, filename, groups):
+        """
+        The values of all attributes of all objects in the given groups.
+        """
+        return self._module.get_attributes(filename, groups)
+
+    def read_array(self, filename, dataset_name):
+        """
+        The raw bytes of a dataset, read straight into memory.
+        """
+        return self._module.read_array(filename, dataset_name)
+
+    def iter_array(self, filename, dataset_name, dtype, chunk_size):
+        """
+        The data of a dataset as NumPy arrays of at most ``chunk_size``
+        bytes. ``dtype`` is the type of the data in the file.
+        """
+        return self._module.iter_array(filename, dataset_name, dtype,
+                                       chunk_size)
+
+    def dump_array_to_file(self, filename, dataset_name, output_file):
+        return self._module.dump_array_to_file(filename, dataset_name,
+                                               output_file)
+
+
+class H5DumpBackend(HDF5Backend):
+    """
+    Backend calling the ``h5dump`` and ``h5ls`` command line programs.
+    """
+    name = "h5dump"
+
+    @property
+    def _module(self):
+        from . import h5dump_wrapper
+        return h5dump_wrapper
+
+
+class H5pyBackend(HDF5Backend):
+    """
+    In-process backend using h5py.
+    """
+    name = "h5py"
+
+    @property
+    def _module(self):
+        from . import h5py_wrapper
+        return h5py_wrapper
+
+
+BACKENDS = {
+    "h5dump": H5DumpBackend,
+    "h5py": H5pyBackend
+}
+
+
+def get_backend(name):
+    """
+    Get an instance of the backend with the given name.
+    """
+    if name not in BACKENDS:
+        raise ValueError("Unknown backend '%s'. Known backends: %s" % (
+            name, ", ".join(sorted(BACKENDS.keys()))))
+    return BACKENDS[name]()
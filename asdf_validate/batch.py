@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Validate many ASDF files in a single invocation.
+
+The files are distributed across a pool of worker processes which stay alive
+for the whole run so interpreter startup, imports and schema loading are only
+paid once per worker. Each result is written as one line of JSON (NDJSON) as
+soon as it is available.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import contextlib
+import fnmatch
+import functools
+import io
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+
+def _exit(signum, frame):
+    sys.exit(0)
+
+
+@contextlib.contextmanager
+def exit_on_sigterm():
+    """
+    Turn SIGTERM, e.g. sent by a service manager, into a normal exit so
+    long running modes clean up. Only works in the main thread.
+    """
+    previous = signal.signal(signal.SIGTERM, _exit)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+
+
+def find_files(paths, file_list=None, recursive=False, pattern="*.h5"):
+    """
+    Assemble the list of files to validate.
+
+    :param paths: Files or, if ``recursive`` is set, directories.
+    :param file_list: Optional file containing one path per line. ``-``
+        reads the list from stdin.
+    :param recursive: Search directories recursively for files whose name
+        matches ``pattern``.
+    :param pattern: Glob pattern for files found in directories.
+    """
+    paths = list(paths)
+    if file_list:
+        if file_list == "-":
+            lines = sys.stdin.readlines()
+        else:
+            with io.open(file_list, "rt") as fh:
+                lines = fh.readlines()
+        paths.extend(_i.strip() for _i in lines if _i.strip())
+
+    filenames = []
+    for path in paths:
+        if not recursive or not os.path.isdir(path):
+            # Errors for non-existing files or directories are reported by
+            # the validation itsself.
+            filenames.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            filenames.extend(os.path.join(root, _i)
+                             for _i in sorted(fnmatch.filter(files, pattern)))
+    return filenames
+
+
+def validate_file(filename, validator=None, **kwargs):
+    """
+    Validate a single file and return the result as a dictionary.
+
+    Never raises or exits - all problems are part of the returned result.
+
+    :param validator: The :class:`~asdf_validate.validator.Validator` to
+        use. Otherwise all keyword arguments are passed to
+        :func:`~asdf_validate.validator.check`.
+    """
+    from .validator import check
+
+    start = time.time()
+    try:
+        if validator is not None:
+            report = validator.validate(filename)
+        else:
+            report = check(filename, **kwargs)
+        result = report.to_dict()
+        errors = report.errors
+        message = errors[0].message if errors else None
+        warnings = [_i.message for _i in report.warnings]
+    except Exception as e:
+        result = {"filename": filename, "valid": False, "findings": []}
+        message = "%s: %s" % (e.__class__.__name__, e)
+        warnings = []
+
+    result.update({"message": message,
+                   "warnings": warnings,
+                   "duration": round(time.time() - start, 6)})
+    return result
+
+
+def validate_files(filenames, workers=None, **kwargs):
+    """
+    Validate all files and yield the results in order of completion.
+
+    :param workers: The number of worker processes. Defaults to the number
+        of CPUs, ``1`` validates all files in the current process.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    func = functools.partial(validate_file, **kwargs)
+    if workers == 1:
+        for filename in filenames:
+            yield func(filename)
+        return
+
+    pool = multiprocessing.Pool(processes=workers)
+    try:
+        for result in pool.imap_unordered(func, filenames):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def run(filenames, output, workers=None, **kwargs):
+    """
+    Validate all files and write one JSON document per line to ``output``.
+
+    Returns the exit code of the batch run - 0 if all files are valid, 1
+    otherwise.
+    """
+    total = 0
+    invalid = 0
+    for result in validate_files(filenames, workers=workers, **kwargs):
+        total += 1
+        if not result["valid"]:
+            invalid += 1
+        output.write(json.dumps(result, sort_keys=True) + "\n")
+        output.flush()
+    sys.stderr.write("%i of %i files are valid ASDF files.\n" % (
+        total - invalid, total))
+    return 1 if invalid else 0
@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+On-disk cache of validation results.
+
+Archives are mostly appended to so most of a file is unchanged between two
+validation runs. The cache remembers
+
+* the complete report of a file, keyed by the identity of the file (path,
+  inode, size, and modification time),
+* the result of every XML document, keyed by a checksum of its content,
+
+so a re-run skips unchanged files and reuses the results of all XML
+documents validated before. Entries are stored in a SQLite database which
+can be shared by many processes. The least recently used entries are
+evicted once the cache grows beyond its maximum size.
+
+The database remembers the :func:`fingerprint` of the validator that wrote
+it - its version, its code, and its schemas - and is emptied as soon as it
+is opened by a different validator, e.g. after an upgrade fixing a check.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# Increase whenever the layout of the database changes.
+CACHE_VERSION = 1
+
+DEFAULT_MAX_SIZE = 256 * 1024 ** 2
+
+# Evict entries on the first and then after this many writes.
+_EVICTION_INTERVAL = 1000
+
+
+def default_cache_dir():
+    """
+    The default cache directory following the XDG specification.
+    """
+    return os.path.join(
+        os.environ.get("XDG_CACHE_HOME",
+                       os.path.join(os.path.expanduser("~"), ".cache")),
+        "asdf_validate")
+
+
+_FINGERPRINT = None
+
+
+def fingerprint():
+    """
+    Checksum of the version, the modules, and the schemas of the validator.
+    Results of other validators are not reused.
+    """
+    global _FINGERPRINT
+    if _FINGERPRINT is not None:
+        return _FINGERPRINT
+    import importlib.metadata
+
+    try:
+        version = importlib.metadata.version("asdf_validate")
+    except importlib.metadata.PackageNotFoundError:
+        version = "unknown"
+    sha = hashlib.sha256(version.encode())
+    # Every check and schema change - also of development versions.
+    package = os.path.dirname(os.path.abspath(__file__))
+    for root, dirs, files in os.walk(package):
+        dirs[:] = sorted(_i for _i in dirs if _i != "__pycache__")
+        for name in sorted(files):
+            if not name.endswith((".py", ".json", ".rng", ".xsd")):
+                continue
+            filename = os.path.join(root, name)
+            sha.update(os.path.relpath(filename, package).encode())
+            with open(filename, "rb") as fh:
+                sha.update(fh.read())
+    _FINGERPRINT = sha.hexdigest()
+    return _FINGERPRINT
+
+
+def file_identity(filename):
+    """
+    Identity of a file that changes whenever the file is modified.
+    """
+    stat = os.stat(filename)
+    return "%s|%i|%i|%i" % (os.path.realpath(filename), stat.st_ino,
+                            stat.st_size, stat.st_mtime_ns)
+
+
+def checksum(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ValidationCache(object):
+    """
+    Size bounded LRU cache of JSON serializable validation results.
+
+    :param cache_dir: Directory of the cache. Will be created if it does
+        not exist.
+    :param max_size: Maximum size of all cached values in bytes.
+    :param version: Values written with another version are dropped.
+        Defaults to the :func:`fingerprint` of the validator.
+    """
+    def __init__(self, cache_dir, max_size=DEFAULT_MAX_SIZE, version=None):
+        # Many processes might create it at the same time.
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._connection = sqlite3.connect(
+            os.path.join(cache_dir, "cache_v%i.sqlite" % CACHE_VERSION),
+            timeout=60.0, check_same_thread=False, isolation_level=None)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, "
+            "value TEXT, size INTEGER, atime REAL)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, "
+            "value TEXT)")
+        self.version = version or fingerprint()
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._connection.execute(
+                "SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None or row[0] != self.version:
+                self._connection.execute("DELETE FROM cache")
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('version', ?)",
+                    (self.version,))
+        except Exception:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def get(self, key):
+        """
+        Get a cached value or ``None`` if the key is not in the cache.
+        """
+        with self._lock:
+            try:
+                row = self._connection.execute(
+                    "SELECT value FROM cache WHERE key = ?",
+                    (key,)).fetchone()
+                if row is None:
+                    return None
+                self._connection.execute(
+                    "UPDATE cache SET atime = ? WHERE key = ?",
+                    (time.time(), key))
+            except sqlite3.Error:
+                # E.g. a database locked for too long - just validate.
+                return None
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        value = json.dumps(value)
+        with self._lock:
+            try:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                    (key, value, len(key) + len(value), time.time()))
+                self._writes += 1
+                if self._writes % _EVICTION_INTERVAL == 1:
+                    self._evict()
+            except sqlite3.Error:
+                # E.g. a full disk - the result is just not cached.
+                pass
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache is no larger
+        than its maximum size.
+        """
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        total = self._connection.execute(
+            "SELECT TOTAL(size) FROM cache").fetchone()[0]
+        if total <= self.max_size:
+            return
+        # Keep the most recently used entries that fit.
+        size = 0
+        keep = 0
+        for (entry_size,) in self._connection.execute(
+                "SELECT size FROM cache ORDER BY atime DESC").fetchall():
+            size += entry_size
+            if size > self.max_size:
+                break
+            keep += 1
+        self._connection.execute("DELETE FROM cache WHERE key NOT IN "
+                                 "(SELECT key FROM cache ORDER BY atime DESC "
+                                 "LIMIT ?)", (keep,))
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self._connection.close()
+
+
+class ResultMemo(object):
+    """
+    Thread-safe in-memory LRU cache of results.
+
+    Concurrent requests for the same key wait for the first one to finish
+    so every result is only computed once.
+
+    :param max_entries: Maximum number of results to keep.
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._results = collections.OrderedDict()
+        self._pending = {}
+
+    def get_or_compute(self, key, compute):
+        """
+        Get the result for the key, calling ``compute()`` if it is unknown.
+        """
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+            event = self._pending.get(key)
+            owner = event is None
+            if owner:
+                event = self._pending[key] = threading.Event()
+
+        if not owner:
+            event.wait()
+            with self._lock:
+                if key in self._results:
+                    return self._results[key]
+            # The computation failed - try again.
+            return compute()
+
+        try:
+            result = compute()
+            with self._lock:
+                self._results[key] = result
+                while len(self._results) > self.max_entries:
+                    self._results.popitem(last=False)
+            return result
+        finally:
+            with self._lock:
+                del self._pending[key]
+            event.set()
+
+
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_cache(cache_dir, max_size=DEFAULT_MAX_SIZE):
+    """
+    Get the process-wide cache for the given directory.
+
+    Returns ``None`` and warns once if the cache cannot be used, e.g.
+    because the directory cannot be created - the cache is optional and
+    must never stop a validation.
+    """
+    # SQLite connections must not be used in forked processes.
+    key = (cache_dir, os.getpid())
+    with _CACHES_LOCK:
+        if key not in _CACHES:
+            try:
+                _CACHES[key] = ValidationCache(cache_dir, max_size=max_size)
+            except (OSError, sqlite3.Error) as e:
+                sys.stderr.write("WARNING: Not using the cache in '%s': %s\n"
+                                 % (cache_dir, e))
+                _CACHES[key] = None
+        return _CACHES[key]
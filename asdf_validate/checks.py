@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Checks of the objects in an ASDF file.
+
+Once the structure of a file has been validated against the schema, all
+provenance documents, auxiliary data sets, station groups, and waveforms are
+checked in a single traversal of the header. Every check is a
+:class:`HeaderCheck` implementing the methods for the kinds of objects it
+cares about and :func:`visit` calls them for each such object. Checks
+working on many objects at once, e.g. with NumPy arrays or in a pool of
+workers, collect the objects while being visited and do the actual work in
+:meth:`HeaderCheck.finish`.
+
+Additional checks can be passed to
+:class:`~asdf_validate.validator.Validator`::
+
+    class NoZeroLengthTraces(HeaderCheck):
+        def waveform(self, station, name, path, node):
+            if not node["Dataspace"]["SimpleDataspace"]["Dimension"][
+                    "@DimSize"]:
+                self.report.error("custom", "Empty trace.", path=path)
+
+    Validator(checks=[NoZeroLengthTraces])
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import datetime
+import re
+
+from .data_checks import DEFAULT_CHUNK_SIZE, check_samples, numpy_dtype
+from .xml_validation import validate_datasets
+
+PROVENANCE_ID_PATTERN = re.compile(
+    r"^{[a-z]+://[a-z./_0-9A-Z?#&$-.+!*'\(\),]+}\w+$")
+
+
+class HeaderCheck(object):
+    """
+    Base class of all checks of the objects in a file.
+
+    The methods for the different kinds of objects are only called if a
+    subclass overrides them. A check might only see a part of a file, e.g.
+    if the file is checked by many processes.
+
+    :param report: The :class:`~asdf_validate.report.ValidationReport` the
+        findings are added to.
+    :param filename: The checked file.
+    :param backend: The backend to read more data from the file.
+    :param attributes: The attributes of all waveforms and auxiliary data
+        sets as returned by
+        :meth:`~asdf_validate.backends.HDF5Backend.get_attributes`.
+    """
+    # Profiling phase of the time spent in start() and finish().
+    phase = "objects"
+
+    def __init__(self, report, filename, backend, attributes):
+        self.report = report
+        self.filename = filename
+        self.backend = backend
+        self.attributes = attributes
+
+    def get_attribute(self, path, name):
+        """
+        Get a single attribute of an object.
+
+        Returns ``None`` and records an error if it does not exist.
+        """
+        try:
+            return self.attributes[path][name]
+        except KeyError:
+            self.report.error("attribute", "Could not find attribute '%s/%s' "
+                              "in file." % (path, name), path=path)
+
+    def start(self):
+        """
+        Called before the traversal.
+        """
+        pass
+
+    def provenance(self, name, path, node):
+        pass
+
+    def auxiliary_data(self, data_type, name, path, node):
+        pass
+
+    def station(self, station, path, node):
+        pass
+
+    def waveform(self, station, name, path, node):
+        pass
+
+    def finish(self):
+        """
+        Called after the traversal.
+        """
+        pass
+
+    def close(self):
+        """
+        Always called at the end, also if the checks stopped early, e.g.
+        at the first error. Stops all work still running in the background.
+        """
+        pass
+
+
+def _handlers(checks, name):
+    return [getattr(_i, name) for _i in checks
+            if getattr(type(_i), name) is not getattr(HeaderCheck, name)]
+
+
+def visit(checks, provenance=None, aux_group=None, wf=None):
+    """
+    Call the checks for all objects of the given parts of the header.
+
+    :param provenance: The ``datasets`` of the ``Provenance`` group.
+    :param aux_group: The ``groups`` of the ``AuxiliaryData`` group.
+    :param wf: The ``groups`` of the ``Waveforms`` group.
+    """
+    handlers = _handlers(checks, "provenance")
+    if provenance and handlers:
+        for name, node in provenance.items():
+            path = "/Provenance/" + name
+            for handler in handlers:
+                handler(name, path, node)
+
+    handlers = _handlers(checks, "auxiliary_data")
+    if aux_group and handlers:
+        for data_type, group in aux_group.items():
+            for name, node in group.get("datasets", {}).items():
+                path = "/AuxiliaryData/%s/%s" % (data_type, name)
+                for handler in handlers:
+                    handler(data_type, name, path, node)
+
+    station_handlers = _handlers(checks, "station")
+    handlers = _handlers(checks, "waveform")
+    if wf and (station_handlers or handlers):
+        for station, group in wf.items():
+            path = "/Waveforms/" + station
+            for handler in station_handlers:
+                handler(station, path, group)
+            if not handlers:
+                continue
+            for name, node in group["datasets"].items():
+                if name == "StationXML":
+                    continue
+                path = "/Waveforms/%s/%s" % (station, name)
+                for handler in handlers:
+                    handler(station, name, path, node)
+
+
+class ProvenanceCheck(HeaderCheck):
+    """
+    Validates all provenance documents against the SEIS-PROV schema.
+    """
+    phase = "provenance"
+
+    def __init__(self, report, filename, backend, attributes, registry,
+                 workers=1, executor="thread", cache=None):
+        HeaderCheck.__init__(self, report, filename, backend, attributes)
+        self.registry = registry
+        self.workers = workers
+        self.executor = executor
+        self.cache = cache
+        self._documents = []
+        self._results = None
+
+    def provenance(self, name, path, node):
+        self._documents.append((name, path))
+
+    def finish(self):
+        if not self._documents:
+            return
+        self._results = validate_datasets(
+            "Provenance", self.filename, [_i[1] for _i in self._documents],
+            backend=self.backend, registry=self.registry,
+            workers=self.workers, executor=self.executor, cache=self.cache)
+        for (doc, _), (path, errors) in zip(self._documents, self._results):
+            if not errors:
+                continue
+            self.report.error("provenance", "Validation of provenance "
+                              "document '%s' failed due to:\n\t%s" % (
+                                  doc, "\n\t".join(errors)), path=path)
+
+    def close(self):
+        if self._results is not None:
+            self._results.close()
+
+
+class AuxiliaryDataCheck(HeaderCheck):
+    """
+    Checks the provenance ids of the auxiliary data sets.
+    """
+    def auxiliary_data(self, data_type, name, path, node):
+        if "provenance_id" not in node.get("attributes", {}):
+            return
+        prov_id = self.get_attribute(path, "provenance_id")
+        if prov_id is None:
+            return
+        if PROVENANCE_ID_PATTERN.match(prov_id) is None:
+            self.report.error(
+                "provenance-id",
+                "AuxiliaryData '%s/%s' has a provenance id of '%s' "
+                "which does not match the regular expression '%s'" % (
+                    data_type, name, prov_id, PROVENANCE_ID_PATTERN.pattern),
+                path=path)
+
+
+class WaveformCheck(HeaderCheck):
+    """
+    Checks the names and attributes of the waveforms.
+
+    The times of all waveforms are checked at once at the end.
+    """
+    phase = "waveforms"
+
+    def __init__(self, report, filename, backend, attributes):
+        HeaderCheck.__init__(self, report, filename, backend, attributes)
+        self._times = []
+
+    def waveform(self, station, name, path, node):
+        # Make sure it only contains items for the correct station.
+        this_station = ".".join(name.split(".")[:2])
+        if this_station != station:
+            self.report.error(
+                "waveform-station",
+                "Station group %s contains waveform %s which is from "
+                "station %s." % (station, name, this_station),
+                path=path)
+
+        # In the file its in nanoseconds.
+        starttime = self.get_attribute(path, "starttime")
+        sampling_rate = self.get_attribute(path, "sampling_rate")
+        if starttime is not None and sampling_rate is not None:
+            self._times.append((path, name, node["Dataspace"][
+                "SimpleDataspace"]["Dimension"]["@DimSize"],
+                starttime, sampling_rate))
+
+        if "provenance_id" in node["attributes"]:
+            prov_id = self.get_attribute(path, "provenance_id")
+            if prov_id is not None and \
+                    PROVENANCE_ID_PATTERN.match(prov_id) is None:
+                self.report.error(
+                    "provenance-id",
+                    "Waveform '%s' has a provenance id of '%s' which "
+                    "does not match the regular expression '%s'" % (
+                        name, prov_id, PROVENANCE_ID_PATTERN.pattern),
+                    path=path)
+
+    def finish(self):
+        if self._times:
+            _check_times(self.report, *zip(*self._times))
+
+
+def _check_times(report, paths, names, npts, starttimes, sampling_rates):
+    """
+    Make sure the times in the names of the waveform data sets agree with
+    their attributes to within one second.
+    """
+    import numpy as np
+    from .waveform_times import check_times
+
+    bad_start, bad_end, starttimes, endtimes = check_times(
+        names, npts, starttimes, sampling_rates, tolerance=1.0)
+    for i in np.nonzero(bad_start | bad_end)[0]:
+        # Convert back to UTC for a pretty output.
+        if bad_start[i]:
+            report.error(
+                "waveform-starttime",
+                "Start time in the name of the waveform data set '%s' "
+                "differs from the start time set as an attribute [%s]. Both "
+                "have to agree within a certain tolerance" % (
+                    names[i],
+                    datetime.datetime.utcfromtimestamp(starttimes[i])),
+                path=paths[i])
+        if bad_end[i]:
+            report.error(
+                "waveform-endtime",
+                "end time in the name of the waveform data set '%s' differs "
+                "from the end time set as an attribute [%s]. Both have to "
+                "agree within a certain tolerance" % (
+                    names[i],
+                    datetime.datetime.utcfromtimestamp(endtimes[i])),
+                path=paths[i])
+
+
+class DataCheck(HeaderCheck):
+    """
+    Checks the samples of the waveforms and that their number matches the
+    end times in their names exactly.
+
+    :param budget: Maximum number of bytes to read. Waveforms that do not
+        fit into the rest of it are not checked.
+    """
+    phase = "data"
+
+    def __init__(self, report, filename, backend, attributes, budget=None):
+        HeaderCheck.__init__(self, report, filename, backend, attributes)
+        self.budget = budget
+        self._lengths = []
+        self._data = []
+        self._total = 0
+        self._used = 0
+
+    def waveform(self, station, name, path, node):
+        self._total += 1
+        npts = node["Dataspace"]["SimpleDataspace"]["Dimension"]["@DimSize"]
+        # Missing attributes are reported by the WaveformCheck.
+        starttime = self.attributes.get(path, {}).get("starttime")
+        sampling_rate = self.attributes.get(path, {}).get("sampling_rate")
+        if starttime is not None and sampling_rate is not None:
+            self._lengths.append((path, name, npts, starttime, sampling_rate))
+
+        dtype = numpy_dtype(node["DataType"])
+        if dtype is None:
+            return
+        size = npts * dtype.itemsize
+        if self.budget is not None and self._used + size > self.budget:
+            return
+        self._used += size
+        self._data.append((path, name, npts, dtype))
+
+    def finish(self):
+        report = self.report
+        for path, name, npts, dtype in self._data:
+            has_nan, has_inf, all_zero = check_samples(
+                self.backend.iter_array(self.filename, path, dtype,
+                                        DEFAULT_CHUNK_SIZE))
+            if has_nan:
+                report.error("waveform-data", "Waveform '%s' contains NaN "
+                             "values." % name, path=path)
+            if has_inf:
+                report.error("waveform-data", "Waveform '%s' contains "
+                             "infinite values." % name, path=path)
+            if all_zero and npts:
+                report.warning("waveform-data", "All samples of waveform "
+                               "'%s' are zero." % name, path=path)
+
+        if self._lengths:
+            import numpy as np
+            from .waveform_times import check_lengths
+
+            paths, names, npts, starttimes, sampling_rates = \
+                zip(*self._lengths)
+            bad, endtimes = check_lengths(names, npts, starttimes,
+                                          sampling_rates)
+            for i in np.nonzero(bad)[0]:
+                report.error(
+                    "waveform-npts",
+                    "The %i samples of waveform '%s' end at %s which does "
+                    "not match the end time in its name." % (
+                        npts[i], names[i],
+                        datetime.datetime.utcfromtimestamp(endtimes[i])),
+                    path=paths[i])
+
+        if len(self._data) < self._total:
+            report.warning("waveform-data", "Only checked the data of %i of "
+                           "%i waveforms - the others do not fit into the "
+                           "data budget or are of an unsupported type." % (
+                               len(self._data), self._total))
+
+
+class StationXMLCheck(HeaderCheck):
+    """
+    Validates the StationXML documents of the given stations.
+
+    The documents are validated in the background while the other checks
+    visit the objects.
+    """
+    phase = "stationxml"
+
+    def __init__(self, report, filename, backend, attributes, registry,
+                 stations, workers=1, executor="thread", cache=None):
+        HeaderCheck.__init__(self, report, filename, backend, attributes)
+        self.registry = registry
+        self.stations = stations
+        self.workers = workers
+        self.executor = executor
+        self.cache = cache
+        self._results = None
+
+    def start(self):
+        self._results = validate_datasets(
+            "StationXML", self.filename,
+            ["/Waveforms/%s/StationXML" % _i for _i in self.stations],
+            backend=self.backend, registry=self.registry,
+            workers=self.workers, executor=self.executor, cache=self.cache)
+
+    def finish(self):
+        for station, (path, errors) in zip(self.stations, self._results):
+            if errors:
+                self.report.error("stationxml", "\n".join(
+                    ["Error validating StationXML for %s:" % station] +
+                    ["\t%s" % _i for _i in errors]), path=path)
+
+    def close(self):
+        # Earlier checks might have stopped before the results are needed.
+        if self._results is not None:
+            self._results.close()
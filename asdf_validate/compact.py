@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Memory-compact construction of the header dictionaries.
+
+Most of the header of an ASDF file is the same over and over again: every
+waveform has the same attributes with the same data types and only the
+length of the data differs. The backends thus build the header bottom up
+and pass every node through a :class:`NodeInterner` which returns a single
+shared instance for all equal nodes and strings. The header of a file with
+millions of waveforms then only needs a few dictionaries per waveform.
+
+The header is still made of plain dictionaries so all checks and the JSON
+schemas work on it unchanged - but shared nodes must never be modified.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+# Marks children compared by identity and lists in the keys of the nodes.
+_CHILD = object()
+_LIST = object()
+
+
+class NodeInterner(object):
+    """
+    Returns a shared instance for equal nodes of a header.
+
+    Nodes must be interned bottom up: a node can only be shared once all
+    dictionaries and lists in it are final. Children are compared by
+    identity which is safe as every interned node keeps its children alive.
+    """
+    def __init__(self):
+        self._nodes = {}
+        self._strings = {}
+
+    def string(self, value):
+        """
+        Shared instance of a string.
+        """
+        return self._strings.setdefault(value, value)
+
+    @staticmethod
+    def _key(value):
+        if isinstance(value, (dict, list)):
+            return _CHILD, id(value)
+        # The type distinguishes e.g. True from 1.
+        return value.__class__, value
+
+    def node(self, node):
+        """
+        Shared instance of a dictionary or list whose children have already
+        been interned.
+        """
+        if isinstance(node, list):
+            key = (_LIST,) + tuple(self._key(_i) for _i in node)
+        else:
+            key = tuple(sorted((_k,) + self._key(_v)
+                               for _k, _v in node.items()))
+        return self._nodes.setdefault(key, node)
+
+    def tree(self, node):
+        """
+        Shared instance of a whole tree of dictionaries and lists.
+        """
+        if isinstance(node, list):
+            return self.node([self.tree(_i) for _i in node])
+        elif not isinstance(node, dict):
+            return node
+        return self.node(dict((_k, self.tree(_v)) for _k, _v in node.items()))
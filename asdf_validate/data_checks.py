@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Checks of the samples of waveform data sets.
+
+The data is read in chunks of a fixed size so the memory usage does not
+depend on the size of the data sets, and each chunk is checked with NumPy.
+Floating point traces must not contain NaN or infinite values, traces that
+are all zero are suspicious.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import re
+
+# Size of the chunks the data is read in.
+DEFAULT_CHUNK_SIZE = 16 * 1024 ** 2
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3,
+               "T": 1024 ** 4}
+
+_BYTE_ORDERS = {"LE": "<", "BE": ">"}
+
+
+def parse_size(value):
+    """
+    Parse a size in bytes with an optional unit, e.g. ``512M`` or ``10G``.
+    """
+    match = re.match(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$",
+                     value, re.IGNORECASE)
+    if match is None:
+        raise ValueError("Invalid size '%s'." % value)
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+def numpy_dtype(datatype):
+    """
+    The NumPy dtype of the ``DataType`` node of a data set in the header.
+
+    Returns ``None`` for all types but integers and floats.
+    """
+    if not isinstance(datatype, dict) or len(datatype) != 1:
+        return None
+    (kind, node), = datatype.items()
+    if kind not in ("IntegerType", "FloatType") or \
+            node.get("@ByteOrder") not in _BYTE_ORDERS:
+        return None
+    import numpy as np
+
+    if kind == "IntegerType":
+        code = "i" if node.get("@Sign", True) else "u"
+    else:
+        code = "f"
+    return np.dtype("%s%s%i" % (_BYTE_ORDERS[node["@ByteOrder"]], code,
+                                node["@Size"]))
+
+
+def check_samples(chunks):
+    """
+    Check the samples of a data set arriving in chunks.
+
+    Returns three booleans: whether the data contains NaN values, whether it
+    contains infinite values, and whether all samples are zero.
+    """
+    import numpy as np
+
+    has_nan = False
+    has_inf = False
+    all_zero = True
+    for chunk in chunks:
+        if chunk.dtype.kind == "f":
+            has_nan = has_nan or bool(np.isnan(chunk).any())
+            has_inf = has_inf or bool(np.isinf(chunk).any())
+        all_zero = all_zero and not chunk.any()
+    return has_nan, has_inf, all_zero
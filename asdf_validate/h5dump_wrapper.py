@@ -15,32 +15,249 @@ can be used to validate it.
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
-import collections
 import io
 import os
 import re
 import subprocess
 import sys
+import threading
+from xml.parsers import expat
+
+from .compact import NodeInterner
+
+# List of keys that are just noise and will be removed.
+IGNORE_KEYS = set([
+    # The internal HDF5 id.
+    "@OBJ-XID",
+    "@H5ParentPaths",
+    "@Parents",
+    "@H5Path",
+    # HDF5 internal value that really does not concern ASDF.
+    "FillValueInfo",
+    # We only get the header information from h5dump. Thus there never is
+    # any data. A group named `Data` in an HDF5 file would furthermore be
+    # stored in the "@Name" field thus this is save to do.
+    "Data",
+    # The storage layout does also not matter for the ASDF definition. Is
+    # is important for any single application but does not matter for the
+    # ASDF format itsself.
+    "StorageLayout"])
+
+# Rename certain keys to make it easier to read.
+RENAMES = {
+    "Attribute": "attributes",
+    "Group": "groups",
+    "Dataset": "datasets"}
+
+
+def _to_bool(value):
+    if value.lower() == "true":
+        return True
+    elif value.lower() == "false":
+        return False
+    else:
+        raise ValueError
 
-import xmltodict
 
+# Force the types of certain keys if possible.
+CONVERSIONS = {
+    "@StrSize": int,
+    "@Size": int,
+    "@DimSize": int,
+    "@MaxDimSize": int,
+    "@Ndims": int,
+    "@Sign": _to_bool,
+    "@SignBitLocation": int,
+    "@ExponentBits": int,
+    "@ExponentLocation": int,
+    "@MantissaBits": int,
+    "@MantissaLocation": int}
 
-def _get_header_dict_representation(filename):
-    if not os.path.exists(filename):
-        sys.exit("File '%s' does not exist." % filename)
-    args = ["h5dump", "-H", "-u", filename]
+
+class HeaderParser(object):
+    """
+    Incrementally parses the XML output of ``h5dump -H -u`` to a dictionary.
+
+    All transformations are applied while the elements arrive so neither the
+    XML document nor any intermediate representation of it are ever kept in
+    memory. The rules are hard-coded with the goal of making the result more
+    readable and ultimately provide better error messages:
+
+    * Everything in :data:`IGNORE_KEYS` is dropped.
+    * Elements are renamed according to :data:`RENAMES`.
+    * XML attributes are converted according to :data:`CONVERSIONS`.
+    * Atomic datatypes are flattened.
+    * Elements with a ``Name`` attribute are stored in a dictionary by name.
+
+    Equal nodes are shared - see :mod:`asdf_validate.compact`.
+    """
+    def __init__(self):
+        self._parser = expat.ParserCreate()
+        self._parser.buffer_text = True
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._characters
+        # Stack of the dictionaries and texts of all currently open elements.
+        self._nodes = [{}]
+        self._texts = [[]]
+        # Depth within an ignored element.
+        self._skip = 0
+        self._interner = NodeInterner()
+
+    @staticmethod
+    def _strip_namespace(tag):
+        return tag.rsplit(":", 1)[-1]
+
+    def _start(self, tag, attributes):
+        if self._skip or self._strip_namespace(tag) in IGNORE_KEYS:
+            self._skip += 1
+            return
+        node = {}
+        for key, value in attributes.items():
+            key = "@" + key
+            if key in IGNORE_KEYS:
+                continue
+            if key in CONVERSIONS:
+                try:
+                    value = CONVERSIONS[key](value)
+                except ValueError:
+                    pass
+            # Names are mostly unique - everything else repeats a lot.
+            elif key != "@Name":
+                value = self._interner.string(value)
+            node[key] = value
+        self._nodes.append(node)
+        self._texts.append([])
+
+    def _characters(self, data):
+        if not self._skip:
+            self._texts[-1].append(data)
+
+    def _end(self, tag):
+        if self._skip:
+            self._skip -= 1
+            return
+        tag = self._strip_namespace(tag)
+        node = self._nodes.pop()
+        text = "".join(self._texts.pop()).strip()
+
+        # Children with a name are stored in a dictionary by name. They can
+        # only be shared once their name is removed.
+        intern = self._interner.node
+        for key, value in node.items():
+            if isinstance(value, dict) and "@Name" in value:
+                value = {value.pop("@Name"): intern(value)}
+            elif isinstance(value, list) and \
+                    all(isinstance(_i, dict) and "@Name" in _i
+                        for _i in value):
+                value = dict((_i.pop("@Name"), intern(_i)) for _i in value)
+            elif not isinstance(value, list):
+                continue
+            # The groups and datasets are unique and potentially huge.
+            node[key] = value if key in ("groups", "datasets") \
+                else intern(value)
+
+        if not node:
+            value = text or None
+        else:
+            if text:
+                node["#text"] = text
+            value = node
+
+        # All datatypes in ASDF are atomic. We can force this here and
+        # flatten the structure a bit. Custom extensions might have compound
+        # types so we leave them in. If a composite type is used in an ASDF
+        # defined structure the scheme will raise an error.
+        if tag == "DataType" and isinstance(value, dict) and \
+                list(value.keys()) == ["AtomicType"]:
+            value = value["AtomicType"]
+        elif isinstance(value, dict) and "@Name" not in value:
+            value = intern(value)
+
+        # Repeated elements become a list.
+        key = RENAMES.get(tag, tag)
+        parent = self._nodes[-1]
+        if key not in parent:
+            parent[key] = value
+        elif isinstance(parent[key], list):
+            parent[key].append(value)
+        else:
+            parent[key] = [parent[key], value]
+
+    def feed(self, data):
+        self._parser.Parse(data, False)
+
+    def close(self):
+        """
+        Finish parsing data passed to :meth:`feed` and return the result.
+        """
+        self._parser.Parse(b"", True)
+        return self.result
+
+    def parse_file(self, fh):
+        """
+        Parse a whole file-like object in chunks and return the result.
+        """
+        self._parser.ParseFile(fh)
+        return self.result
+
+    @property
+    def result(self):
+        """
+        The dictionary of the root group.
+        """
+        return self._nodes[0]["HDF5-File"]["RootGroup"]
+
+
+class _StderrReader(threading.Thread):
+    """
+    Collects the stderr output of a process in the background so it can
+    never block the reading of the potentially very large stdout.
+    """
+    def __init__(self, fh):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._fh = fh
+        self._chunks = []
+        self.start()
+
+    def run(self):
+        with self._fh:
+            for chunk in iter(lambda: self._fh.read(4096), b""):
+                self._chunks.append(chunk)
+
+    def read(self):
+        """
+        Wait for the process to close stderr and return its output.
+        """
+        self.join()
+        return b"".join(self._chunks).decode().strip()
+
+
+def _run_h5dump(args, parse):
+    """
+    Run h5dump and pass its stdout stream to ``parse``.
+    """
     p = subprocess.Popen(args, stdout=subprocess.PIPE,
                          stderr=subprocess.PIPE)
-    stdout, stderr = p.communicate()
-    stderr = stderr.decode()
+    stderr_reader = _StderrReader(p.stderr)
+    try:
+        result = parse(p.stdout)
+        error = None
+    except Exception as e:
+        error = e
+    p.stdout.close()
+    p.wait()
+    stderr = stderr_reader.read()
 
     if stderr:
         sys.exit("stderr when running h5dump: %s" % stderr)
     if p.returncode != 0:
         sys.exit("Returncode when running h5dump: %i" % p.returncode)
+    if error is not None:
+        raise error
 
-    with io.BytesIO(stdout) as fh:
-        return xmltodict.parse(fh)
+    return result
 
 
 def dump_array_to_file(hdf5_file, dataset_name, output_file):
@@ -57,6 +274,73 @@ def dump_array_to_file(hdf5_file, dataset_name, output_file):
     subprocess.check_output(args)
 
 
+def read_array(hdf5_file, dataset_name):
+    """
+    Reads a specified dataset from an HDF5 file and returns its raw bytes.
+
+    h5dump can only write binary data to files so it gets the write end of a
+    pipe as its output file - nothing ever touches the disk.
+    """
+    return b"".join(_dump_binary(hdf5_file, dataset_name, chunk_size=-1))
+
+
+def _dump_binary(hdf5_file, dataset_name, chunk_size):
+    """
+    Yield the raw bytes of a dataset in its native byte order in chunks of
+    ``chunk_size`` bytes. ``-1`` reads everything at once.
+    """
+    if not os.path.exists(hdf5_file):
+        sys.exit("File '%s' does not exist." % hdf5_file)
+    read_fd, write_fd = os.pipe()
+    args = ["h5dump", "-d", dataset_name, "-b", "-o", "/dev/fd/%i" % write_fd,
+            hdf5_file]
+    with io.open(os.devnull, "wb") as devnull:
+        try:
+            p = subprocess.Popen(args, stdout=devnull,
+                                 stderr=subprocess.PIPE,
+                                 pass_fds=(write_fd,))
+        finally:
+            # Only the child may keep the write end open, otherwise the read
+            # below would never finish.
+            os.close(write_fd)
+        stderr_reader = _StderrReader(p.stderr)
+        finished = False
+        try:
+            with io.open(read_fd, "rb") as fh:
+                while True:
+                    data = fh.read(chunk_size)
+                    if not data:
+                        break
+                    yield data
+            finished = True
+        finally:
+            # Nobody wants the rest of the data.
+            if not finished:
+                p.kill()
+            p.wait()
+        stderr = stderr_reader.read()
+
+    if p.returncode != 0:
+        sys.exit("Could not read dataset '%s' with h5dump: %s" % (
+            dataset_name, stderr or "returncode %i" % p.returncode))
+
+
+def iter_array(hdf5_file, dataset_name, dtype, chunk_size):
+    """
+    Reads a specified dataset from an HDF5 file in chunks of at most
+    ``chunk_size`` bytes and yields them as flat NumPy arrays.
+
+    :param dtype: The type of the data in the file.
+    """
+    import numpy as np
+
+    # h5dump writes the data in the native byte order.
+    dtype = np.dtype(dtype).newbyteorder("=")
+    chunk_size = max(1, chunk_size // dtype.itemsize) * dtype.itemsize
+    for data in _dump_binary(hdf5_file, dataset_name, chunk_size):
+        yield np.frombuffer(data, dtype=dtype)
+
+
 def is_hdf5_file(filename):
     """
     Determine if the file is an HDF5 file using h5ls. If it fails its no HDF5
@@ -110,157 +394,106 @@ def get_float_attribute(filename, path):
     return float(attrib)
 
 
-def r_remove_keys(d, keys):
+def _parse_attribute_value(value):
     """
-    Recursively remove all keys from all dictionaries in d. Will recurse into
-    any list and dictionary like object.
+    Parse a single attribute value as printed by h5dump in DDL mode.
     """
-    if isinstance(d, list):
-        return [r_remove_keys(_i, keys) for _i in d]
-    # Any dictionary like object.
-    elif isinstance(d, collections.Mapping):
-        # Remove all unwanted keys. This also stop recursion for the
-        # child elements.
-        for key in keys:
-            try:
-                del d[key]
-            except KeyError:
-                pass
-        for key, item in d.items():
-            d[key] = r_remove_keys(item, keys)
-        return d
-    else:
-        return d
+    if value.startswith('"') and value.endswith('"'):
+        # Zero padded terminated and potentially padded string.
+        return re.sub(r"(\\0+)+$", "", value[1:-1])
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
 
 
-def r_transform_dict(d):
-    """
-    Recursively transforms the dictionary by hard-coded rules with the goal of
-    making it more readable and ultimately provide better error messages.
-    """
-    if isinstance(d, list):
-        return [r_transform_dict(_i) for _i in d]
-    # Any dictionary like object.
-    elif isinstance(d, collections.Mapping):
-        # All transformations happens in here.
-
-        # All datatypes in ASDF are atomic. We can force this here and flatten
-        # the structure a bit.
-        if "DataType" in d:
-            dt = d["DataType"]
-            # Custom extensions might have compound types so we leave them in.
-            # If a composite type is used in an ASDF defined structure the
-            # scheme will raise an error.
-            if list(dt.keys()) == ["AtomicType"]:
-                d["DataType"] = dt["AtomicType"]
-
-        # Rename certain keys to make it easier to read.
-        renames = {"Attribute": "attributes",
-                   "Group": "groups",
-                   "Dataset": "datasets"}
-        for src, dst in renames.items():
-            if src in d:
-                data = d[src]
-                del d[src]
-                d[dst] = data
-
-        def _to_bool(value):
-            if value.lower() == "true":
-                return True
-            elif value.lower() == "false":
-                return False
-            else:
-                raise ValueError
-
-        # Force the types of certain keys if possible.
-        conversions = {
-            "@StrSize": int,
-            "@Size": int,
-            "@DimSize": int,
-            "@MaxDimSize": int,
-            "@Ndims": int,
-            "@Sign": _to_bool,
-            "@SignBitLocation": int,
-            "@ExponentBits": int,
-            "@ExponentLocation": int,
-            "@MantissaBits": int,
-            "@MantissaLocation": int}
-        for key, convert in conversions.items():
-            if key in d:
-                data = d[key]
-                del d[key]
-                try:
-                    d[key] = convert(data)
-                except ValueError:
-                    d[key] = data
-
-        # Now check if any of the value is a list of dictionaries and each
-        # dictionary has a "@Name" key. In that case it can be rewritten as a
-        # dict.
-        # Alternatively the value can be a dictionary with a '@Name' key.
-        for key, value in d.items():
-            # A single item will just be written as a dictioary by xmltodict.
-            if isinstance(value, collections.Mapping) and "@Name" in value:
-                name = value["@Name"]
-                del value["@Name"]
-                d[key] = {name: value}
-            if not isinstance(value, list):
-                continue
+# One value in a line of data - a quoted string or anything up to a comma.
+_VALUE_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"|[^,\s][^,]*')
 
-            if not all(isinstance(_i, collections.Mapping) for _i in value):
-                continue
+# Start of a line of data, e.g. ``(0):`` or ``(1,0):``.
+_INDEX_PATTERN = re.compile(r"^\(\d+(?:,\d+)*\):")
 
-            if not all("@Name" in _i for _i in value):
+
+def _parse_attribute_dump(lines):
+    """
+    Parse the DDL output of ``h5dump -A -e -w 0`` line by line and collect
+    the values of all attributes - scalars as single values, all others as
+    flat lists.
+    """
+    attributes = {}
+    # Stack of (type, name) tuples for all currently open blocks.
+    stack = []
+    scalar = True
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode()
+        line = line.strip()
+        index = _INDEX_PATTERN.match(line)
+        if index:
+            if len(stack) < 2 or stack[-1][0] != "DATA" or \
+                    stack[-2][0] != "ATTRIBUTE":
                 continue
+            # The requested groups are printed with absolute names, all
+            # groups and datasets below them with relative ones.
+            path = "/".join(
+                _i[1].strip("/") for _i in stack[:-2]
+                if _i[0] in ("GROUP", "DATASET"))
+            values = [_parse_attribute_value(_i.strip()) for _i in
+                      _VALUE_PATTERN.findall(line[index.end():])]
+            group = attributes.setdefault("/" + path, {})
+            if scalar:
+                group[stack[-2][1]] = values[0]
+            else:
+                group.setdefault(stack[-2][1], []).extend(values)
+        elif line.startswith("DATASPACE") and stack and \
+                stack[-1][0] == "ATTRIBUTE":
+            scalar = line.split()[1] == "SCALAR"
+        elif line.endswith("{"):
+            kind = line.split(" ", 1)[0]
+            name = line[line.find('"') + 1:line.rfind('"')] \
+                if line.count('"') >= 2 else None
+            stack.append((kind, name))
+        elif line == "}" and stack:
+            stack.pop()
+    return attributes
+
+
+def get_attributes(filename, groups):
+    """
+    Get the values of all attributes of all objects in the given groups with
+    a single call to h5dump.
+
+    Returns a dictionary mapping the full HDF5 path of every object that has
+    attributes to a dictionary of attribute names and their values. String
+    attributes are returned as strings, numeric ones as int or float, and
+    the values of non-scalar ones as flat lists - exactly like the h5py
+    backend.
+
+    This is orders of magnitude faster than calling
+    :func:`get_string_attribute` or :func:`get_float_attribute` for each
+    attribute, as these launch a new process every time.
+    """
+    if not os.path.exists(filename):
+        sys.exit("File '%s' does not exist." % filename)
+    if not groups:
+        return {}
 
-            new_value = {}
-            for item in value:
-                name = item["@Name"]
-                del item["@Name"]
-                new_value[name] = item
-            d[key] = new_value
+    # Only print the attributes with all their values - no dataset data.
+    args = ["h5dump", "-A", "-e", "-w", "0"]
+    for group in groups:
+        args.extend(["-g", group])
+    args.append(filename)
 
-        for key, value in d.items():
-            d[key] = r_transform_dict(value)
-        return d
-    else:
-        return d
+    return _run_h5dump(args, _parse_attribute_dump)
 
 
 def get_header_as_dict(filename):
     """
     Get a nice representation of the HDF5 datastructure as a dictionary.
     """
-    header = \
-        _get_header_dict_representation(filename)["HDF5-File"]["RootGroup"]
-
-    # List of keys that are just noise and will be removed.
-    ignore_keys = [
-        # The internal HDF5 id.
-        "@OBJ-XID",
-        "@H5ParentPaths",
-        "@Parents",
-        "@H5Path",
-        # HDF5 internal value that really does not concern ASDF.
-        "FillValueInfo",
-        # We only get the header information from h5dump. Thus there never is
-        # any data. A group named `Data` in an HDF5 file would furthermore be
-        # stored in the "@Name" field thus this is save to do.
-        "Data",
-        # The storage layout does also not matter for the ASDF definition. Is
-        # is important for any single application but does not matter for the
-        # ASDF format itsself.
-        "StorageLayout"
-        ]
-
-    # Recursively remove all the unwanted keys.
-    header = r_remove_keys(header, ignore_keys)
-
-    # Transfrom the dictionary to make it easier to read.
-    header = r_transform_dict(header)
-
-    with open("./dummy.json", "w") as fh:
-        import json
-        json.dump(header, fh, indent=4)
-
-    return header
+    if not os.path.exists(filename):
+        sys.exit("File '%s' does not exist." % filename)
+    args = ["h5dump", "-H", "-u", filename]
+    return _run_h5dump(args, lambda fh: HeaderParser().parse_file(fh))
@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+In-process equivalent of the h5dump wrapper based on h5py.
+
+Builds exactly the same dictionary representation of the HDF5 structure as
+:func:`asdf_validate.h5dump_wrapper.get_header_as_dict` but without parsing
+the XML output of an external program.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+import sys
+
+import h5py
+from h5py import h5a, h5s, h5t
+import numpy as np
+
+from .compact import NodeInterner
+from .remote import is_remote, open_file
+
+
+_BYTE_ORDERS = {
+    h5t.ORDER_LE: "LE",
+    h5t.ORDER_BE: "BE",
+    h5t.ORDER_VAX: "VAX",
+    h5t.ORDER_NONE: "NONE"}
+
+_CSETS = {
+    h5t.CSET_ASCII: "H5T_CSET_ASCII",
+    h5t.CSET_UTF8: "H5T_CSET_UTF8"}
+
+_STRPADS = {
+    h5t.STR_NULLTERM: "H5T_STR_NULLTERM",
+    h5t.STR_NULLPAD: "H5T_STR_NULLPAD",
+    h5t.STR_SPACEPAD: "H5T_STR_SPACEPAD"}
+
+
+def _get_file(filename):
+    """
+    The name of a local file or a file object of a remote file for h5py.
+    """
+    if is_remote(filename):
+        try:
+            return open_file(filename)
+        except IOError as e:
+            sys.exit("Could not open '%s': %s" % (filename, e))
+    if not os.path.exists(filename):
+        sys.exit("File '%s' does not exist." % filename)
+    return filename
+
+
+def _open(filename):
+    return h5py.File(_get_file(filename), "r")
+
+
+def _to_str(value):
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", "replace")
+    return value
+
+
+def _get_dataspace(space):
+    """
+    Dictionary representation of an HDF5 dataspace.
+    """
+    kind = space.get_simple_extent_type()
+    if kind == h5s.SCALAR:
+        return {"ScalarDataspace": None}
+    elif kind == h5s.NULL:
+        return {"NullDataspace": None}
+
+    dimensions = []
+    for size, max_size in zip(space.get_simple_extent_dims(),
+                              space.get_simple_extent_dims(maxdims=True)):
+        dimensions.append({
+            "@DimSize": size,
+            "@MaxDimSize": "UNLIMITED" if max_size == h5s.UNLIMITED
+            else max_size})
+    return {"SimpleDataspace": {
+        "@Ndims": len(dimensions),
+        # h5dump writes one element per dimension.
+        "Dimension": dimensions[0] if len(dimensions) == 1 else dimensions}}
+
+
+def _get_datatype(tid):
+    """
+    Dictionary representation of an HDF5 datatype.
+
+    Atomic types are directly returned in their flattened form - the same
+    one :class:`asdf_validate.h5dump_wrapper.HeaderParser` produces.
+    """
+    cls = tid.get_class()
+    if cls == h5t.INTEGER:
+        return {"IntegerType": {
+            "@ByteOrder": _BYTE_ORDERS[tid.get_order()],
+            "@Sign": tid.get_sign() != h5t.SGN_NONE,
+            "@Size": tid.get_size()}}
+    elif cls == h5t.FLOAT:
+        spos, epos, esize, mpos, msize = tid.get_fields()
+        return {"FloatType": {
+            "@ByteOrder": _BYTE_ORDERS[tid.get_order()],
+            "@Size": tid.get_size(),
+            "@SignBitLocation": spos,
+            "@ExponentBits": esize,
+            "@ExponentLocation": epos,
+            "@MantissaBits": msize,
+            "@MantissaLocation": mpos}}
+    elif cls == h5t.STRING:
+        return {"StringType": {
+            "@Cset": _CSETS[tid.get_cset()],
+            "@StrSize": "H5T_VARIABLE" if tid.is_variable_str()
+            else tid.get_size(),
+            "@StrPad": _STRPADS[tid.get_strpad()]}}
+    elif cls == h5t.BITFIELD:
+        return {"BitfieldType": {
+            "@ByteOrder": _BYTE_ORDERS[tid.get_order()],
+            "@Size": tid.get_size()}}
+    elif cls == h5t.OPAQUE:
+        return {"OpaqueType": {
+            "@Tag": _to_str(tid.get_tag()),
+            "@Size": tid.get_size()}}
+    elif cls == h5t.REFERENCE:
+        if tid.equal(h5t.STD_REF_OBJ):
+            return {"ReferenceType": {"ObjectReferenceType": None}}
+        return {"ReferenceType": {"DatasetRegionReferenceType": None}}
+    elif cls == h5t.ENUM:
+        members = [tid.get_member_name(_i)
+                   for _i in range(tid.get_nmembers())]
+        return {"EnumType": {
+            "EnumElement": [_to_str(_i) for _i in members],
+            "EnumValue": [str(tid.enum_valueof(_i)) for _i in members]}}
+    elif cls == h5t.COMPOUND:
+        fields = [{"@FieldName": _to_str(tid.get_member_name(_i)),
+                   "DataType": _get_datatype(tid.get_member_type(_i))}
+                  for _i in range(tid.get_nmembers())]
+        return {"CompoundType": {
+            "Field": fields[0] if len(fields) == 1 else fields}}
+    elif cls == h5t.ARRAY:
+        dims = tid.get_array_dims()
+        dimensions = [{"@DimSize": _i, "@DimPerm": _j}
+                      for _j, _i in enumerate(dims)]
+        return {"ArrayType": {
+            "@Ndims": len(dims),
+            "ArrayDimension": dimensions[0] if len(dimensions) == 1
+            else dimensions,
+            "DataType": _get_datatype(tid.get_super())}}
+    elif cls == h5t.VLEN:
+        return {"VLType": {"DataType": _get_datatype(tid.get_super())}}
+    elif cls == h5t.TIME:
+        return {"TimeType": None}
+    raise NotImplementedError("Unknown HDF5 datatype class %i." % cls)
+
+
+def _get_attributes(obj, interner):
+    attributes = {}
+    for name in obj.attrs:
+        attr = h5a.open(obj.id, name.encode())
+        attributes[name] = interner.tree({
+            "Dataspace": _get_dataspace(attr.get_space()),
+            "DataType": _get_datatype(attr.get_type())})
+    return interner.node(attributes) if attributes else attributes
+
+
+def _get_group(group, interner):
+    """
+    Recursively build the dictionary representation of a group.
+    """
+    node = {}
+    attributes = _get_attributes(group, interner)
+    if attributes:
+        node["attributes"] = attributes
+
+    groups = {}
+    datasets = {}
+    named_types = {}
+    soft_links = []
+    external_links = []
+    for name in group:
+        link = group.get(name, getlink=True)
+        if isinstance(link, h5py.SoftLink):
+            soft_links.append({"@LinkName": name,
+                               "@TargetPath": link.path})
+            continue
+        elif isinstance(link, h5py.ExternalLink):
+            external_links.append({"@LinkName": name,
+                                   "@TargetFilename": link.filename,
+                                   "@TargetPath": link.path})
+            continue
+
+        obj = group[name]
+        if isinstance(obj, h5py.Group):
+            groups[name] = _get_group(obj, interner)
+        elif isinstance(obj, h5py.Dataset):
+            datasets[name] = _get_dataset(obj, interner)
+        elif isinstance(obj, h5py.Datatype):
+            named_types[name] = interner.tree(
+                {"DataType": _get_datatype(obj.id)})
+
+    for key, value in (("groups", groups), ("datasets", datasets),
+                       ("NamedDataType", named_types)):
+        if value:
+            node[key] = value
+    for key, value in (("SoftLink", soft_links),
+                       ("ExternalLink", external_links)):
+        if value:
+            node[key] = interner.tree(value[0] if len(value) == 1 else value)
+    return interner.node(node)
+
+
+def _get_dataset(dataset, interner):
+    node = {"Dataspace": interner.tree(
+                _get_dataspace(dataset.id.get_space())),
+            "DataType": interner.tree(_get_datatype(dataset.id.get_type()))}
+    attributes = _get_attributes(dataset, interner)
+    if attributes:
+        node["attributes"] = attributes
+    return interner.node(node)
+
+
+def get_header_as_dict(filename):
+    """
+    Get a nice representation of the HDF5 datastructure as a dictionary.
+
+    Equal nodes are shared - see :mod:`asdf_validate.compact`.
+    """
+    with _open(filename) as f:
+        return _get_group(f, NodeInterner())
+
+
+def read_array(hdf5_file, dataset_name):
+    """
+    Reads a specified dataset from an HDF5 file and returns its raw bytes.
+    """
+    with _open(hdf5_file) as f:
+        return f[dataset_name][()].tobytes()
+
+
+def iter_array(hdf5_file, dataset_name, dtype, chunk_size):
+    """
+    Reads a specified dataset from an HDF5 file in chunks of at most
+    ``chunk_size`` bytes and yields them as flat NumPy arrays.
+
+    Contiguous datasets without filters in local files are memory mapped,
+    all others are read chunk by chunk.
+
+    :param dtype: The type of the data in the file - h5py knows it anyways.
+    """
+    with _open(hdf5_file) as f:
+        ds = f[dataset_name]
+        if not ds.size:
+            return
+        row_size = ds.dtype.itemsize * (ds.size // ds.shape[0])
+        rows = max(1, chunk_size // row_size)
+        offset = ds.id.get_offset()
+        if ds.chunks is None and offset is not None and \
+                not is_remote(hdf5_file):
+            data = np.memmap(hdf5_file, dtype=ds.dtype, mode="r",
+                             offset=offset, shape=ds.shape)
+        else:
+            data = ds
+        for i in range(0, ds.shape[0], rows):
+            yield np.asarray(data[i:i + rows]).reshape(-1)
+
+
+def dump_array_to_file(hdf5_file, dataset_name, output_file):
+    """
+    Gets a specified dataset from an HDF5 file and dumps it to output_file.
+    """
+    output_file = os.path.abspath(output_file)
+    if not os.path.exists(os.path.dirname(output_file)):
+        sys.exit("Folder '%s' does not exist." % os.path.dirname(output_file))
+    data = read_array(hdf5_file, dataset_name)
+    with open(output_file, "wb") as fh:
+        fh.write(data)
+
+
+def is_hdf5_file(filename):
+    """
+    Determine if the file is an HDF5 file by trying to open it with h5py.
+    """
+    source = _get_file(filename)
+    try:
+        h5py.File(source, "r").close()
+        return True
+    except Exception:
+        if getattr(source, "error", None) is not None:
+            sys.exit("Could not read '%s': %s" % (filename, source.error))
+        return False
+
+
+def _get_attribute_value(obj, name):
+    value = obj.attrs[name]
+    if isinstance(value, np.ndarray):
+        value = [_to_str(_i) for _i in value.ravel().tolist()]
+    elif isinstance(value, np.generic):
+        value = value.item()
+    return _to_str(value)
+
+
+def _get_attribute(filename, path):
+    obj_path, name = ("/" + path.lstrip("/")).rsplit("/", 1)
+    with _open(filename) as f:
+        try:
+            return _get_attribute_value(f[obj_path or "/"], name)
+        except KeyError:
+            sys.exit("Could not find attribute '%s' in file." % path)
+
+
+def get_string_attribute(filename, path):
+    attrib = _get_attribute(filename, path)
+    if not isinstance(attrib, type("")):
+        raise ValueError("Problem decoding attribute '%s' in file." % path)
+    return attrib
+
+
+def get_float_attribute(filename, path):
+    attrib = _get_attribute(filename, path)
+    return float(attrib)
+
+
+def get_attributes(filename, groups):
+    """
+    Get the values of all attributes of all objects in the given groups.
+
+    Returns a dictionary mapping the full HDF5 path of every object that has
+    attributes to a dictionary of attribute names and their values. String
+    attributes are returned as strings, numeric ones as int or float, and
+    the values of non-scalar ones as flat lists.
+    """
+    attributes = {}
+
+    def _collect(name, obj):
+        if obj.attrs:
+            attributes[obj.name] = {
+                _i: _get_attribute_value(obj, _i) for _i in obj.attrs}
+
+    with _open(filename) as f:
+        for group in groups:
+            if group not in f:
+                sys.exit("Could not find group '%s' in file." % group)
+            _collect(group, f[group])
+            f[group].visititems(_collect)
+    return attributes
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Instrumentation of validation runs.
+
+A :class:`Profile` records how long each phase of a validation takes, how
+often the backend is called, how many subprocesses were launched, how many
+bytes of datasets were read, and the peak memory usage. Remote files
+additionally record the number of range requests and fetched bytes.
+Optionally the whole run is profiled with :mod:`cProfile`.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import collections
+import contextlib
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+# Phases of a validation in the order they run.
+PHASES = ["file", "header", "schema", "quakeml", "attributes", "objects",
+          "provenance", "waveforms", "stationxml"]
+
+
+def _peak_rss_mb(who):
+    """
+    Peak resident set size in MB.
+    """
+    peak = resource.getrusage(who).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    if sys.platform == "darwin":
+        peak /= 1024.0
+    return round(peak / 1024.0, 1)
+
+
+class Profile(object):
+    """
+    Collects timings and counters of a single validation run.
+
+    Safe to use from many threads, e.g. by the XML validation workers.
+
+    :param callback: Optional function called as
+        ``callback(filename, phase, seconds)`` at the end of every phase,
+        e.g. to feed a monitoring system.
+    :param cprofile: Also profile the run with :mod:`cProfile`. Only the
+        thread calling :meth:`start` is profiled.
+    """
+    def __init__(self, filename, callback=None, cprofile=False):
+        self.filename = filename
+        self.callback = callback
+        self.phases = collections.OrderedDict()
+        # Method name -> [number of calls, seconds].
+        self.backend_calls = collections.OrderedDict()
+        self.subprocesses = 0
+        self.bytes_read = 0
+        # Only set for remote files.
+        self.range_requests = None
+        self.bytes_fetched = None
+        self.total = None
+        self.peak_rss_mb = None
+        self.peak_children_rss_mb = None
+        self.cprofile = None
+        if cprofile:
+            import cProfile
+            self.cprofile = cProfile.Profile()
+        self._lock = threading.Lock()
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        if self.cprofile is not None:
+            self.cprofile.enable()
+
+    def stop(self):
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        self.total = time.perf_counter() - self._start
+        if resource is not None:
+            self.peak_rss_mb = _peak_rss_mb(resource.RUSAGE_SELF)
+            self.peak_children_rss_mb = _peak_rss_mb(
+                resource.RUSAGE_CHILDREN)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Context manager timing a phase. Phases running more than once are
+        added up.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + seconds
+            if self.callback is not None:
+                self.callback(self.filename, name, seconds)
+
+    def record_call(self, method, seconds, subprocesses=0, bytes_read=0):
+        """
+        Record a single call to the backend.
+        """
+        with self._lock:
+            calls = self.backend_calls.setdefault(method, [0, 0.0])
+            calls[0] += 1
+            calls[1] += seconds
+            self.subprocesses += subprocesses
+            self.bytes_read += bytes_read
+
+    def record_transfer(self, requests, bytes_fetched):
+        """
+        Record the range requests of a remote file.
+        """
+        with self._lock:
+            self.range_requests = requests
+            self.bytes_fetched = bytes_fetched
+
+    def to_dict(self):
+        """
+        All measurements as a JSON serializable dictionary.
+
+        The peak memory is the one of the whole process and of all its
+        terminated children up to the end of the validation - not only of
+        this validation. ``None`` if it cannot be determined.
+        """
+        result = {
+            "total": self.total,
+            "phases": dict(self.phases),
+            "backend_calls": dict(
+                (_k, {"calls": _v[0], "seconds": _v[1]})
+                for _k, _v in self.backend_calls.items()),
+            "subprocesses": self.subprocesses,
+            "bytes_read": self.bytes_read,
+            "peak_rss_mb": self.peak_rss_mb,
+            "peak_children_rss_mb": self.peak_children_rss_mb}
+        if self.bytes_fetched is not None:
+            result["range_requests"] = self.range_requests
+            result["bytes_fetched"] = self.bytes_fetched
+        return result
+
+
+def format_profile(profile):
+    """
+    Human readable summary of the output of :meth:`Profile.to_dict`.
+    """
+    lines = ["Profile:"]
+    for name in PHASES + sorted(set(profile["phases"]) - set(PHASES)):
+        if name in profile["phases"]:
+            lines.append("\t%-20s %10.4f s" % (
+                name, profile["phases"][name]))
+    lines.append("\t%-20s %10.4f s" % ("total", profile["total"] or 0.0))
+    lines.append("Backend calls:")
+    for name, value in sorted(profile["backend_calls"].items()):
+        lines.append("\t%-20s %10.4f s %8i calls" % (
+            name, value["seconds"], value["calls"]))
+    lines.append("Subprocesses: %i" % profile["subprocesses"])
+    lines.append("Bytes read: %i" % profile["bytes_read"])
+    if "bytes_fetched" in profile:
+        lines.append("Bytes fetched: %i in %i range requests" % (
+            profile["bytes_fetched"], profile["range_requests"]))
+    lines.append("Peak memory: %s MB (children: %s MB)" % (
+        profile["peak_rss_mb"], profile["peak_children_rss_mb"]))
+    return "\n".join(lines)
+
+
+class ProfilingBackend(object):
+    """
+    Wraps a backend and records every call in a :class:`Profile`.
+
+    Calls made in worker processes, e.g. with the ``"process"`` XML
+    executor, are not seen by the wrapper.
+    """
+    def __init__(self, backend, profile):
+        self._backend = backend
+        self._profile = profile
+        self.name = backend.name
+
+    def _call(self, method, *args):
+        start = time.perf_counter()
+        result = getattr(self._backend, method)(*args)
+        seconds = time.perf_counter() - start
+        # Every method of the h5dump backend launches a single process -
+        # except when there are no attributes to read.
+        subprocesses = int(self.name == "h5dump" and not (
+            method == "get_attributes" and not args[1]))
+        bytes_read = len(result) if method == "read_array" else 0
+        self._profile.record_call(method, seconds, subprocesses=subprocesses,
+                                  bytes_read=bytes_read)
+        return result
+
+    def is_hdf5_file(self, filename):
+        return self._call("is_hdf5_file", filename)
+
+    def get_header_as_dict(self, filename):
+        return self._call("get_header_as_dict", filename)
+
+    def get_string_attribute(self, filename, path):
+        return self._call("get_string_attribute", filename, path)
+
+    def get_float_attribute(self, filename, path):
+        return self._call("get_float_attribute", filename, path)
+
+    def get_attributes(self, filename, groups):
+        return self._call("get_attributes", filename, groups)
+
+    def read_array(self, filename, dataset_name):
+        return self._call("read_array", filename, dataset_name)
+
+    def iter_array(self, filename, dataset_name, dtype, chunk_size):
+        start = time.perf_counter()
+        bytes_read = 0
+        try:
+            for chunk in self._backend.iter_array(filename, dataset_name,
+                                                  dtype, chunk_size):
+                bytes_read += chunk.nbytes
+                yield chunk
+        finally:
+            self._profile.record_call(
+                "iter_array", time.perf_counter() - start,
+                subprocesses=int(self.name == "h5dump"),
+                bytes_read=bytes_read)
+
+    def dump_array_to_file(self, filename, dataset_name, output_file):
+        return self._call("dump_array_to_file", filename, dataset_name,
+                          output_file)
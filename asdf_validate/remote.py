@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Validation of files on web servers and object stores.
+
+Files given as ``http://``, ``https://``, or ``s3://`` URLs are not
+downloaded but read with range requests by the h5py backend - only the
+parts of the file the validation actually needs are fetched: the metadata of
+the HDF5 file and the embedded XML documents, plus the waveform data if it
+is checked.
+
+The HDF5 library reads the metadata in many small pieces. All reads are
+thus aligned to blocks of :data:`DEFAULT_BLOCK_SIZE` bytes which are cached
+while a file is validated, and neighbouring missing blocks are fetched with
+a single request. The number of requests and fetched bytes are part of the
+profile of a validation.
+
+``s3://`` URLs require ``boto3`` and use its usual configuration, e.g. the
+``AWS_ENDPOINT_URL`` environment variable for S3-compatible stores. Public
+or pre-signed objects can also be read as plain ``https://`` URLs.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import collections
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+
+DEFAULT_BLOCK_SIZE = 256 * 1024
+DEFAULT_CACHE_SIZE = 256 * 1024 ** 2
+
+_SCHEMES = ("http://", "https://", "s3://")
+
+
+def is_remote(filename):
+    """
+    Whether the file is given as a URL.
+    """
+    return filename.startswith(_SCHEMES)
+
+
+class HTTPSource(object):
+    """
+    Reads byte ranges of a file from a web server.
+    """
+    def __init__(self, url, timeout=60):
+        self.url = url
+        self.timeout = timeout
+
+    def get_size(self):
+        import urllib.request
+
+        request = urllib.request.Request(self.url, method="HEAD")
+        with urllib.request.urlopen(request, timeout=self.timeout) as r:
+            return int(r.headers["Content-Length"])
+
+    def fetch(self, start, stop):
+        import http.client
+        import urllib.request
+
+        request = urllib.request.Request(self.url, headers={
+            "Range": "bytes=%i-%i" % (start, stop - 1)})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as r:
+                # Servers are free to ignore the range. Do not download
+                # the whole file for every block then.
+                if r.status != 206:
+                    raise IOError("Server does not support range requests.")
+                data = r.read()
+        except http.client.HTTPException as e:
+            # E.g. connections closed before the whole range arrived.
+            raise IOError("%s: %s" % (e.__class__.__name__, e))
+        # The cache never asks for bytes beyond the end of the file.
+        if len(data) != stop - start:
+            raise IOError("Received %i instead of %i bytes." % (
+                len(data), stop - start))
+        return data
+
+
+class S3Source(object):
+    """
+    Reads byte ranges of an object in an S3-compatible object store.
+    """
+    def __init__(self, url):
+        try:
+            import boto3
+        except ImportError:
+            sys.exit("Reading 's3://' URLs requires boto3.")
+        self.bucket, _, self.key = url[len("s3://"):].partition("/")
+        self._client = boto3.client("s3")
+
+    def _call(self, method, **kwargs):
+        import botocore.exceptions
+
+        try:
+            return getattr(self._client, method)(
+                Bucket=self.bucket, Key=self.key, **kwargs)
+        except botocore.exceptions.ClientError as e:
+            raise IOError("%s" % e)
+
+    def get_size(self):
+        return self._call("head_object")["ContentLength"]
+
+    def fetch(self, start, stop):
+        return self._call("get_object", Range="bytes=%i-%i" % (
+            start, stop - 1))["Body"].read()
+
+
+class LocalSource(object):
+    """
+    Reads byte ranges of a local file, optionally with a delay per request
+    to emulate a remote store.
+    """
+    def __init__(self, filename, latency=0.0):
+        self.filename = filename
+        self.latency = latency
+
+    def get_size(self):
+        return os.path.getsize(self.filename)
+
+    def fetch(self, start, stop):
+        time.sleep(self.latency)
+        with io.open(self.filename, "rb") as fh:
+            fh.seek(start)
+            return fh.read(stop - start)
+
+
+def get_source(url):
+    if url.startswith("s3://"):
+        return S3Source(url)
+    return HTTPSource(url)
+
+
+class RangeCache(object):
+    """
+    Block cache in front of a source of byte ranges. Thread-safe.
+
+    :param source: Object with ``get_size()`` and ``fetch(start, stop)``
+        methods, e.g. a :class:`HTTPSource`.
+    :param block_size: All reads are aligned to blocks of this size.
+    :param max_size: Maximum number of cached bytes. The least recently
+        used blocks are dropped first.
+    """
+    def __init__(self, source, block_size=DEFAULT_BLOCK_SIZE,
+                 max_size=DEFAULT_CACHE_SIZE):
+        self.source = source
+        self.block_size = block_size
+        self.max_blocks = max(1, max_size // block_size)
+        self.requests = 0
+        self.bytes_fetched = 0
+        self._size = None
+        self._blocks = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        if self._size is None:
+            self._size = self.source.get_size()
+        return self._size
+
+    def read(self, offset, length):
+        """
+        Read up to ``length`` bytes starting at ``offset``.
+        """
+        stop = min(offset + length, self.size)
+        if offset >= stop:
+            return b""
+        first = offset // self.block_size
+        blocks = self._get_blocks(first, (stop - 1) // self.block_size)
+        start = offset - first * self.block_size
+        return b"".join(blocks)[start:start + stop - offset]
+
+    def _get_blocks(self, first, last):
+        blocks = {}
+        with self._lock:
+            for i in range(first, last + 1):
+                if i in self._blocks:
+                    self._blocks.move_to_end(i)
+                    blocks[i] = self._blocks[i]
+        missing = [_i for _i in range(first, last + 1) if _i not in blocks]
+
+        # Fetch every run of consecutive missing blocks at once.
+        runs = []
+        for i in missing:
+            if runs and runs[-1][-1] == i - 1:
+                runs[-1].append(i)
+            else:
+                runs.append([i])
+        for run in runs:
+            start = run[0] * self.block_size
+            data = self.source.fetch(
+                start, min((run[-1] + 1) * self.block_size, self.size))
+            with self._lock:
+                self.requests += 1
+                self.bytes_fetched += len(data)
+                for i in run:
+                    offset = (i - run[0]) * self.block_size
+                    blocks[i] = self._blocks[i] = \
+                        data[offset:offset + self.block_size]
+                while len(self._blocks) > self.max_blocks:
+                    self._blocks.popitem(last=False)
+        return [blocks[_i] for _i in range(first, last + 1)]
+
+
+class RemoteFile(io.RawIOBase):
+    """
+    Read-only file object on top of a :class:`RangeCache` as accepted by
+    :class:`h5py.File`.
+    """
+    def __init__(self, cache):
+        io.RawIOBase.__init__(self)
+        self._cache = cache
+        self._position = 0
+        # Message of the last failed read - h5py does not always pass it on.
+        self.error = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._cache.size
+        if offset < 0:
+            raise ValueError("Negative seek position %i." % offset)
+        self._position = offset
+        return offset
+
+    def readinto(self, buffer):
+        try:
+            data = self._cache.read(self._position, len(buffer))
+        except Exception as e:
+            # Not the exception itself - its traceback references the buffer
+            # of the HDF5 library which crashes the interpreter at exit.
+            self.error = "%s" % e
+            raise
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+# URL -> [cache, number of open sessions].
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+@contextlib.contextmanager
+def session(filename):
+    """
+    Context manager sharing a single :class:`RangeCache` between all reads
+    of a remote file - yields the cache, or ``None`` for local files.
+
+    Concurrent sessions of the same URL share the cache and its counters.
+    Worker processes read the file on their own.
+    """
+    if not is_remote(filename):
+        yield None
+        return
+    with _SESSIONS_LOCK:
+        if filename not in _SESSIONS:
+            _SESSIONS[filename] = [RangeCache(get_source(filename)), 0]
+        entry = _SESSIONS[filename]
+        entry[1] += 1
+    try:
+        yield entry[0]
+    finally:
+        with _SESSIONS_LOCK:
+            entry[1] -= 1
+            if not entry[1]:
+                del _SESSIONS[filename]
+
+
+def open_file(url):
+    """
+    Open a remote file. Reads go through the cache of the current session
+    of the URL if there is one.
+
+    Raises :class:`IOError` if the file cannot be accessed.
+    """
+    with _SESSIONS_LOCK:
+        entry = _SESSIONS.get(url)
+    cache = entry[0] if entry else RangeCache(get_source(url))
+    # Fail early for missing files.
+    cache.size
+    return RemoteFile(cache)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Structured results of a validation run.
+
+All problems found in a file are collected as findings in a
+:class:`ValidationReport` - each with a severity, the HDF5 path it concerns,
+the id of the check that found it, and a human readable message.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import collections
+
+ERROR = "error"
+WARNING = "warning"
+
+Finding = collections.namedtuple(
+    "Finding", ["severity", "path", "check", "message"])
+
+
+class StopValidation(Exception):
+    """
+    Raised by the report to abort a validation run.
+    """
+    pass
+
+
+class ValidationReport(object):
+    """
+    Collects all findings of a validation run.
+
+    :param filename: The validated file.
+    :param fail_fast: Abort the validation on the first error.
+    """
+    def __init__(self, filename, fail_fast=False):
+        self.filename = filename
+        self.fail_fast = fail_fast
+        self.findings = []
+        # Optional :class:`~asdf_validate.profiling.Profile` of the run.
+        self.profile = None
+        # Number of checked objects if only a sample of them was checked.
+        self.coverage = None
+
+    def error(self, check, message, path=None, fatal=False):
+        """
+        Record an error.
+
+        :param fatal: Errors after which no further checks are possible
+            abort the validation even if not running in fail fast mode.
+        """
+        self.findings.append(Finding(ERROR, path, check, message))
+        if fatal or self.fail_fast:
+            raise StopValidation(message)
+
+    def warning(self, check, message, path=None):
+        """
+        Record a warning.
+        """
+        self.findings.append(Finding(WARNING, path, check, message))
+
+    @property
+    def errors(self):
+        return [_i for _i in self.findings if _i.severity == ERROR]
+
+    @property
+    def warnings(self):
+        return [_i for _i in self.findings if _i.severity == WARNING]
+
+    @property
+    def is_valid(self):
+        return not self.errors
+
+    def to_dict(self):
+        """
+        The report as a JSON serializable dictionary.
+        """
+        result = {"filename": self.filename,
+                  "valid": self.is_valid,
+                  "findings": [_i._asdict() for _i in self.findings]}
+        if self.profile is not None:
+            result["profile"] = self.profile.to_dict()
+        if self.coverage is not None:
+            result["coverage"] = self.coverage
+        return result
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Restore a report from the output of :meth:`to_dict`.
+        """
+        report = cls(data["filename"])
+        report.findings = [Finding(**_i) for _i in data["findings"]]
+        return report
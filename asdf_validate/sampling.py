@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sampling of the objects of a file for a quick check of huge archives.
+
+The structure of a file is always validated completely but the checks of
+the individual waveforms and auxiliary data sets can be restricted to a
+random subset of them. Checks of whole stations, e.g. of their StationXML
+documents, always run for every station. If none of ``n`` randomly chosen
+objects is invalid, at most ``1 - 0.05 ** (1 / n)`` of all objects are
+invalid with 95 % confidence, e.g. less than 3 % for 100 checked objects -
+independent of the total number of objects.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import collections
+import random
+
+# How to choose the sampled objects.
+STRATEGIES = ["random", "station"]
+
+# Kinds of sampled objects and their names in messages.
+KINDS = {
+    "waveforms": "waveforms",
+    "auxiliary_data": "auxiliary data sets"
+}
+
+CONFIDENCE = 0.95
+
+
+def error_rate_bound(checked, confidence=CONFIDENCE):
+    """
+    Upper bound of the fraction of invalid objects if none of ``checked``
+    randomly chosen ones is invalid.
+    """
+    if not checked:
+        return 1.0
+    return 1.0 - (1.0 - confidence) ** (1.0 / checked)
+
+
+class Sampler(object):
+    """
+    Chooses the objects of a single file that are checked and keeps track
+    of the coverage.
+
+    :param fraction: Fraction of the objects to check, between 0 and 1. At
+        least one object of every kind is checked.
+    :param strategy: ``"random"`` chooses the objects uniformly across the
+        whole file, ``"station"`` chooses the same fraction of waveforms of
+        every station and of the auxiliary data of every data type so
+        every station is checked.
+    :param seed: Seed of the random number generator to get reproducible
+        samples.
+    """
+    def __init__(self, fraction, strategy="random", seed=None):
+        if not 0.0 < fraction <= 1.0:
+            raise ValueError("The sampled fraction must be larger than 0 "
+                             "and not larger than 1.")
+        if strategy not in STRATEGIES:
+            raise ValueError("Unknown sampling strategy '%s'. Known "
+                             "strategies: %s" % (strategy,
+                                                 ", ".join(STRATEGIES)))
+        self.fraction = fraction
+        self.strategy = strategy
+        self._random = random.Random(seed)
+        # Kind -> (checked, total).
+        self.coverage = collections.OrderedDict()
+
+    def _count(self, total):
+        return min(total, max(1, int(round(self.fraction * total))))
+
+    def _sample(self, items):
+        return self._random.sample(items, self._count(len(items)))
+
+    def select(self, kind, groups, stratify=False):
+        """
+        Choose the items to check.
+
+        :param groups: Dictionary mapping group names to lists of item
+            names.
+        :param stratify: Choose from every group on its own.
+
+        Returns a dictionary with the same groups and the chosen items.
+        """
+        if stratify:
+            chosen = dict((_k, self._sample(sorted(_v)))
+                          for _k, _v in groups.items() if _v)
+        else:
+            chosen = collections.defaultdict(list)
+            for group, item in self._sample(sorted(
+                    (_k, _i) for _k, _v in groups.items() for _i in _v)):
+                chosen[group].append(item)
+        self.coverage[kind] = (sum(len(_i) for _i in chosen.values()),
+                               sum(len(_i) for _i in groups.values()))
+        return chosen
+
+    def select_waveforms(self, wf):
+        """
+        Reduce the ``Waveforms`` group of a header to the sampled waveforms.
+        All stations and their StationXML documents are kept.
+        """
+        chosen = self.select("waveforms", dict(
+            (_k, [_i for _i in _v["datasets"] if _i != "StationXML"])
+            for _k, _v in wf.items()),
+            stratify=self.strategy == "station")
+        return self._subset(wf, chosen, keep=["StationXML"])
+
+    def select_auxiliary_data(self, aux_group):
+        """
+        Reduce the ``AuxiliaryData`` group of a header to the sampled data
+        sets.
+        """
+        chosen = self.select("auxiliary_data", dict(
+            (_k, list(_v.get("datasets", {}))) for _k, _v in
+            aux_group.items()), stratify=self.strategy == "station")
+        return self._subset(aux_group, chosen)
+
+    @staticmethod
+    def _subset(groups, chosen, keep=()):
+        """
+        Reduce the data sets of every group to the chosen ones and the ones
+        named in ``keep``. Groups without chosen data sets are kept so the
+        checks of whole groups still see them.
+        """
+        subset = {}
+        for name, group in groups.items():
+            datasets = group.get("datasets", {})
+            names = set(chosen.get(name, [])).union(keep)
+            subset[name] = dict(group, datasets=dict(
+                (_i, _v) for _i, _v in datasets.items() if _i in names))
+        return subset
+
+    def to_dict(self):
+        """
+        The coverage as a JSON serializable dictionary.
+        """
+        return dict(
+            (kind, {"checked": checked, "total": total,
+                    "error_rate_bound": error_rate_bound(checked)
+                    if checked < total else 0.0})
+            for kind, (checked, total) in self.coverage.items())
@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compiles the ASDF JSON schemas to fast yes/no checks.
+
+A generic JSON schema validator interprets the schema for every node of the
+header and collects all errors along the way - including every branch of
+every ``oneOf`` and a fresh regular expression search per data set name. The
+checks compiled here only answer whether an instance is valid: each part of
+the schema becomes a closure with its regular expressions compiled up front
+and all branches stop at the first failure. ``oneOf`` stops at the second
+matching schema. Headers share equal nodes (see :mod:`asdf_validate.compact`)
+so the result of every object is remembered for the duration of a check.
+
+The verdicts are the same as the ones of :class:`jsonschema.Draft4Validator`
+which is still used to produce the error messages of invalid instances.
+Schemas with keywords not supported here raise :class:`UnsupportedSchema`.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from fractions import Fraction
+import numbers
+import re
+
+# Keywords without influence on the verdict.
+_ANNOTATIONS = set(["$schema", "default", "definitions", "description",
+                    "format", "id", "title"])
+
+_OBJECT_KEYWORDS = set(["additionalProperties", "maxProperties",
+                        "minProperties", "patternProperties", "properties",
+                        "required"])
+
+_KEYWORDS = _OBJECT_KEYWORDS | set([
+    "allOf", "anyOf", "enum", "exclusiveMaximum", "exclusiveMinimum", "items",
+    "maxItems", "maximum", "maxLength", "minItems", "minimum", "minLength",
+    "multipleOf", "not", "oneOf", "pattern", "type"])
+
+_MISSING = object()
+
+
+class UnsupportedSchema(ValueError):
+    pass
+
+
+def _is_number(instance):
+    return isinstance(instance, numbers.Number) and \
+        not isinstance(instance, bool)
+
+
+# The types of draft 4 of JSON schema.
+_TYPES = {
+    "array": lambda x: isinstance(x, list),
+    "boolean": lambda x: isinstance(x, bool),
+    "integer": lambda x: isinstance(x, int) and not isinstance(x, bool),
+    "null": lambda x: x is None,
+    "number": _is_number,
+    "object": lambda x: isinstance(x, dict),
+    "string": lambda x: isinstance(x, str)
+}
+
+
+_TRUE = object()
+_FALSE = object()
+
+
+def _unbool(value):
+    if value is True:
+        return _TRUE
+    elif value is False:
+        return _FALSE
+    return value
+
+
+def _equal(one, two):
+    """
+    Equality of JSON values - ``True`` is not ``1``.
+    """
+    if one is two:
+        return True
+    if isinstance(one, str) or isinstance(two, str):
+        return one == two
+    if isinstance(one, (list, tuple)) and isinstance(two, (list, tuple)):
+        return len(one) == len(two) and \
+            all(_equal(_i, _j) for _i, _j in zip(one, two))
+    if isinstance(one, dict) and isinstance(two, dict):
+        return set(one) == set(two) and \
+            all(_equal(one[_i], two[_i]) for _i in one)
+    return _unbool(one) == _unbool(two)
+
+
+def _is_multiple(instance, divisor):
+    if isinstance(divisor, float):
+        quotient = instance / divisor
+        try:
+            return int(quotient) == quotient
+        except OverflowError:
+            return (Fraction(instance) / Fraction(divisor)).denominator == 1
+    return not instance % divisor
+
+
+def _always(instance, memo):
+    return True
+
+
+class _Compiler(object):
+    def compile(self, schema):
+        if not isinstance(schema, dict):
+            raise UnsupportedSchema("Schemas must be objects.")
+        unknown = set(schema) - _KEYWORDS - _ANNOTATIONS
+        if unknown:
+            raise UnsupportedSchema("Unsupported keywords: %s" % ", ".join(
+                sorted(unknown)))
+
+        checks = []
+        if "type" in schema:
+            checks.append(self._type(schema["type"]))
+        if "enum" in schema:
+            checks.append(self._enum(schema["enum"]))
+        if set(schema) & set(["minimum", "maximum", "multipleOf"]):
+            checks.append(self._number(schema))
+        if set(schema) & set(["minLength", "maxLength", "pattern"]):
+            checks.append(self._string(schema))
+        if set(schema) & set(["items", "minItems", "maxItems"]):
+            checks.append(self._array(schema))
+        if set(schema) & _OBJECT_KEYWORDS:
+            checks.append(self._object(schema))
+        for key in ("allOf", "anyOf", "oneOf"):
+            if key in schema:
+                checks.append(getattr(self, "_" + key.lower())(
+                    [self.compile(_i) for _i in schema[key]]))
+        if "not" in schema:
+            checks.append(self._not(self.compile(schema["not"])))
+
+        checks = [_i for _i in checks if _i is not _always]
+        if not checks:
+            return _always
+        elif len(checks) == 1:
+            return checks[0]
+
+        def check(instance, memo):
+            for _i in checks:
+                if not _i(instance, memo):
+                    return False
+            return True
+        return check
+
+    @staticmethod
+    def _type(types):
+        if not isinstance(types, list):
+            types = [types]
+        try:
+            checks = [_TYPES[_i] for _i in types]
+        except (KeyError, TypeError):
+            raise UnsupportedSchema("Unsupported type: %r" % (types,))
+
+        def check(instance, memo):
+            for _i in checks:
+                if _i(instance):
+                    return True
+            return False
+        return check
+
+    @staticmethod
+    def _enum(values):
+        strings = frozenset(_i for _i in values if isinstance(_i, str))
+        others = [_i for _i in values if not isinstance(_i, str)]
+
+        def check(instance, memo):
+            if isinstance(instance, str):
+                return instance in strings
+            for _i in others:
+                if _equal(_i, instance):
+                    return True
+            return False
+        return check
+
+    @staticmethod
+    def _number(schema):
+        minimum = schema.get("minimum")
+        maximum = schema.get("maximum")
+        exclusive_minimum = schema.get("exclusiveMinimum", False)
+        exclusive_maximum = schema.get("exclusiveMaximum", False)
+        multiple_of = schema.get("multipleOf")
+
+        def check(instance, memo):
+            if not _is_number(instance):
+                return True
+            if minimum is not None:
+                if instance < minimum or \
+                        (exclusive_minimum and instance == minimum):
+                    return False
+            if maximum is not None:
+                if instance > maximum or \
+                        (exclusive_maximum and instance == maximum):
+                    return False
+            if multiple_of is not None and \
+                    not _is_multiple(instance, multiple_of):
+                return False
+            return True
+        return check
+
+    @staticmethod
+    def _string(schema):
+        min_length = schema.get("minLength")
+        max_length = schema.get("maxLength")
+        pattern = schema.get("pattern")
+        if pattern is not None:
+            pattern = re.compile(pattern)
+
+        def check(instance, memo):
+            if not isinstance(instance, str):
+                return True
+            if min_length is not None and len(instance) < min_length:
+                return False
+            if max_length is not None and len(instance) > max_length:
+                return False
+            if pattern is not None and not pattern.search(instance):
+                return False
+            return True
+        return check
+
+    def _array(self, schema):
+        items = schema.get("items", {})
+        min_items = schema.get("minItems")
+        max_items = schema.get("maxItems")
+        if isinstance(items, list):
+            items = [self.compile(_i) for _i in items]
+        else:
+            items = self.compile(items)
+
+        def check(instance, memo):
+            if not isinstance(instance, list):
+                return True
+            if min_items is not None and len(instance) < min_items:
+                return False
+            if max_items is not None and len(instance) > max_items:
+                return False
+            if isinstance(items, list):
+                for _i, _j in zip(items, instance):
+                    if not _i(_j, memo):
+                        return False
+            elif items is not _always:
+                for _i in instance:
+                    if not items(_i, memo):
+                        return False
+            return True
+        return check
+
+    def _object(self, schema):
+        required = list(schema.get("required", []))
+        min_properties = schema.get("minProperties")
+        max_properties = schema.get("maxProperties")
+        properties = [(_i, self.compile(_j))
+                      for _i, _j in sorted(schema.get("properties",
+                                                      {}).items())]
+        known = frozenset(schema.get("properties", {}))
+        patterns = [(re.compile(_i), self.compile(_j))
+                    for _i, _j in sorted(schema.get("patternProperties",
+                                                    {}).items())]
+        patterns = [_i for _i in patterns if _i[1] is not _always]
+        # Like jsonschema - any match of the combined patterns makes a
+        # property not additional.
+        combined = "|".join(schema.get("patternProperties", {}))
+        combined = re.compile(combined) if combined else None
+        additional = schema.get("additionalProperties", True)
+        if isinstance(additional, dict):
+            additional = self.compile(additional)
+            if additional is _always:
+                additional = True
+        elif not isinstance(additional, bool):
+            raise UnsupportedSchema("Invalid additionalProperties.")
+        properties = [_i for _i in properties if _i[1] is not _always]
+
+        def check(instance, memo):
+            if not isinstance(instance, dict):
+                return True
+            # Headers share equal nodes - check each of them only once.
+            key = (id(instance), id(check))
+            result = memo.get(key)
+            if result is None:
+                result = memo[key] = _check(instance, memo)
+            return result
+
+        def _check(instance, memo):
+            for _i in required:
+                if _i not in instance:
+                    return False
+            if min_properties is not None and \
+                    len(instance) < min_properties:
+                return False
+            if max_properties is not None and \
+                    len(instance) > max_properties:
+                return False
+            for name, subschema in properties:
+                value = instance.get(name, _MISSING)
+                if value is not _MISSING and not subschema(value, memo):
+                    return False
+            if not patterns and additional is True:
+                return True
+            for name, value in instance.items():
+                for regex, subschema in patterns:
+                    if regex.search(name) and not subschema(value, memo):
+                        return False
+                if additional is True or name in known or \
+                        (combined is not None and combined.search(name)):
+                    continue
+                if additional is False or not additional(value, memo):
+                    return False
+            return True
+        return check
+
+    @staticmethod
+    def _allof(checks):
+        def check(instance, memo):
+            for _i in checks:
+                if not _i(instance, memo):
+                    return False
+            return True
+        return check
+
+    @staticmethod
+    def _anyof(checks):
+        def check(instance, memo):
+            for _i in checks:
+                if _i(instance, memo):
+                    return True
+            return False
+        return check
+
+    @staticmethod
+    def _oneof(checks):
+        def check(instance, memo):
+            matches = 0
+            for _i in checks:
+                if _i(instance, memo):
+                    matches += 1
+                    if matches > 1:
+                        return False
+            return matches == 1
+        return check
+
+    @staticmethod
+    def _not(subcheck):
+        def check(instance, memo):
+            return not subcheck(instance, memo)
+        return check
+
+
+def compile_schema(schema):
+    """
+    Compile a draft 4 JSON schema without references to a function
+    returning whether an instance is valid.
+
+    Raises :class:`UnsupportedSchema` if the schema uses keywords not
+    supported by the compiler.
+    """
+    check = _Compiler().compile(schema)
+
+    def is_valid(instance):
+        return check(instance, {})
+    return is_valid
+
+
+class FastValidator(object):
+    """
+    Wraps a :class:`jsonschema.Draft4Validator` and only lets it look for
+    errors if the compiled check finds the instance to be invalid.
+
+    :param validator: The wrapped validator.
+    :param is_valid: The compiled check of the schema of the validator or
+        ``None`` to always use the wrapped validator.
+    """
+    def __init__(self, validator, is_valid):
+        self.validator = validator
+        self.schema = validator.schema
+        self._is_valid = is_valid
+
+    def is_valid(self, instance):
+        if self._is_valid is None:
+            return self.validator.is_valid(instance)
+        return self._is_valid(instance)
+
+    def iter_errors(self, instance):
+        if self._is_valid is not None and self._is_valid(instance):
+            return iter([])
+        return self.validator.iter_errors(instance)
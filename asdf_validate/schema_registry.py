@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Process-wide registry of compiled schemas.
+
+Every schema is parsed and compiled once per process and the compiled
+validator objects are reused for all stations and files. The registry is
+thread-safe. lxml validators keep
+the error log of their last validation so they are handed out to one thread
+at a time - concurrent validations compile as many instances as needed and
+reuse them afterwards.
+
+The ASDF JSON schemas can furthermore be persisted to a cache directory in
+their precompiled form: already checked against the JSON schema meta schema
+and with all references to the definitions inlined. lxml has no way to
+serialize compiled RelaxNG or XML schemas so these are only cached in memory.
+
+jsonschema and lxml are only imported once the first schema is needed so
+files failing the early checks never pay for them.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import contextlib
+import copy
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+
+# Directory of the schema files.
+_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schemas")
+
+QUAKEML_SCHEMA = os.path.join(_DIR, "QuakeML-1.2.rng")
+STATIONXML_SCHEMA = os.path.join(_DIR, "fdsn-station-1.0.xsd")
+
+# Dictionaries of ASDF schemas by version number.
+ASDF_SCHEMAS = {
+    "0.0.2": os.path.join(_DIR, "ASDF_0.0.2.json"),
+    "1.0.0": os.path.join(_DIR, "ASDF_1.0.0.json"),
+    "1.0.1": os.path.join(_DIR, "ASDF_1.0.1.json"),
+    "1.0.2": os.path.join(_DIR, "ASDF_1.0.2.json"),
+    "1.0.3": os.path.join(_DIR, "ASDF_1.0.3.json")
+}
+
+
+def _resolve_pointer(document, ref):
+    node = document
+    for part in ref.lstrip("#").strip("/").split("/"):
+        if not part:
+            continue
+        node = node[part.replace("~1", "/").replace("~0", "~")]
+    return node
+
+
+def inline_refs(schema):
+    """
+    Return a copy of the schema with all local references replaced by the
+    schema they point to.
+
+    In draft 4 all other keys next to a ``$ref`` are ignored so this does
+    not change the meaning of the schema. Recursive references are kept.
+    """
+    def _inline(node, active):
+        if isinstance(node, list):
+            return [_inline(_i, active) for _i in node]
+        elif not isinstance(node, dict):
+            return node
+        ref = node.get("$ref")
+        if ref is not None and ref.startswith("#") and ref not in active:
+            return _inline(_resolve_pointer(schema, ref), active | {ref})
+        return dict((key, _inline(value, active))
+                    for key, value in node.items())
+
+    return _inline(schema, frozenset())
+
+
+# Groups whose children are validated as separate shards.
+SHARDED_GROUPS = (("groups", "Waveforms", "groups"),
+                  ("groups", "AuxiliaryData", "groups"))
+
+# Keywords on the way to a sharded group that do not affect its children.
+_PLAIN_KEYWORDS = set(["$schema", "additionalProperties", "definitions",
+                       "description", "id", "properties", "required", "title",
+                       "type"])
+
+
+def shard_schema(schema, locations=SHARDED_GROUPS):
+    """
+    Split a schema into independent schemas for the root of the file and
+    for the children of the given groups.
+
+    The children of the groups are matched by ``patternProperties``. Their
+    schemas are moved to separate shards and replaced by empty schemas in
+    the root schema so it still validates the names of all children.
+
+    Returns the schema of the root and a dictionary mapping the locations
+    to the ``patternProperties`` of the corresponding groups. Groups whose
+    schema cannot be split without changing its meaning are not sharded.
+    """
+    root = copy.deepcopy(schema)
+    shards = {}
+    for location in locations:
+        node = root
+        for key in location:
+            if not isinstance(node, dict) or set(node) - _PLAIN_KEYWORDS:
+                node = None
+                break
+            node = node.get("properties", {}).get(key)
+        if not isinstance(node, dict) or "patternProperties" not in node or \
+                set(node) - _PLAIN_KEYWORDS - set(["patternProperties"]):
+            continue
+        shards[location] = node["patternProperties"]
+        node["patternProperties"] = dict((_i, {}) for _i in shards[location])
+    return root, shards
+
+
+def _compile(schema):
+    from .schema_compiler import UnsupportedSchema, compile_schema
+
+    try:
+        return compile_schema(schema)
+    except UnsupportedSchema:
+        # The validator finds out on its own.
+        return None
+
+
+class SchemaRegistry(object):
+    """
+    Compiles every schema once and hands out the compiled objects.
+
+    :param cache_dir: Optional directory to persist the precompiled ASDF
+        JSON schemas in. Will be created if it does not exist.
+    """
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self._lock = threading.RLock()
+        self._schemas = {}
+        # Compiled lxml schemas not currently in use.
+        self._free = {}
+        self._local = threading.local()
+
+    def _get(self, key, compile_schema):
+        try:
+            return self._schemas[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._schemas:
+                self._schemas[key] = compile_schema()
+            return self._schemas[key]
+
+    def _get_asdf_schema(self, version):
+        return self._get(("ASDF", version),
+                         lambda: self._compile_asdf_schema(version))
+
+    def get_asdf_validator(self, version):
+        """
+        The JSON schema validator for the given ASDF version.
+
+        The reference resolver of a validator is not thread-safe so every
+        thread gets its own validator sharing the compiled schema.
+        """
+        import jsonschema
+
+        validators = self._local.__dict__.setdefault("asdf_validators", {})
+        if version not in validators:
+            validators[version] = jsonschema.Draft4Validator(
+                self._get_asdf_schema(version))
+        return validators[version]
+
+    def get_asdf_shard_validators(self, version):
+        """
+        The validators of the sharded JSON schema for the given ASDF
+        version.
+
+        Returns the validator of the root shard and a dictionary with a list
+        of ``(pattern, validator)`` tuples for the children of each sharded
+        group. See :func:`shard_schema` for details. The validators first
+        check the instances with the compiled schemas of
+        :mod:`asdf_validate.schema_compiler` and only search for errors in
+        invalid instances.
+        """
+        import jsonschema
+        from .schema_compiler import FastValidator
+
+        validators = self._local.__dict__.setdefault("asdf_shards", {})
+        if version not in validators:
+            root, shards = self._get(
+                ("ASDF-shards", version),
+                lambda: shard_schema(self._get_asdf_schema(version)))
+
+            def _validator(schema):
+                # The compiled checks are thread-safe and shared.
+                is_valid = self._get(("ASDF-compiled", id(schema)),
+                                     lambda: _compile(schema))
+                return FastValidator(jsonschema.Draft4Validator(schema),
+                                     is_valid)
+
+            validators[version] = (
+                _validator(root),
+                dict((location, [(pattern, _validator(_i))
+                                 for pattern, _i in sorted(patterns.items())])
+                     for location, patterns in shards.items()))
+        return validators[version]
+
+    def warm_up(self):
+        """
+        Compile all schemas up front, e.g. in long running processes.
+        """
+        for version in ASDF_SCHEMAS:
+            self.get_asdf_shard_validators(version)
+        with self.quakeml_schema():
+            pass
+        with self.stationxml_schema():
+            pass
+
+    @contextlib.contextmanager
+    def _checkout(self, key, compile_schema):
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            schema = free.pop() if free else None
+        if schema is None:
+            schema = compile_schema()
+        try:
+            yield schema
+        finally:
+            with self._lock:
+                self._free[key].append(schema)
+
+    def quakeml_schema(self):
+        """
+        Context manager handing out a compiled QuakeML RelaxNG schema.
+        """
+        from lxml import etree
+
+        return self._checkout("QuakeML", lambda: etree.RelaxNG(
+            etree.parse(QUAKEML_SCHEMA)))
+
+    def stationxml_schema(self):
+        """
+        Context manager handing out a compiled StationXML XML schema.
+        """
+        from lxml import etree
+
+        return self._checkout("StationXML", lambda: etree.XMLSchema(
+            etree.parse(STATIONXML_SCHEMA)))
+
+    def _cache_filename(self, version, data):
+        return os.path.join(self.cache_dir, "ASDF_%s.%s.json" % (
+            version, hashlib.sha256(data).hexdigest()[:16]))
+
+    def _compile_asdf_schema(self, version):
+        import jsonschema
+
+        with io.open(ASDF_SCHEMAS[version], "rb") as fh:
+            data = fh.read()
+
+        cache_file = None
+        if self.cache_dir:
+            cache_file = self._cache_filename(version, data)
+            if os.path.exists(cache_file):
+                with io.open(cache_file, "rt") as fh:
+                    return json.load(fh)
+
+        schema = json.loads(data.decode())
+        # Validate the schema itself to avoid silly errors.
+        jsonschema.Draft4Validator.check_schema(schema)
+        schema = inline_refs(schema)
+
+        if cache_file:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temporary file first so concurrent processes never
+            # see partially written files.
+            fd, tmp_file = tempfile.mkstemp(dir=self.cache_dir)
+            with io.open(fd, "wt") as fh:
+                json.dump(schema, fh)
+            os.rename(tmp_file, cache_file)
+
+        return schema
+
+
+_REGISTRIES = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+def get_registry(cache_dir=None):
+    """
+    Get the process-wide schema registry for the given cache directory.
+    """
+    with _REGISTRIES_LOCK:
+        if cache_dir not in _REGISTRIES:
+            _REGISTRIES[cache_dir] = SchemaRegistry(cache_dir=cache_dir)
+        return _REGISTRIES[cache_dir]
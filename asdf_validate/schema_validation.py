@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Validation of the structure of a file against the ASDF JSON schemas.
+
+The header is validated in shards: the root of the file and each station
+group in ``Waveforms`` and each data type in ``AuxiliaryData`` on its own,
+each against its part of the schema. Shards are independent of each other
+so they can be validated by many processes.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from concurrent import futures
+import re
+
+from .schema_registry import get_registry
+
+
+def hdf5_path(header_path):
+    """
+    Convert the path of an element of the header dictionary to the path of
+    the corresponding object in the HDF5 file.
+    """
+    header_path = list(header_path)
+    names = [name for key, name in zip(header_path[:-1], header_path[1:])
+             if key in ("groups", "datasets")]
+    return "/" + "/".join(names)
+
+
+def _get_errors(validator, instance, prefix, fail_fast):
+    if fail_fast:
+        from jsonschema.exceptions import best_match
+
+        errors = [best_match(validator.iter_errors(instance))]
+        errors = [_i for _i in errors if _i is not None]
+    else:
+        errors = validator.iter_errors(instance)
+    return [(hdf5_path(prefix + tuple(_i.absolute_path)), _i.message)
+            for _i in errors]
+
+
+def _validate_shard(task, registry=None):
+    version, location, pattern, name, instance, schema_cache, fail_fast = task
+    if registry is None:
+        registry = get_registry(schema_cache)
+    _, shards = registry.get_asdf_shard_validators(version)
+    validator = dict(shards[location])[pattern]
+    return _get_errors(validator, instance, location + (name,), fail_fast)
+
+
+def _get_shards(header, shards):
+    """
+    Yield the location, the name, the matching pattern, and the content of
+    all shards below the root.
+    """
+    for location, patterns in sorted(shards.items()):
+        group = header
+        for key in location:
+            group = group.get(key) if isinstance(group, dict) else None
+        if not isinstance(group, dict):
+            continue
+        for name, instance in sorted(group.items()):
+            for pattern, _ in patterns:
+                if re.search(pattern, name):
+                    yield location, name, pattern, instance
+
+
+def get_schema_errors(header, version, registry, fail_fast=False, workers=1):
+    """
+    Validate the header of a file against the ASDF schema.
+
+    :param header: The header as returned by the backends.
+    :param version: The ASDF version.
+    :param registry: The schema registry.
+    :param fail_fast: Only return the first error.
+    :param workers: Validate the shards with this many processes.
+
+    Returns a list of ``(path, message)`` tuples sorted by the path.
+    """
+    root, shards = registry.get_asdf_shard_validators(version)
+    errors = _get_errors(root, header, (), fail_fast)
+    if fail_fast and errors:
+        return errors
+
+    tasks = [(version, location, pattern, name, instance, registry.cache_dir,
+              fail_fast)
+             for location, name, pattern, instance in
+             _get_shards(header, shards)]
+
+    if workers > 1 and len(tasks) > 1 and not fail_fast:
+        with futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(
+                _validate_shard, tasks,
+                chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        results = []
+        for task in tasks:
+            results.append(_validate_shard(task, registry=registry))
+            if fail_fast and results[-1]:
+                break
+
+    for shard_errors in results:
+        errors.extend(shard_errors)
+    return sorted(errors, key=lambda x: x[0])
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Long running validation server.
+
+Starting the validator for every file pays the interpreter startup, the
+imports, and the compilation of the schemas every time. The server does all
+of this once and then validates files on request - over HTTP on localhost
+or over HTTP on a Unix socket::
+
+    $ asdf-validate --serve 127.0.0.1:8765
+    $ curl -d '{"filename": "/data/file.h5"}' http://127.0.0.1:8765/validate
+
+    $ asdf-validate --serve unix:/tmp/asdf_validate.sock
+    $ curl --unix-socket /tmp/asdf_validate.sock \
+        -d '{"filename": "/data/file.h5"}' http://localhost/validate
+
+``POST /validate`` takes a JSON object with the ``filename`` and optionally
+``all_errors`` and returns the same JSON document as the batch mode.
+``GET /status`` returns the number of running and queued validations.
+A bounded number of files is validated concurrently, requests beyond the
+maximum queue length are rejected with status 503.
+
+There is no authentication and any file the server can read can be
+validated, so TCP servers only listen on loopback addresses unless
+``allow_remote`` (``--allow-remote``) is set.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from concurrent import futures
+import http.server
+import ipaddress
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+
+from .batch import exit_on_sigterm, validate_file
+from .validator import Validator
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+
+class QueueFull(Exception):
+    pass
+
+
+class ValidationService(object):
+    """
+    Validates files with warm validators and bounded concurrency.
+
+    :param concurrency: Number of files validated at the same time.
+    :param max_queue: Maximum number of files waiting to be validated.
+
+    All other keyword arguments are passed to
+    :class:`~asdf_validate.validator.Validator`.
+    """
+    def __init__(self, concurrency=4, max_queue=100, **kwargs):
+        self.validators = dict(
+            (_i, Validator(fail_fast=_i, **kwargs)) for _i in (True, False))
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        # Long lived threads keep their per-thread schema validators.
+        self._pool = futures.ThreadPoolExecutor(max_workers=concurrency)
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def warm_up(self):
+        # Both validators share the schemas.
+        self.validators[True].warm_up()
+
+    def validate(self, filename, all_errors=False):
+        """
+        Validate a file and return the result as a dictionary.
+
+        Raises :class:`QueueFull` if too many files are waiting.
+        """
+        with self._lock:
+            if self._pending >= self.concurrency + self.max_queue:
+                raise QueueFull()
+            self._pending += 1
+        try:
+            return self._pool.submit(
+                validate_file, filename,
+                validator=self.validators[not all_errors]).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def status(self):
+        with self._lock:
+            pending = self._pending
+        return {"running": min(pending, self.concurrency),
+                "queued": max(0, pending - self.concurrency),
+                "concurrency": self.concurrency,
+                "max_queue": self.max_queue}
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """
+    Handles the requests of both, TCP and Unix socket servers.
+    """
+    def _respond(self, status, body):
+        data = json.dumps(body, sort_keys=True).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "%i" % len(data))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/status":
+            return self._respond(404, {"error": "Unknown path."})
+        self._respond(200, self.server.service.status())
+
+    def do_POST(self):
+        if self.path != "/validate":
+            return self._respond(404, {"error": "Unknown path."})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length).decode())
+            filename = request["filename"]
+            all_errors = bool(request.get("all_errors", False))
+        except (ValueError, KeyError, TypeError):
+            return self._respond(400, {
+                "error": "Expected a JSON object with a 'filename'."})
+        try:
+            result = self.server.service.validate(filename,
+                                                  all_errors=all_errors)
+        except QueueFull:
+            return self._respond(503, {"error": "Too many queued files."})
+        self._respond(200, result)
+
+    def address_string(self):
+        # Clients of Unix sockets have no address.
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return "unix"
+
+
+class _TCPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _is_loopback(host):
+    """
+    Whether all addresses of the host are loopback addresses.
+    """
+    try:
+        infos = socket.getaddrinfo(host, None)
+    except socket.gaierror:
+        return False
+    return all(ipaddress.ip_address(_i[4][0].split("%")[0]).is_loopback
+               for _i in infos)
+
+
+def create_server(service, address=DEFAULT_ADDRESS, allow_remote=False):
+    """
+    Create the server for ``host:port`` or ``unix:PATH`` addresses.
+
+    Raises a :class:`ValueError` for hosts that are not loopback addresses
+    unless ``allow_remote`` is set, and for Unix socket paths of existing
+    files that are not sockets.
+    """
+    if address.startswith("unix:"):
+        path = address[len("unix:"):]
+        # Remove the socket of a previous run - but nothing else.
+        if os.path.lexists(path):
+            if not stat.S_ISSOCK(os.lstat(path).st_mode):
+                raise ValueError("Refusing to replace '%s' which is not a "
+                                 "socket." % path)
+            os.remove(path)
+        server = _UnixServer(path, _Handler)
+    else:
+        host, _, port = address.rpartition(":")
+        host = host or "127.0.0.1"
+        if not allow_remote and not _is_loopback(host):
+            raise ValueError(
+                "Refusing to serve on '%s' which is reachable from other "
+                "machines. Pass --allow-remote to do so anyway." % host)
+        server = _TCPServer((host, int(port)), _Handler)
+    server.service = service
+    return server
+
+
+def serve(address=DEFAULT_ADDRESS, concurrency=4, max_queue=100,
+          allow_remote=False, **kwargs):
+    """
+    Run the server until interrupted.
+
+    :param allow_remote: Also serve on addresses other machines can reach.
+
+    All other keyword arguments are passed to
+    :class:`~asdf_validate.validator.Validator`.
+    """
+    service = ValidationService(concurrency=concurrency, max_queue=max_queue,
+                                **kwargs)
+    try:
+        server = create_server(service, address, allow_remote=allow_remote)
+    except ValueError as e:
+        service.shutdown()
+        sys.exit("%s" % e)
+    service.warm_up()
+    sys.stderr.write("Serving on %s\n" % address)
+    with exit_on_sigterm():
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            service.shutdown()
+            if address.startswith("unix:"):
+                os.remove(address[len("unix:"):])
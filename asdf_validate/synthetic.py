@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Generator for synthetic ASDF files of arbitrary size.
+
+Used by the benchmarks and some of the tests. Requires ``h5py`` and
+``numpy``.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import calendar
+import datetime
+
+
+QUAKEML = b"""<?xml version='1.0' encoding='utf-8'?>
+<q:quakeml xmlns:q="http://quakeml.org/xmlns/quakeml/1.2"
+           xmlns="http://quakeml.org/xmlns/bed/1.2">
+  <eventParameters publicID="smi:local/synthetic_catalog">
+  </eventParameters>
+</q:quakeml>
+"""
+
+STATIONXML = """<?xml version='1.0' encoding='utf-8'?>
+<FDSNStationXML xmlns="http://www.fdsn.org/xml/station/1" schemaVersion="1.0">
+  <Source>asdf_validate</Source>
+  <Created>2014-01-01T00:00:00</Created>
+  <Network code="{network}">
+    <Station code="{station}">
+      <Latitude>0.0</Latitude>
+      <Longitude>0.0</Longitude>
+      <Elevation>0.0</Elevation>
+      <Site>
+        <Name>Synthetic</Name>
+      </Site>
+      <CreationDate>2014-01-01T00:00:00</CreationDate>
+    </Station>
+  </Network>
+</FDSNStationXML>
+"""
+
+PROVENANCE = """<?xml version='1.0' encoding='utf-8'?>
+<prov:document xmlns:prov="http://www.w3.org/ns/prov#"
+               xmlns:seis_prov="http://seisprov.org/seis_prov/0.1/#">
+  <prov:softwareAgent prov:id="seis_prov:sp{index:03d}_sa_a1b2c3d">
+    <prov:label>asdf_validate</prov:label>
+    <seis_prov:software_name>asdf_validate</seis_prov:software_name>
+    <seis_prov:software_version>0.0.1</seis_prov:software_version>
+    <seis_prov:website>https://github.com/SeismicData/asdf_validate\
+</seis_prov:website>
+  </prov:softwareAgent>
+</prov:document>
+"""
+
+PROVENANCE_ID = "{http://seisprov.org/seis_prov/0.1/#}sp%03i_sa_a1b2c3d"
+
+STARTTIME = datetime.datetime(2014, 1, 1)
+
+
+def _write_xml(group, name, document, maxshape):
+    import numpy as np
+    group.create_dataset(name, data=np.frombuffer(document, dtype=np.int8),
+                         maxshape=maxshape)
+
+
+def _station_name(index):
+    return "XX.S%04i" % index
+
+
+def write_synthetic_asdf(filename, stations=1, traces=1, npts=100,
+                         sampling_rate=1.0, version="1.0.3", aux_data=0,
+                         provenance=0):
+    """
+    Write a valid synthetic ASDF file.
+
+    Waveforms and auxiliary data reference the provenance documents
+    round-robin if there are any.
+
+    :param filename: The file to write. Will be overwritten.
+    :param stations: The number of station groups.
+    :param traces: The number of waveform traces per station.
+    :param npts: The number of samples of each trace.
+    :param sampling_rate: The sampling rate of each trace in Hz.
+    :param version: The value of the ``file_format_version`` attribute.
+    :param aux_data: The number of auxiliary data sets.
+    :param provenance: The number of provenance documents.
+    """
+    import h5py
+    import numpy as np
+
+    starttime = calendar.timegm(STARTTIME.utctimetuple())
+    duration = (npts - 1) / sampling_rate
+    data = np.sin(np.arange(npts, dtype=np.float32))
+    # Version 0.0.2 requires all datasets to be resizable.
+    maxshape = (None,) if version == "0.0.2" else None
+
+    with h5py.File(filename, "w") as f:
+        f.attrs["file_format"] = np.bytes_(b"ASDF")
+        f.attrs["file_format_version"] = np.bytes_(version.encode())
+        _write_xml(f, "QuakeML", QUAKEML, maxshape)
+        prov_group = f.create_group("Provenance")
+        for i in range(provenance):
+            _write_xml(prov_group, "synthetic_%04i" % i,
+                       PROVENANCE.format(index=i).encode(), maxshape)
+
+        def _set_provenance_id(ds, index):
+            if provenance:
+                ds.attrs["provenance_id"] = np.bytes_(
+                    (PROVENANCE_ID % (index % provenance)).encode())
+
+        if aux_data:
+            aux_group = f.create_group("AuxiliaryData").create_group(
+                "Synthetic")
+            for i in range(aux_data):
+                ds = aux_group.create_dataset(
+                    "item_%06i" % i, data=np.arange(npts, dtype=np.float64),
+                    maxshape=maxshape)
+                _set_provenance_id(ds, i)
+
+        waveforms = f.create_group("Waveforms")
+
+        for i in range(stations):
+            network, station = _station_name(i).split(".")
+            group = waveforms.create_group("%s.%s" % (network, station))
+            _write_xml(group, "StationXML", STATIONXML.format(
+                network=network, station=station).encode(), maxshape)
+            for j in range(traces):
+                # Consecutive traces so all names are unique.
+                offset = j * (duration + 1.0 / sampling_rate)
+                start = STARTTIME + datetime.timedelta(seconds=offset)
+                end = start + datetime.timedelta(seconds=duration)
+                name = "%s.%s..BHZ__%s__%s__synthetic" % (
+                    network, station, start.strftime("%Y-%m-%dT%H:%M:%S"),
+                    end.strftime("%Y-%m-%dT%H:%M:%S"))
+                ds = group.create_dataset(name, data=data,
+                                          maxshape=maxshape)
+                ds.attrs["starttime"] = \
+                    np.int64(round((starttime + offset) * 1E9))
+                ds.attrs["sampling_rate"] = np.float64(sampling_rate)
+                _set_provenance_id(ds, i * traces + j)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Parity tests for the different HDF5 backends.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import glob
+import io
+import json
+import os
+import shutil
+
+import jsonschema
+import pytest
+
+pytest.importorskip("h5py")
+
+from .backends import get_backend  # NOQA
+from .h5dump_wrapper import HeaderParser  # NOQA
+from .synthetic import QUAKEML, STATIONXML, write_synthetic_asdf  # NOQA
+
+
+_SCHEMAS = sorted(glob.glob(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "schemas", "ASDF_*.json")))
+VERSIONS = [os.path.basename(_i)[5:-5] for _i in _SCHEMAS]
+
+requires_h5dump = pytest.mark.skipif(
+    not shutil.which("h5dump") or not shutil.which("h5ls"),
+    reason="h5dump and h5ls must be in the PATH.")
+
+# Output of `h5dump -H -u` for a file written with
+# write_synthetic_asdf(filename, stations=1, traces=1).
+H5DUMP_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<HDF5-File>
+<RootGroup OBJ-XID="xid_96" H5Path="/">
+   <Attribute Name="file_format">
+      <Dataspace><ScalarDataspace /></Dataspace>
+      <DataType><AtomicType>
+         <StringType Cset="H5T_CSET_ASCII" StrSize="4"
+                     StrPad="H5T_STR_NULLPAD"/>
+      </AtomicType></DataType>
+      <Data><NoData/></Data>
+   </Attribute>
+   <Attribute Name="file_format_version">
+      <Dataspace><ScalarDataspace /></Dataspace>
+      <DataType><AtomicType>
+         <StringType Cset="H5T_CSET_ASCII" StrSize="5"
+                     StrPad="H5T_STR_NULLPAD"/>
+      </AtomicType></DataType>
+      <Data><NoData/></Data>
+   </Attribute>
+   <Group Name="Provenance" OBJ-XID="xid_1" H5Path="/Provenance"
+          Parents="xid_96" H5ParentPaths="/">
+   </Group>
+   <Dataset Name="QuakeML" OBJ-XID="xid_2" H5Path="/QuakeML"
+            Parents="xid_96" H5ParentPaths="/">
+      <StorageLayout><ContiguousLayout/></StorageLayout>
+      <FillValueInfo FillTime="FillIfSet" AllocationTime="Late">
+         <FillValue><NoFill/></FillValue>
+      </FillValueInfo>
+      <Dataspace>
+         <SimpleDataspace Ndims="1">
+            <Dimension DimSize="{qml}" MaxDimSize="{qml}"/>
+         </SimpleDataspace>
+      </Dataspace>
+      <DataType><AtomicType>
+         <IntegerType ByteOrder="LE" Sign="true" Size="1" />
+      </AtomicType></DataType>
+      <Data><NoData/></Data>
+   </Dataset>
+   <Group Name="Waveforms" OBJ-XID="xid_3" H5Path="/Waveforms"
+          Parents="xid_96" H5ParentPaths="/">
+      <Group Name="XX.S0000" OBJ-XID="xid_4" H5Path="/Waveforms/XX.S0000"
+             Parents="xid_3" H5ParentPaths="/Waveforms">
+         <Dataset Name="StationXML" OBJ-XID="xid_5"
+                  H5Path="/Waveforms/XX.S0000/StationXML"
+                  Parents="xid_4" H5ParentPaths="/Waveforms/XX.S0000">
+            <StorageLayout><ContiguousLayout/></StorageLayout>
+            <Dataspace>
+               <SimpleDataspace Ndims="1">
+                  <Dimension DimSize="{sxml}" MaxDimSize="{sxml}"/>
+               </SimpleDataspace>
+            </Dataspace>
+            <DataType><AtomicType>
+               <IntegerType ByteOrder="LE" Sign="true" Size="1" />
+            </AtomicType></DataType>
+            <Data><NoData/></Data>
+         </Dataset>
+         <Dataset Name="{trace}" OBJ-XID="xid_6"
+                  H5Path="/Waveforms/XX.S0000/{trace}"
+                  Parents="xid_4" H5ParentPaths="/Waveforms/XX.S0000">
+            <StorageLayout><ContiguousLayout/></StorageLayout>
+            <Dataspace>
+               <SimpleDataspace Ndims="1">
+                  <Dimension DimSize="100" MaxDimSize="100"/>
+               </SimpleDataspace>
+            </Dataspace>
+            <DataType><AtomicType>
+               <FloatType ByteOrder="LE" Size="4" SignBitLocation="31"
+                          ExponentBits="8" ExponentLocation="23"
+                          MantissaBits="23" MantissaLocation="0" />
+            </AtomicType></DataType>
+            <Attribute Name="sampling_rate">
+               <Dataspace><ScalarDataspace /></Dataspace>
+               <DataType><AtomicType>
+                  <FloatType ByteOrder="LE" Size="8" SignBitLocation="63"
+                             ExponentBits="11" ExponentLocation="52"
+                             MantissaBits="52" MantissaLocation="0" />
+               </AtomicType></DataType>
+               <Data><NoData/></Data>
+            </Attribute>
+            <Attribute Name="starttime">
+               <Dataspace><ScalarDataspace /></Dataspace>
+               <DataType><AtomicType>
+                  <IntegerType ByteOrder="LE" Sign="true" Size="8" />
+               </AtomicType></DataType>
+               <Data><NoData/></Data>
+            </Attribute>
+            <Data><NoData/></Data>
+         </Dataset>
+      </Group>
+   </Group>
+</RootGroup>
+</HDF5-File>
+"""
+
+
+def _load_schema(version):
+    with io.open(_SCHEMAS[VERSIONS.index(version)], "rt") as fh:
+        return json.load(fh)
+
+
+def test_h5py_header_matches_h5dump_xml(tmpdir):
+    """
+    The h5py backend must produce the same header dictionary as the
+    transformed h5dump XML.
+    """
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=1, traces=1)
+    xml = H5DUMP_HEADER.format(
+        qml=len(QUAKEML),
+        sxml=len(STATIONXML.format(network="XX", station="S0000")),
+        trace="XX.S0000..BHZ__2014-01-01T00:00:00__2014-01-01T00:01:39__"
+              "synthetic")
+
+    assert get_backend("h5py").get_header_as_dict(filename) == \
+        HeaderParser().parse_file(io.BytesIO(xml.encode()))
+
+
+@pytest.mark.parametrize("version", VERSIONS)
+def test_h5py_header_validates_against_schema(tmpdir, version):
+    """
+    Synthetic files must be valid for all bundled schema versions.
+    """
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=2, traces=2, version=version)
+    header = get_backend("h5py").get_header_as_dict(filename)
+    jsonschema.validate(header, _load_schema(version))
+
+
+@requires_h5dump
+@pytest.mark.parametrize("version", VERSIONS)
+def test_backend_parity(tmpdir, version):
+    """
+    Compare both backends on real files for all bundled schema versions.
+    """
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=2, traces=3, version=version)
+
+    h5dump = get_backend("h5dump")
+    h5py = get_backend("h5py")
+
+    assert h5py.is_hdf5_file(filename) is h5dump.is_hdf5_file(filename)
+    assert h5py.get_header_as_dict(filename) == \
+        h5dump.get_header_as_dict(filename)
+    assert h5py.get_attributes(filename, ["/Waveforms"]) == \
+        h5dump.get_attributes(filename, ["/Waveforms"])
+    for attribute in ("file_format", "file_format_version"):
+        assert h5py.get_string_attribute(filename, attribute) == \
+            h5dump.get_string_attribute(filename, attribute)
+
+    for backend in (h5dump, h5py):
+        assert backend.read_array(filename, "/QuakeML") == QUAKEML
+        output = os.path.join(tmpdir.strpath, backend.name + ".xml")
+        backend.dump_array_to_file(filename, "/QuakeML", output)
+        with io.open(output, "rb") as fh:
+            assert fh.read() == QUAKEML
+
+
+def test_h5py_attributes(tmpdir):
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=1, traces=2)
+    backend = get_backend("h5py")
+
+    assert backend.is_hdf5_file(filename)
+    assert backend.get_string_attribute(filename, "file_format") == "ASDF"
+    assert backend.read_array(filename, "/QuakeML") == QUAKEML
+    attributes = backend.get_attributes(filename, ["/Waveforms"])
+    assert len(attributes) == 2
+    for value in attributes.values():
+        assert value["sampling_rate"] == 1.0
+        assert isinstance(value["starttime"], int)
+
+    with pytest.raises(SystemExit):
+        backend.get_string_attribute(filename, "random")
+
+
+@pytest.mark.parametrize("backend", [
+    "h5py", pytest.param("h5dump", marks=requires_h5dump)])
+def test_non_scalar_attributes(tmpdir, backend):
+    """
+    Both backends return all values of non-scalar attributes as flat lists.
+    """
+    import h5py
+    import numpy as np
+
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=1, traces=1)
+    with h5py.File(filename, "a") as f:
+        dataset = f.create_dataset("AuxiliaryData/Test/a", data=[1.0, 2.0])
+        dataset.attrs["scalar"] = 1.5
+        dataset.attrs["values"] = np.array([1, 2], dtype=np.int32)
+        dataset.attrs["matrix"] = np.array([[1, 2], [3, 4]], dtype=np.int64)
+        dataset.attrs["names"] = np.array([b"a", b"b, c"])
+
+    attributes = get_backend(backend).get_attributes(
+        filename, ["/AuxiliaryData"])
+    assert attributes == {"/AuxiliaryData/Test/a": {
+        "scalar": 1.5, "values": [1, 2], "matrix": [1, 2, 3, 4],
+        "names": ["a", "b, c"]}}
+
+
+@pytest.mark.parametrize("backend", [
+    "h5py", pytest.param("h5dump", marks=requires_h5dump)])
+def test_iter_array(tmpdir, backend):
+    """
+    Contiguous and chunked datasets are read in chunks of the same data.
+    """
+    import h5py
+    import numpy as np
+
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    data = np.arange(1000, dtype=">f8")
+    with h5py.File(filename, "w") as f:
+        f.create_dataset("contiguous", data=data)
+        f.create_dataset("chunked", data=data, chunks=(64,),
+                         compression="gzip")
+
+    backend = get_backend(backend)
+    for name in ("contiguous", "chunked"):
+        chunks = list(backend.iter_array(filename, name, data.dtype, 800))
+        assert [len(_i) for _i in chunks] == [100] * 10
+        np.testing.assert_array_equal(np.concatenate(chunks), data)
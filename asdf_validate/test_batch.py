@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test cases for the batch mode.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import io
+import os
+
+from .batch import find_files
+
+
+def test_find_files(tmpdir):
+    """
+    Tests assembling the list of files from paths, directories and lists.
+    """
+    root = tmpdir.strpath
+    os.makedirs(os.path.join(root, "a", "b"))
+    for name in ["1.h5", "2.txt", os.path.join("a", "3.h5"),
+                 os.path.join("a", "b", "4.h5")]:
+        with io.open(os.path.join(root, name), "wb") as fh:
+            fh.write(b"")
+    file_list = os.path.join(root, "list.txt")
+    with io.open(file_list, "wt") as fh:
+        fh.write("x.h5\n\n  y.h5\n")
+
+    # Directories are only searched in recursive mode.
+    assert find_files([root]) == [root]
+    assert find_files([root], recursive=True) == [
+        os.path.join(root, "1.h5"),
+        os.path.join(root, "a", "3.h5"),
+        os.path.join(root, "a", "b", "4.h5")]
+    assert find_files([os.path.join(root, "a")], recursive=True,
+                      pattern="4.*") == [os.path.join(root, "a", "b", "4.h5")]
+    assert find_files(["z.h5"], file_list=file_list) == \
+        ["z.h5", "x.h5", "y.h5"]
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test cases for the validation cache.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+
+import pytest
+
+from . import xml_validation
+from .cache import ResultMemo, ValidationCache
+from .validator import Validator
+
+
+def test_eviction(tmpdir):
+    """
+    The least recently used entries are evicted first.
+    """
+    cache = ValidationCache(tmpdir.strpath, max_size=50)
+    for key in "abcd":
+        cache.set(key, "x" * 20)
+    # Access the oldest entry.
+    assert cache.get("a") == "x" * 20
+    cache.evict()
+    assert cache.get("a") == "x" * 20
+    assert cache.get("b") is None
+    assert cache.get("c") is None
+    assert cache.get("d") == "x" * 20
+
+
+def test_only_changes_are_validated(tmpdir, monkeypatch):
+    """
+    After appending a station only its StationXML is validated again.
+    """
+    h5py = pytest.importorskip("h5py")
+    from .synthetic import STATIONXML, write_synthetic_asdf, _write_xml
+
+    validated = []
+
+    def validate_stationxml(data, registry):
+        validated.append(data)
+        return []
+
+    monkeypatch.setitem(xml_validation.VALIDATORS, "StationXML",
+                        validate_stationxml)
+    # Only test the persistent cache.
+    monkeypatch.setattr(xml_validation, "_RESULTS", ResultMemo(0))
+
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=3, traces=1)
+    validator = Validator(backend="h5py",
+                          cache_dir=os.path.join(tmpdir.strpath, "cache"))
+
+    assert validator.validate(filename).is_valid
+    assert len(validated) == 3
+    # Nothing changed.
+    assert validator.validate(filename).is_valid
+    assert len(validated) == 3
+
+    with h5py.File(filename, "a") as f:
+        group = f["Waveforms"].create_group("XX.S0003")
+        _write_xml(group, "StationXML", STATIONXML.format(
+            network="XX", station="S0003").encode(), maxshape=(None,))
+    assert validator.validate(filename).is_valid
+    assert len(validated) == 4
+    assert b'code="S0003"' in validated[-1]
+
+
+def test_cache_version(tmpdir):
+    """
+    Values written by another version of the validator are dropped.
+    """
+    ValidationCache(tmpdir.strpath, version="a").set("key", 1)
+    assert ValidationCache(tmpdir.strpath, version="a").get("key") == 1
+    assert ValidationCache(tmpdir.strpath, version="b").get("key") is None
+    assert ValidationCache(tmpdir.strpath, version="a").get("key") is None
+
+
+def test_cached_reports(tmpdir):
+    """
+    Reports depend on the backend and files that cannot be opened are not
+    cached.
+    """
+    pytest.importorskip("h5py")
+    from .synthetic import write_synthetic_asdf
+
+    cache_dir = os.path.join(tmpdir.strpath, "cache")
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=1, traces=1)
+    broken = os.path.join(tmpdir.strpath, "broken.h5")
+    with open(broken, "wb") as fh:
+        fh.write(b"not an HDF5 file")
+
+    validator = Validator(backend="h5py", cache_dir=cache_dir)
+    assert validator.validate(filename).is_valid
+    assert not validator.validate(broken).is_valid
+    assert validator.cache.get(validator._report_key(filename)) is not None
+    assert validator.cache.get(validator._report_key(broken)) is None
+    assert Validator(backend="h5dump", cache_dir=cache_dir)._report_key(
+        filename) != validator._report_key(filename)
+
+
+def test_unusable_cache(tmpdir, capsys):
+    """
+    Validations continue without a cache that cannot be created.
+    """
+    pytest.importorskip("h5py")
+    from .synthetic import write_synthetic_asdf
+
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=1, traces=1)
+    # A directory below a regular file.
+    validator = Validator(backend="h5py",
+                          cache_dir=os.path.join(filename, "cache"))
+    assert validator.cache is None
+    assert validator.validate(filename).is_valid
+    assert "Not using the cache" in capsys.readouterr().err
+
+
+def test_profiles_are_not_cached(tmpdir):
+    pytest.importorskip("h5py")
+    from .synthetic import write_synthetic_asdf
+
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=1, traces=1)
+    validator = Validator(backend="h5py", profile=True,
+                          cache_dir=os.path.join(tmpdir.strpath, "cache"))
+    for _ in range(2):
+        report = validator.validate(filename)
+        assert report.profile.to_dict()["phases"]["schema"] > 0
+
+
+def test_cache_is_opened_lazily(tmpdir):
+    """
+    Missing files never open the cache.
+    """
+    cache_dir = os.path.join(tmpdir.strpath, "cache")
+    validator = Validator(backend="h5py", cache_dir=cache_dir)
+    report = validator.validate(os.path.join(tmpdir.strpath, "missing.h5"))
+    assert [_i.check for _i in report.errors] == ["file"]
+    assert not os.path.exists(cache_dir)
@@ -15,12 +15,24 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
 import collections
+import json
 import os
 import subprocess
+import sys
 
 import pytest
 
 
+@pytest.fixture(autouse=True)
+def cache_home(tmpdir, monkeypatch):
+    """
+    Keep the default cache of the command line program out of the home
+    directory.
+    """
+    monkeypatch.setenv("XDG_CACHE_HOME", os.path.join(tmpdir.strpath,
+                                                      "cache"))
+
+
 @pytest.fixture
 def cli(request):
     """
@@ -59,6 +71,28 @@ def test_non_existing_file(tmpdir, cli):
     assert "does not exist" in output.stderr.lower()
 
 
+def test_startup_imports(tmpdir):
+    """
+    Files failing the first checks must not import the heavy dependencies.
+    """
+    code = ("import sys; from asdf_validate.validator import main; "
+            "sys.argv = ['asdf-validate', %r]; main()" % os.path.join(
+                tmpdir.strpath, "random"))
+    p = subprocess.Popen([sys.executable, "-X", "importtime", "-c", code],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, stderr = p.communicate()
+    assert p.returncode == 1
+
+    # Lines of the form "import time: self [us] | cumulative | module".
+    imports = set(_i.split("|")[2].strip()
+                  for _i in stderr.decode().splitlines()
+                  if _i.startswith("import time:"))
+    assert "asdf_validate.validator" in imports
+    for module in ("numpy", "jsonschema", "lxml", "h5py",
+                   "seis_prov_validate", "multiprocessing"):
+        assert module not in imports
+
+
 def test_error_message_not_a_file(tmpdir, cli):
     """
     Tests the error message if the given path is not a file.
@@ -84,3 +118,24 @@ def test_not_an_hdf5_file(tmpdir, cli):
     assert output.exit_status == 1
     assert output.stdout == ""
     assert "not an hdf5 file" in output.stderr.lower()
+
+
+def test_batch_mode(tmpdir, cli):
+    """
+    Passing multiple files writes one JSON document per file.
+    """
+    filename = os.path.join(tmpdir.strpath, "bla.h5")
+    with open(filename, "w") as fh:
+        fh.write("aasd;flkjasdl;fj")
+    missing = os.path.join(tmpdir.strpath, "random.h5")
+
+    output = cli.run("asdf-validate --workers 2 %s %s" % (filename, missing))
+
+    assert output.exit_status == 1
+    assert "0 of 2 files are valid" in output.stderr
+    results = sorted((json.loads(_i) for _i in output.stdout.splitlines()),
+                     key=lambda x: x["filename"])
+    assert [_i["filename"] for _i in results] == [filename, missing]
+    assert not any(_i["valid"] for _i in results)
+    assert "not an hdf5 file" in results[0]["message"].lower()
+    assert "does not exist" in results[1]["message"].lower()
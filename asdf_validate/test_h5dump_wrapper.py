@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test cases for the h5dump wrapper.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+import stat
+import sys
+
+import pytest
+
+from .h5dump_wrapper import (HeaderParser, _parse_attribute_dump,
+                             _run_h5dump, read_array)
+
+
+ATTRIBUTE_DUMP = """
+HDF5 "test.h5" {
+GROUP "/Waveforms" {
+   GROUP "AA.BB" {
+      DATASET "AA.BB..BHZ__2014-01-01T00:00:00__2014-01-01T00:01:39__raw" {
+         DATATYPE  H5T_IEEE_F32LE
+         DATASPACE  SIMPLE { ( 100 ) / ( 100 ) }
+         ATTRIBUTE "provenance_id" {
+            DATATYPE  H5T_STRING {
+               STRSIZE 24;
+               STRPAD H5T_STR_NULLPAD;
+               CSET H5T_CSET_ASCII;
+               CTYPE H5T_C_S1;
+            }
+            DATASPACE  SCALAR
+            DATA {
+            (0): "{http://example.org}a\\000\\000"
+            }
+         }
+         ATTRIBUTE "sampling_rate" {
+            DATATYPE  H5T_IEEE_F64LE
+            DATASPACE  SCALAR
+            DATA {
+            (0): 1.5
+            }
+         }
+         ATTRIBUTE "starttime" {
+            DATATYPE  H5T_STD_I64LE
+            DATASPACE  SCALAR
+            DATA {
+            (0): 1388534400000000000
+            }
+         }
+      }
+      DATASET "StationXML" {
+         DATATYPE  H5T_STD_I8LE
+         DATASPACE  SIMPLE { ( 10 ) / ( H5S_UNLIMITED ) }
+      }
+   }
+}
+GROUP "/AuxiliaryData" {
+   GROUP "Test" {
+      DATASET "a" {
+         DATATYPE  H5T_IEEE_F64LE
+         DATASPACE  SIMPLE { ( 2 ) / ( 2 ) }
+         ATTRIBUTE "values" {
+            DATATYPE  H5T_STD_I32LE
+            DATASPACE  SIMPLE { ( 2 ) / ( 2 ) }
+            DATA {
+            (0): 1, 2
+            }
+         }
+         ATTRIBUTE "matrix" {
+            DATATYPE  H5T_STD_I64LE
+            DATASPACE  SIMPLE { ( 2, 2 ) / ( 2, 2 ) }
+            DATA {
+            (0,0): 1, 2,
+            (1,0): 3, 4
+            }
+         }
+         ATTRIBUTE "names" {
+            DATATYPE  H5T_STRING {
+               STRSIZE 4;
+               STRPAD H5T_STR_NULLPAD;
+               CSET H5T_CSET_ASCII;
+               CTYPE H5T_C_S1;
+            }
+            DATASPACE  SIMPLE { ( 2 ) / ( 2 ) }
+            DATA {
+            (0): "a\\000\\000\\000", "b, c"
+            }
+         }
+      }
+   }
+}
+}
+"""
+
+HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<hdf5:HDF5-File xmlns:hdf5="http://hdfgroup.org/HDF5/XML/schema/HDF5-File.xsd">
+<hdf5:RootGroup OBJ-XID="xid_96" H5Path="/">
+   <hdf5:Group Name="Data" OBJ-XID="xid_1" H5Path="/Data" Parents="xid_96"
+               H5ParentPaths="/">
+      <hdf5:Dataset Name="a" OBJ-XID="xid_2" H5Path="/Data/a"
+                    Parents="xid_1" H5ParentPaths="/Data">
+         <hdf5:StorageLayout><hdf5:ContiguousLayout/></hdf5:StorageLayout>
+         <hdf5:Dataspace>
+            <hdf5:SimpleDataspace Ndims="2">
+               <hdf5:Dimension DimSize="3" MaxDimSize="UNLIMITED"/>
+               <hdf5:Dimension DimSize="4" MaxDimSize="4"/>
+            </hdf5:SimpleDataspace>
+         </hdf5:Dataspace>
+         <hdf5:DataType><hdf5:CompoundType>
+            <hdf5:Field FieldName="x"><hdf5:DataType><hdf5:AtomicType>
+               <hdf5:IntegerType ByteOrder="BE" Sign="false" Size="2"/>
+            </hdf5:AtomicType></hdf5:DataType></hdf5:Field>
+         </hdf5:CompoundType></hdf5:DataType>
+         <hdf5:Attribute Name="b">
+            <hdf5:Dataspace><hdf5:ScalarDataspace/></hdf5:Dataspace>
+            <hdf5:DataType><hdf5:AtomicType>
+               <hdf5:StringType Cset="H5T_CSET_ASCII" StrSize="H5T_VARIABLE"
+                                StrPad="H5T_STR_NULLTERM"/>
+            </hdf5:AtomicType></hdf5:DataType>
+            <hdf5:Data><hdf5:NoData/></hdf5:Data>
+         </hdf5:Attribute>
+         <hdf5:Data><hdf5:NoData/></hdf5:Data>
+      </hdf5:Dataset>
+   </hdf5:Group>
+   <hdf5:Group Name="empty" OBJ-XID="xid_3" H5Path="/empty"
+               Parents="xid_96" H5ParentPaths="/"/>
+</hdf5:RootGroup>
+</hdf5:HDF5-File>
+"""
+
+
+def test_header_parser():
+    """
+    Tests the streaming header parser with data arriving in small chunks.
+    """
+    parser = HeaderParser()
+    data = HEADER.encode()
+    for i in range(0, len(data), 7):
+        parser.feed(data[i:i + 7])
+
+    assert parser.close() == {"groups": {
+        "Data": {"datasets": {"a": {
+            "Dataspace": {"SimpleDataspace": {
+                "@Ndims": 2,
+                "Dimension": [{"@DimSize": 3, "@MaxDimSize": "UNLIMITED"},
+                              {"@DimSize": 4, "@MaxDimSize": 4}]}},
+            "DataType": {"CompoundType": {"Field": {
+                "@FieldName": "x",
+                "DataType": {"IntegerType": {
+                    "@ByteOrder": "BE", "@Sign": False, "@Size": 2}}}}},
+            "attributes": {"b": {
+                "Dataspace": {"ScalarDataspace": None},
+                "DataType": {"StringType": {
+                    "@Cset": "H5T_CSET_ASCII", "@StrSize": "H5T_VARIABLE",
+                    "@StrPad": "H5T_STR_NULLTERM"}}}}}}},
+        "empty": {}}}
+
+
+def test_header_parser_shares_equal_nodes():
+    """
+    Equal datasets are only stored once.
+    """
+    start = HEADER.index("      <hdf5:Dataset")
+    end = HEADER.index("      </hdf5:Dataset>") + len("      </hdf5:Dataset>")
+    header = HEADER[:end] + HEADER[start:end].replace(
+        'Name="a"', 'Name="b"') + HEADER[end:]
+
+    parser = HeaderParser()
+    parser.feed(header.encode())
+    datasets = parser.close()["groups"]["Data"]["datasets"]
+    assert sorted(datasets) == ["a", "b"]
+    assert datasets["a"] is datasets["b"]
+    assert datasets["a"]["attributes"]["b"]["DataType"]["StringType"] == {
+        "@Cset": "H5T_CSET_ASCII", "@StrSize": "H5T_VARIABLE",
+        "@StrPad": "H5T_STR_NULLTERM"}
+
+
+def test_parse_attribute_dump():
+    """
+    Tests parsing of the bulk attribute output of h5dump.
+    """
+    attributes = _parse_attribute_dump(ATTRIBUTE_DUMP.encode().splitlines())
+    wf = "/Waveforms/AA.BB/" \
+        "AA.BB..BHZ__2014-01-01T00:00:00__2014-01-01T00:01:39__raw"
+    assert sorted(attributes.keys()) == ["/AuxiliaryData/Test/a", wf]
+    assert attributes[wf] == {
+        "provenance_id": "{http://example.org}a",
+        "sampling_rate": 1.5,
+        "starttime": 1388534400000000000}
+    assert attributes["/AuxiliaryData/Test/a"] == {
+        "values": [1, 2], "matrix": [1, 2, 3, 4], "names": ["a", "b, c"]}
+
+
+@pytest.fixture
+def fake_h5dump(tmpdir, monkeypatch):
+    """
+    Puts a fake h5dump in the PATH which writes the name of the requested
+    dataset as binary output and some noise to stdout.
+    """
+    bin_dir = os.path.join(tmpdir.strpath, "bin")
+    os.makedirs(bin_dir)
+    script = os.path.join(bin_dir, "h5dump")
+    with open(script, "w") as fh:
+        fh.write("#!/bin/sh\n"
+                 "echo 'HDF5 header noise'\n"
+                 "if [ \"$2\" = \"/missing\" ]; then\n"
+                 "  echo 'unable to open dataset' >&2; exit 1\n"
+                 "fi\n"
+                 "printf '%s' \"$2\" > \"$5\"\n")
+    os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", bin_dir + os.pathsep + os.environ["PATH"])
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    with open(filename, "wb") as fh:
+        fh.write(b"")
+    return filename
+
+
+def test_read_array(fake_h5dump):
+    """
+    The binary output of h5dump is read through a pipe.
+    """
+    assert read_array(fake_h5dump, "/QuakeML") == b"/QuakeML"
+
+    with pytest.raises(SystemExit) as e:
+        read_array(fake_h5dump, "/missing")
+    assert "unable to open dataset" in str(e.value)
+
+
+def test_run_h5dump_collects_stderr():
+    """
+    Lots of output on stderr does not block the parsing of stdout.
+    """
+    code = ("import sys; sys.stderr.write('x' * 200000); "
+            "sys.stdout.write('y' * 200000)")
+    sizes = []
+    with pytest.raises(SystemExit) as e:
+        _run_h5dump([sys.executable, "-c", code],
+                    lambda fh: sizes.append(len(fh.read())))
+    assert sizes == [200000]
+    assert "x" * 1000 in str(e.value)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test cases for the validation of remote files.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import functools
+import http.server
+import io
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+from .remote import LocalSource, RangeCache, RemoteFile
+
+
+class _RangeHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serves files with support for single byte ranges like object stores do
+    - except for files in ``norange/``.
+    """
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        match = re.match(r"^bytes=(\d+)-(\d+)$", self.headers.get("Range", ""))
+        if not os.path.isfile(path) or match is None or \
+                self.path.startswith("/norange/"):
+            return http.server.SimpleHTTPRequestHandler.do_GET(self)
+        size = os.path.getsize(path)
+        start, stop = int(match.group(1)), min(int(match.group(2)) + 1, size)
+        with io.open(path, "rb") as fh:
+            fh.seek(start)
+            data = fh.read(stop - start)
+        self.send_response(206)
+        self.send_header("Content-Range", "bytes %i-%i/%i" % (
+            start, stop - 1, size))
+        self.send_header("Content-Length", "%i" % len(data))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _serve(directory, port):
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(_RangeHandler,
+                                            directory=directory))
+    port.put(server.server_address[1])
+    server.serve_forever()
+
+
+@pytest.fixture
+def server(tmpdir):
+    """
+    Serves the temporary directory from another process - h5py holds a
+    global lock while reading remote files which objects garbage collected
+    in a server thread of this process would wait for.
+    """
+    port = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve,
+                                      args=(tmpdir.strpath, port))
+    process.daemon = True
+    process.start()
+    try:
+        yield "http://127.0.0.1:%i/" % port.get(timeout=30)
+    finally:
+        process.terminate()
+        process.join()
+
+
+def test_range_cache(tmpdir):
+    """
+    Reads are served from cached blocks and missing neighbouring blocks are
+    fetched at once.
+    """
+    filename = os.path.join(tmpdir.strpath, "data")
+    data = bytes(bytearray(range(256))) * 40
+    with io.open(filename, "wb") as fh:
+        fh.write(data)
+
+    cache = RangeCache(LocalSource(filename), block_size=1000,
+                       max_size=5000)
+    assert cache.read(1500, 3000) == data[1500:4500]
+    assert (cache.requests, cache.bytes_fetched) == (1, 4000)
+    assert cache.read(1000, 10) == data[1000:1010]
+    assert cache.requests == 1
+    # Only the missing blocks are fetched.
+    assert cache.read(0, 6000) == data[:6000]
+    assert (cache.requests, cache.bytes_fetched) == (3, 6000)
+    assert cache.read(10230, 100) == data[10230:]
+    assert cache.read(20000, 100) == b""
+
+    f = RemoteFile(cache)
+    f.seek(-10, io.SEEK_END)
+    assert f.read() == data[-10:]
+    f.seek(5)
+    assert f.read(5) == data[5:10] and f.tell() == 10
+
+
+def test_failed_open_of_remote_file():
+    """
+    A read failing while h5py opens a file must not crash the interpreter at
+    exit.
+    """
+    pytest.importorskip("h5py")
+    code = "\n".join([
+        "from asdf_validate.h5py_wrapper import is_hdf5_file",
+        "from asdf_validate import remote",
+        "class Source(object):",
+        "    def get_size(self):",
+        "        return 100000",
+        "    def fetch(self, start, stop):",
+        "        raise IOError('HTTP Error 403: Forbidden')",
+        "remote.get_source = lambda url: Source()",
+        "is_hdf5_file('http://localhost/test.h5')"])
+    p = subprocess.Popen([sys.executable, "-c", code],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, stderr = p.communicate()
+    assert p.returncode == 1
+    assert b"403" in stderr
+
+
+def test_validate_remote_file(tmpdir, server):
+    pytest.importorskip("h5py")
+    from .synthetic import write_synthetic_asdf
+    from .validator import check
+
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=4, traces=4, npts=100000)
+    url = server + "test.h5"
+
+    local = check(filename, backend="h5py")
+    report = check(url, backend="h5py", profile=True)
+    assert report.is_valid
+    assert report.findings == local.findings
+    # Only the metadata and the XML documents are fetched.
+    profile = report.to_dict()["profile"]
+    assert 0 < profile["bytes_fetched"] < os.path.getsize(filename) / 2
+    assert profile["range_requests"] < 20
+
+    report = check(url, backend="h5py", check_data=True, profile=True)
+    assert report.is_valid
+    assert report.profile.bytes_fetched >= os.path.getsize(filename) * 0.9
+
+    report = check(server + "missing.h5", backend="h5py")
+    assert [_i.check for _i in report.errors] == ["read"]
+    report = check(url, backend="h5dump")
+    assert "h5py backend" in report.errors[0].message
+
+
+def test_failing_remote_file(tmpdir, server, monkeypatch):
+    """
+    Failing requests are reported as read errors at any point of the
+    validation.
+    """
+    pytest.importorskip("h5py")
+    from . import remote
+    from .synthetic import write_synthetic_asdf
+    from .validator import check
+
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=4, traces=4, npts=100000)
+    fetch = remote.HTTPSource.fetch
+
+    for successful in range(4):
+        requests = []
+
+        def _fetch(self, start, stop):
+            requests.append(start)
+            if len(requests) > successful:
+                raise IOError("HTTP Error 403: Forbidden")
+            return fetch(self, start, stop)
+
+        monkeypatch.setattr(remote.HTTPSource, "fetch", _fetch)
+        report = check(server + "test.h5", backend="h5py", check_data=True)
+        assert [_i.check for _i in report.errors] == ["read"]
+        assert "403" in report.errors[0].message
+
+
+def test_server_without_ranges(tmpdir, server):
+    """
+    Files are never downloaded completely for every block.
+    """
+    from .remote import HTTPSource
+
+    os.makedirs(os.path.join(tmpdir.strpath, "norange"))
+    for name in ("data", "norange/data"):
+        with io.open(os.path.join(tmpdir.strpath, name), "wb") as fh:
+            fh.write(b"1234567890")
+    assert HTTPSource(server + "data").fetch(2, 5) == b"345"
+    with pytest.raises(IOError) as e:
+        HTTPSource(server + "norange/data").fetch(2, 5)
+    assert "range requests" in str(e.value)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Differential tests of the compiled schemas against jsonschema.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import json
+import os
+import random
+
+import jsonschema
+import pytest
+
+from .schema_compiler import UnsupportedSchema, compile_schema
+from .schema_registry import ASDF_SCHEMAS, get_registry
+from .schema_validation import _get_shards
+
+# Replacement values for the mutated headers.
+_VALUES = [None, True, False, 0, 1, -1, 1.0, 2.5, 2 ** 40, "", "a",
+           "H5T_STD_I32LE", "SimpleDataspace", [], [1], {}, {"a": 1}]
+
+
+def _paths(node, path=()):
+    yield path
+    if isinstance(node, dict):
+        for key, value in node.items():
+            for _i in _paths(value, path + (key,)):
+                yield _i
+    elif isinstance(node, list):
+        for key, value in enumerate(node):
+            for _i in _paths(value, path + (key,)):
+                yield _i
+
+
+def _mutate(header, rng):
+    """
+    Return a copy of the header with a random modification.
+    """
+    header = json.loads(json.dumps(header))
+    path = rng.choice(list(_paths(header))[1:])
+    parent = header
+    for key in path[:-1]:
+        parent = parent[key]
+    key = path[-1]
+    action = rng.choice(["replace", "delete", "rename", "add"])
+    if action == "replace" or isinstance(parent, list):
+        parent[key] = rng.choice(_VALUES)
+    elif action == "delete":
+        del parent[key]
+    elif action == "rename":
+        parent[key + rng.choice(["_", "x", "__a"])] = parent.pop(key)
+    else:
+        parent[rng.choice(["random", "XX.S", "a__b__c__d"])] = \
+            rng.choice(_VALUES)
+    return header
+
+
+@pytest.mark.parametrize("version", sorted(ASDF_SCHEMAS))
+def test_compiled_schema_matches_jsonschema(tmpdir, version):
+    pytest.importorskip("h5py")
+    from .h5py_wrapper import get_header_as_dict
+    from .synthetic import write_synthetic_asdf
+
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=2, traces=2, version=version)
+    header = get_header_as_dict(filename)
+
+    registry = get_registry()
+    schema = registry.get_asdf_validator(version).schema
+    validator = jsonschema.Draft4Validator(schema)
+    is_valid = compile_schema(schema)
+    root, shards = registry.get_asdf_shard_validators(version)
+
+    rng = random.Random(12345)
+    verdicts = set()
+    for header in [header] + [_mutate(header, rng) for _ in range(300)]:
+        expected = validator.is_valid(header)
+        assert is_valid(header) is expected
+        assert root.is_valid(header) is root.validator.is_valid(header)
+        for location, _, pattern, instance in _get_shards(header, shards):
+            shard = dict(shards[location])[pattern]
+            assert shard.is_valid(instance) is \
+                shard.validator.is_valid(instance)
+        verdicts.add(expected)
+    # Make sure the mutations test both verdicts.
+    assert verdicts == set([True, False])
+
+
+@pytest.mark.parametrize("schema, valid, invalid", [
+    ({"type": "integer"}, [1, 2 ** 70], [1.0, True, "1", None]),
+    ({"type": ["number", "null"]}, [1, 1.5, None], [False, "1"]),
+    ({"enum": [1, "a", [True]]}, [1, 1.0, "a", [True]], [True, [1], "b"]),
+    ({"minimum": 1, "exclusiveMinimum": True, "maximum": 2},
+     [1.5, 2, "0"], [1, 0, 2.5]),
+    ({"multipleOf": 0.5}, [1, 1.5, 1E308, "a"], [0.3, 0.75]),
+    ({"pattern": "^a", "maxLength": 2}, ["a", "ab", 1], ["b", "abc"]),
+    ({"items": {"type": "string"}, "minItems": 1}, [["a"], {}],
+     [[], [1]]),
+    ({"properties": {"a": {"type": "string"}},
+      "patternProperties": {"^b": {"type": "integer"}},
+      "additionalProperties": False, "required": ["a"]},
+     [{"a": "x"}, {"a": "x", "b1": 1}, 1],
+     [{}, {"a": 1}, {"a": "x", "b": "y"}, {"a": "x", "c": 1}]),
+    ({"oneOf": [{"type": "integer"}, {"minimum": 2}]},
+     [1, 3.5, "a"], [2, 1.5]),
+    ({"anyOf": [{"type": "integer"}, {"minimum": 2}], "not": {"enum": [5]}},
+     [1, 2.5], [1.5, 5]),
+])
+def test_compiled_keywords(schema, valid, invalid):
+    is_valid = compile_schema(schema)
+    validator = jsonschema.Draft4Validator(schema)
+    for expected, instances in ((True, valid), (False, invalid)):
+        for instance in instances:
+            assert is_valid(instance) is expected
+            assert validator.is_valid(instance) is expected
+
+
+def test_unsupported_schema():
+    with pytest.raises(UnsupportedSchema):
+        compile_schema({"$ref": "#/definitions/a"})
+    with pytest.raises(UnsupportedSchema):
+        compile_schema({"uniqueItems": True})
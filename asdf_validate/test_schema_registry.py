@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test cases for the schema registry.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import copy
+import io
+import json
+import os
+
+import jsonschema
+
+from .schema_registry import (ASDF_SCHEMAS, SchemaRegistry, get_registry,
+                              inline_refs)
+
+
+def test_schemas_are_compiled_once():
+    registry = get_registry()
+    assert registry is get_registry()
+    for get_schema in (registry.quakeml_schema, registry.stationxml_schema):
+        with get_schema() as first:
+            # Concurrent users get their own instance.
+            with get_schema() as second:
+                assert first is not second
+        with get_schema() as third:
+            assert third is first or third is second
+    for version in ASDF_SCHEMAS:
+        assert registry.get_asdf_validator(version) is \
+            registry.get_asdf_validator(version)
+
+
+def test_inline_refs():
+    schema = {
+        "definitions": {
+            "a": {"type": "integer"},
+            "b": {"type": "array", "items": {"$ref": "#/definitions/a"}},
+            "tree": {"properties": {"child": {"$ref": "#/definitions/tree"}}}
+        },
+        "properties": {
+            "x": {"$ref": "#/definitions/b"},
+            "y": {"$ref": "#/definitions/tree"}}}
+    original = copy.deepcopy(schema)
+    inlined = inline_refs(schema)
+
+    assert schema == original
+    assert inlined["properties"]["x"] == {
+        "type": "array", "items": {"type": "integer"}}
+    # Recursive references are kept.
+    assert inlined["properties"]["y"] == {"properties": {"child": {
+        "$ref": "#/definitions/tree"}}}
+    for instance in ({"x": [1, 2]}, {"x": [1.5]}, {"y": {"child": {
+            "child": {"child": 1}}}}):
+        assert jsonschema.Draft4Validator(schema).is_valid(instance) is \
+            jsonschema.Draft4Validator(inlined).is_valid(instance)
+
+
+def test_persisted_schemas(tmpdir):
+    cache_dir = os.path.join(tmpdir.strpath, "cache")
+    validator = SchemaRegistry(cache_dir=cache_dir).get_asdf_validator(
+        "1.0.3")
+    files = os.listdir(cache_dir)
+    assert len(files) == 1 and files[0].startswith("ASDF_1.0.3.")
+
+    # A new registry loads the persisted schema.
+    with io.open(os.path.join(cache_dir, files[0]), "wt") as fh:
+        json.dump({"type": "object", "required": ["marker"]}, fh)
+    assert SchemaRegistry(cache_dir=cache_dir).get_asdf_validator(
+        "1.0.3").schema == {"type": "object", "required": ["marker"]}
+    assert "definitions" in validator.schema
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test cases for the sharded schema validation.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import copy
+import json
+import os
+
+import pytest
+
+from .schema_registry import (ASDF_SCHEMAS, SHARDED_GROUPS, get_registry,
+                              shard_schema)
+from .schema_validation import get_schema_errors, hdf5_path
+
+
+@pytest.mark.parametrize("version", sorted(ASDF_SCHEMAS))
+def test_shard_schema(version):
+    schema = get_registry().get_asdf_validator(version).schema
+    original = copy.deepcopy(schema)
+    root, shards = shard_schema(schema)
+    assert schema == original
+    assert sorted(shards) == sorted(SHARDED_GROUPS)
+    # Groups with other constraints are not sharded.
+    schema["properties"]["groups"]["anyOf"] = [{}]
+    assert shard_schema(schema) == (schema, {})
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sharded_and_full_validation_agree(tmpdir, workers):
+    pytest.importorskip("h5py")
+    from .h5py_wrapper import get_header_as_dict
+    from .synthetic import write_synthetic_asdf
+
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=4, traces=2, version="1.0.3")
+    valid = get_header_as_dict(filename)
+
+    # Equal nodes of the header are shared - copy them all to modify them.
+    broken = json.loads(json.dumps(valid))
+    waveforms = broken["groups"]["Waveforms"]["groups"]
+    waveforms["invalid"] = waveforms["XX.S0000"]
+    for name, trace in waveforms["XX.S0001"]["datasets"].items():
+        if name != "StationXML":
+            del trace["attributes"]["sampling_rate"]
+    waveforms["XX.S0002"]["datasets"]["StationXML"]["DataType"] = {}
+    broken["groups"]["AuxiliaryData"] = {
+        "groups": {"Test": {"datasets": {"a": 1}}}}
+    del broken["attributes"]["file_format"]
+
+    registry = get_registry()
+    for header in (valid, broken):
+        full = registry.get_asdf_validator("1.0.3").iter_errors(header)
+        expected = sorted((hdf5_path(_i.absolute_path), _i.message)
+                          for _i in full)
+        assert sorted(get_schema_errors(header, "1.0.3", registry,
+                                        workers=workers)) == expected
+    assert len(expected) == 6
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test cases for the validation server.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import functools
+import http.client
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+from .server import ValidationService, create_server
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        http.client.HTTPConnection.__init__(self, "localhost")
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self._path)
+
+
+def _request(connection, method, path, body=None):
+    connection.request(method, path, body=body)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read().decode())
+
+
+@pytest.fixture(params=["tcp", "unix"])
+def connection(request, tmpdir):
+    service = ValidationService(concurrency=2, max_queue=1, backend="h5py")
+    if request.param == "tcp":
+        server = create_server(service, "127.0.0.1:0")
+        connect = functools.partial(http.client.HTTPConnection,
+                                    "127.0.0.1", server.server_address[1])
+    else:
+        path = os.path.join(tmpdir.strpath, "server.sock")
+        server = create_server(service, "unix:" + path)
+        connect = functools.partial(_UnixConnection, path)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        yield connect
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.shutdown()
+        thread.join()
+
+
+def test_server(tmpdir, connection):
+    pytest.importorskip("h5py")
+    from .synthetic import write_synthetic_asdf
+
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=2, traces=2)
+
+    status, result = _request(connection(), "POST", "/validate",
+                              json.dumps({"filename": filename}))
+    assert status == 200
+    assert result["valid"]
+    assert result["filename"] == filename
+
+    status, result = _request(connection(), "POST", "/validate", json.dumps(
+        {"filename": filename + "_missing", "all_errors": True}))
+    assert status == 200
+    assert not result["valid"]
+    assert result["findings"][0]["check"] == "file"
+
+    status, result = _request(connection(), "GET", "/status")
+    assert status == 200
+    assert result["running"] == 0 and result["concurrency"] == 2
+
+    assert _request(connection(), "POST", "/validate", "{}")[0] == 400
+    assert _request(connection(), "GET", "/random")[0] == 404
+
+
+def test_remote_addresses():
+    """
+    Only loopback addresses are served on unless explicitly allowed.
+    """
+    service = ValidationService(concurrency=1, max_queue=0)
+    try:
+        for address in ("127.0.0.1:0", "localhost:0"):
+            create_server(service, address).server_close()
+        with pytest.raises(ValueError) as e:
+            create_server(service, "0.0.0.0:0")
+        assert "--allow-remote" in str(e.value)
+        create_server(service, "0.0.0.0:0", allow_remote=True).server_close()
+    finally:
+        service.shutdown()
+
+
+def test_unix_socket_path(tmpdir):
+    """
+    Only stale sockets are replaced.
+    """
+    service = ValidationService(concurrency=1, max_queue=0)
+    path = os.path.join(tmpdir.strpath, "data.h5")
+    try:
+        with open(path, "wb") as fh:
+            fh.write(b"data")
+        with pytest.raises(ValueError):
+            create_server(service, "unix:" + path)
+        assert os.path.exists(path)
+
+        path = os.path.join(tmpdir.strpath, "server.sock")
+        create_server(service, "unix:" + path).server_close()
+        # The socket of a previous run.
+        create_server(service, "unix:" + path).server_close()
+    finally:
+        service.shutdown()
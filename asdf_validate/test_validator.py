@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test cases for the validation itsself.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+
+import pytest
+
+from .checks import HeaderCheck
+from .validator import Validator, check
+
+
+class _CountingCheck(HeaderCheck):
+    """
+    Reports every station and waveform it visits.
+    """
+    def station(self, station, path, node):
+        self.report.warning("stations", station, path=path)
+
+    def waveform(self, station, name, path, node):
+        self.report.warning("waveforms", name, path=path)
+
+
+@pytest.fixture
+def broken_file(tmpdir):
+    """
+    A file with wrong start times in two waveforms and an invalid
+    provenance id in a third one.
+    """
+    h5py = pytest.importorskip("h5py")
+    import numpy as np
+    from .synthetic import write_synthetic_asdf
+
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=3, traces=1)
+    with h5py.File(filename, "a") as f:
+        waveforms = [f["Waveforms"][_i][_j] for _i in sorted(f["Waveforms"])
+                     for _j in sorted(f["Waveforms"][_i])
+                     if _j != "StationXML"]
+        waveforms[0].attrs["starttime"] = np.int64(0)
+        waveforms[1].attrs["starttime"] = np.int64(0)
+        waveforms[2].attrs["provenance_id"] = np.bytes_(b"invalid")
+    return filename
+
+
+def test_collect_all_errors(broken_file):
+    """
+    All errors of a file are reported with their check and path.
+    """
+    report = check(broken_file, backend="h5py")
+    assert not report.is_valid
+    assert [(_i.check, _i.path.split("/")[2]) for _i in report.errors] == [
+        ("provenance-id", "XX.S0002"),
+        ("waveform-starttime", "XX.S0000"),
+        ("waveform-endtime", "XX.S0000"),
+        ("waveform-starttime", "XX.S0001"),
+        ("waveform-endtime", "XX.S0001")]
+    assert report.to_dict()["findings"][0]["severity"] == "error"
+
+    report = check(broken_file, backend="h5py", fail_fast=True)
+    assert [_i.check for _i in report.errors] == ["provenance-id"]
+
+
+def test_validator_from_many_threads(tmpdir, broken_file):
+    """
+    A single validator can be shared between threads.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from .synthetic import write_synthetic_asdf
+
+    valid_file = os.path.join(tmpdir.strpath, "valid.h5")
+    write_synthetic_asdf(valid_file, stations=3, traces=2)
+    filenames = [valid_file, broken_file] * 10
+
+    validator = Validator(backend="h5py", xml_workers=2)
+    expected = [validator.validate(_i).to_dict() for _i in filenames]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = [_i.to_dict() for _i in pool.map(validator.validate,
+                                                   filenames)]
+    assert results == expected
+    assert [_i["valid"] for _i in results] == [True, False] * 10
+
+
+def test_profile(broken_file):
+    """
+    Profiled reports contain the time of each phase and the backend calls.
+    """
+    phases = []
+    validator = Validator(backend="h5py", profile=True,
+                          on_phase=lambda *args: phases.append(args))
+    profile = validator.validate(broken_file).to_dict()["profile"]
+    assert set(profile["phases"]) == set(
+        ["file", "header", "schema", "quakeml", "attributes", "objects",
+         "waveforms", "stationxml"])
+    assert set(_i[1] for _i in phases) == set(profile["phases"])
+    assert all(_i[0] == broken_file for _i in phases)
+    assert profile["backend_calls"]["read_array"]["calls"] == 4
+    assert profile["bytes_read"] > 0
+    # The h5py backend works in-process.
+    assert profile["subprocesses"] == 0
+    assert profile["total"] >= sum(profile["phases"].values())
+
+    assert "profile" not in check(broken_file, backend="h5py").to_dict()
+
+
+def test_sample(tmpdir, broken_file):
+    """
+    Only a sample of the waveforms is checked but every station.
+    """
+    from .synthetic import write_synthetic_asdf
+
+    filename = os.path.join(tmpdir.strpath, "large.h5")
+    write_synthetic_asdf(filename, stations=10, traces=5)
+
+    report = check(filename, backend="h5py", sample=0.1, seed=1,
+                   checks=[_CountingCheck])
+    assert report.is_valid
+    assert [_i.check for _i in report.warnings].count("sample") == 1
+    assert [_i.check for _i in report.warnings].count("stations") == 10
+    assert [_i.check for _i in report.warnings].count("waveforms") == 5
+    coverage = report.to_dict()["coverage"]
+    assert coverage["waveforms"]["checked"] == 5
+    assert coverage["waveforms"]["total"] == 50
+    assert "stationxml" not in coverage
+    assert 0.0 < coverage["waveforms"]["error_rate_bound"] < 1.0
+
+    # Stratified samples cover every station.
+    report = check(filename, backend="h5py", sample=0.1,
+                   sample_strategy="station")
+    assert report.coverage["waveforms"]["checked"] == 10
+
+    # A complete sample finds all errors.
+    report = check(broken_file, backend="h5py", sample=1.0)
+    assert len(report.errors) == 5
+    assert not report.warnings
+    assert report.coverage["waveforms"]["error_rate_bound"] == 0.0
+
+    with pytest.raises(ValueError):
+        Validator(sample=0.0)
+
+
+def test_station_workers(tmpdir, broken_file):
+    """
+    Splitting a file across processes finds the same problems.
+    """
+    from .synthetic import write_synthetic_asdf
+
+    valid_file = os.path.join(tmpdir.strpath, "valid.h5")
+    write_synthetic_asdf(valid_file, stations=5, traces=3, aux_data=4)
+
+    for filename in (valid_file, broken_file):
+        serial = check(filename, backend="h5py")
+        parallel = check(filename, backend="h5py", station_workers=2)
+        assert sorted(parallel.findings) == sorted(serial.findings)
+    assert len(parallel.errors) == 5
+
+    report = check(broken_file, backend="h5py", station_workers=2,
+                   fail_fast=True)
+    assert len(report.errors) == 1
+
+
+def test_check_data(tmpdir):
+    """
+    The samples of the waveforms are only checked on request.
+    """
+    h5py = pytest.importorskip("h5py")
+    import numpy as np
+    from .synthetic import write_synthetic_asdf
+
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=1, traces=4)
+    with h5py.File(filename, "a") as f:
+        group = f["Waveforms"]["XX.S0000"]
+        names = sorted(_i for _i in group if _i != "StationXML")
+        group[names[0]][10] = np.nan
+        group[names[1]][...] = 0.0
+        # One sample too many - still within the tolerance of the times.
+        data = np.zeros(101, dtype=np.float32)
+        data[0] = 1.0
+        attrs = dict(group[names[2]].attrs)
+        del group[names[2]]
+        group.create_dataset(names[2], data=data)
+        group[names[2]].attrs.update(attrs)
+
+    assert check(filename, backend="h5py").is_valid
+
+    report = check(filename, backend="h5py", check_data=True)
+    assert [(_i.check, _i.path.split("/")[-1]) for _i in report.errors] == [
+        ("waveform-data", names[0]), ("waveform-npts", names[2])]
+    assert [(_i.check, _i.path.split("/")[-1]) for _i in report.warnings] \
+        == [("waveform-data", names[1])]
+
+    # Only the first three waveforms fit into the budget.
+    report = check(filename, backend="h5py", check_data=True,
+                   data_budget=1200)
+    assert report.warnings[-1].message.startswith(
+        "Only checked the data of 3 of 4 waveforms")
+
+
+def test_additional_checks(tmpdir):
+    """
+    Additional checks visit every object once, also with many processes.
+    """
+    from .synthetic import write_synthetic_asdf
+
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=3, traces=2)
+
+    for workers in (1, 2):
+        report = check(filename, backend="h5py", checks=[_CountingCheck],
+                       station_workers=workers)
+        assert report.is_valid
+        assert sorted(_i.check for _i in report.warnings) == \
+            ["stations"] * 3 + ["waveforms"] * 6
+        assert len(set(_i.path for _i in report.warnings)) == 9
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test cases for watching a directory.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import io
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from .watch import FolderWatcher, watch
+
+
+def _write(filename, data, mtime):
+    with io.open(filename, "ab") as fh:
+        fh.write(data)
+    os.utime(filename, (mtime, mtime))
+
+
+def test_folder_watcher(tmpdir):
+    """
+    Files are only complete once they stopped changing.
+    """
+    directory = tmpdir.strpath
+    filename = os.path.join(directory, "a.h5")
+    watcher = FolderWatcher(directory, settle=2.0)
+
+    _write(filename, b"", 100)
+    _write(os.path.join(directory, "b.txt"), b"1", 100)
+    assert watcher.poll(now=0) == []
+    _write(filename, b"12", 101)
+    assert watcher.poll(now=1) == []
+    # Still being written.
+    _write(filename, b"34", 102)
+    assert watcher.poll(now=2) == []
+    assert watcher.poll(now=3) == []
+    assert watcher.poll(now=4) == [(filename, 4)]
+    assert watcher.poll(now=10) == []
+
+    # Modified files are complete again once they settled.
+    _write(filename, b"56", 103)
+    assert watcher.poll(now=11) == []
+    assert watcher.poll(now=13) == [(filename, 13)]
+
+    os.remove(filename)
+    assert watcher.poll(now=14) == []
+    _write(filename, b"12", 103)
+    assert watcher.poll(now=15) == []
+    assert watcher.poll(now=17) == [(filename, 17)]
+
+
+def test_watch(tmpdir):
+    pytest.importorskip("h5py")
+    from .synthetic import write_synthetic_asdf
+
+    directory = tmpdir.mkdir("landing").strpath
+    write_synthetic_asdf(os.path.join(directory, "good.h5"), stations=2,
+                         traces=2)
+    with io.open(os.path.join(directory, "bad.h5"), "wb") as fh:
+        fh.write(b"not an HDF5 file")
+
+    output = io.StringIO()
+    assert watch(directory, output, interval=0.01, settle=0.05, workers=1,
+                 max_files=2, backend="h5py", cache_dir=None) == 1
+    results = dict((os.path.basename(_i["filename"]), _i) for _i in
+                   map(json.loads, output.getvalue().splitlines()))
+    assert sorted(results) == ["bad.h5", "good.h5"]
+    assert results["good.h5"]["valid"]
+    assert not results["bad.h5"]["valid"]
+    for result in results.values():
+        assert result["latency"] >= result["duration"]
+
+
+def _crash_on_first_file(filename):
+    """
+    Kills the worker for ``crash.h5``.
+    """
+    from .batch import validate_file
+
+    if os.path.basename(filename) == "crash.h5":
+        os._exit(1)
+    return validate_file(filename, backend="h5py")
+
+
+def test_watch_crashed_worker(tmpdir, monkeypatch):
+    """
+    The files of a crashed worker are invalid and new workers take over.
+    """
+    pytest.importorskip("h5py")
+    from . import watch as watch_module
+    from .synthetic import write_synthetic_asdf
+
+    directory = tmpdir.mkdir("landing").strpath
+    with io.open(os.path.join(directory, "crash.h5"), "wb") as fh:
+        fh.write(b"crashes the worker")
+    # The forked workers see the replaced function.
+    monkeypatch.setattr(watch_module, "_validate", _crash_on_first_file)
+    output = io.StringIO()
+
+    def add_file():
+        # Only once the crash has been reported - files handed to the
+        # workers before that are lost as well.
+        deadline = time.time() + 30
+        while not output.getvalue() and time.time() < deadline:
+            time.sleep(0.01)
+        filename = os.path.join(tmpdir.strpath, "good.h5")
+        write_synthetic_asdf(filename)
+        os.rename(filename, os.path.join(directory, "good.h5"))
+
+    thread = threading.Thread(target=add_file)
+    thread.start()
+    try:
+        assert watch(directory, output, interval=0.01, settle=0.05,
+                     workers=2, max_files=2, backend="h5py",
+                     cache_dir=None) == 1
+    finally:
+        thread.join()
+    crash, good = map(json.loads, output.getvalue().splitlines())
+    assert os.path.basename(crash["filename"]) == "crash.h5"
+    assert not crash["valid"]
+    assert crash["message"].startswith("BrokenProcessPool")
+    assert os.path.basename(good["filename"]) == "good.h5"
+    assert good["valid"]
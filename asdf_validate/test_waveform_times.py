@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test cases for the waveform time checks.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from .waveform_times import (check_lengths, check_times,
+                             parse_name_times)
+
+
+def test_parse_name_times():
+    starttimes, endtimes = parse_name_times([
+        "AA.BB..BHZ__1970-01-01T00:00:10__1970-01-01T00:01:00__raw",
+        "AA.BB..BHZ__2014-01-01T00:00:00.123456789__"
+        "2014-01-01T00:00:01.000000000__synthetic"])
+    assert starttimes.tolist() == [10 * 10 ** 9, 1388534400123456789]
+    assert endtimes.tolist() == [60 * 10 ** 9, 1388534401 * 10 ** 9]
+
+    # Shorter fractions are milliseconds, microseconds, ...
+    starttimes, endtimes = parse_name_times([
+        "AA.BB..BHZ__1970-01-01T00:00:10.5__1970-01-01T00:00:10.000250__"
+        "raw"])
+    assert starttimes.tolist() == [10500000000]
+    assert endtimes.tolist() == [10000250000]
+
+    # Leap seconds cannot be parsed by NumPy.
+    starttimes, endtimes = parse_name_times([
+        "AA.BB..BHZ__2016-12-31T23:59:60__2017-01-01T00:00:00__raw"])
+    assert starttimes.tolist() == [1483228800 * 10 ** 9]
+    assert endtimes.tolist() == [1483228800 * 10 ** 9]
+
+
+def test_check_times():
+    names = ["AA.BB..BHZ__1970-01-01T00:00:10__1970-01-01T00:00:19__raw"] * 4
+    bad_start, bad_end, starttimes, endtimes = check_times(
+        names, npts=[10, 10, 10, 20],
+        starttimes=[10 * 10 ** 9, int(10.9 * 10 ** 9), 12 * 10 ** 9,
+                    10 * 10 ** 9],
+        sampling_rates=[1.0, 1.0, 1.0, 2.0])
+    assert bad_start.tolist() == [False, False, True, False]
+    assert bad_end.tolist() == [False, False, True, False]
+    assert starttimes.tolist() == [10.0, 10.9, 12.0, 10.0]
+    assert endtimes.tolist() == [19.0, 19.9, 21.0, 19.5]
+
+
+def test_check_lengths():
+    """
+    The end times must agree to within half a sample interval.
+    """
+    names = ["AA.BB..BHZ__1970-01-01T00:00:10__"
+             "1970-01-01T00:00:10.990000__raw"] * 4
+    bad, endtimes = check_lengths(
+        names, npts=[100, 100, 101, 99],
+        starttimes=[10 * 10 ** 9, 10 * 10 ** 9 + 4 * 10 ** 6,
+                    10 * 10 ** 9, 10 * 10 ** 9],
+        sampling_rates=[100.0] * 4)
+    assert bad.tolist() == [False, False, True, True]
+    assert endtimes.tolist() == [10.99, 10.994, 11.0, 10.98]
+
+    # Names without fractional seconds only match whole seconds.
+    bad, _ = check_lengths(
+        ["AA.BB..BHZ__1970-01-01T00:00:10__1970-01-01T00:00:10__raw"],
+        npts=[100], starttimes=[int(9.001 * 10 ** 9)],
+        sampling_rates=[100.0])
+    assert bad.tolist() == [True]
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test cases for the validation of embedded XML documents.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+
+import numpy as np
+import pytest
+
+from .backends import get_backend
+from .schema_registry import get_registry
+from .xml_validation import validate_datasets
+
+
+@pytest.mark.parametrize("workers, executor", [
+    (1, "thread"), (3, "thread"), (2, "process")])
+def test_validate_datasets(tmpdir, workers, executor):
+    """
+    Results are returned in order independent of the number of workers.
+    """
+    h5py = pytest.importorskip("h5py")
+    from .synthetic import write_synthetic_asdf
+
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=5, traces=0, version="1.0.3")
+    with h5py.File(filename, "a") as f:
+        del f["Waveforms/XX.S0003/StationXML"]
+        f["Waveforms/XX.S0003/StationXML"] = np.frombuffer(
+            b"<FDSNStationXML/>", dtype=np.int8)
+
+    paths = ["/Waveforms/XX.S%04i/StationXML" % _i for _i in range(5)]
+    results = list(validate_datasets(
+        "StationXML", filename, paths, backend=get_backend("h5py"),
+        registry=get_registry(), workers=workers, executor=executor))
+
+    assert [_i[0] for _i in results] == paths
+    assert [bool(_i[1]) for _i in results] == [
+        False, False, False, True, False]
+    assert "FDSNStationXML" in results[3][1][0]
+
+
+def test_identical_documents_are_validated_once(tmpdir, monkeypatch):
+    h5py = pytest.importorskip("h5py")
+    from . import xml_validation
+    from .cache import ResultMemo
+    from .synthetic import STATIONXML, write_synthetic_asdf
+
+    validated = []
+
+    def validate_stationxml(data, registry):
+        validated.append(data)
+        return ["invalid"]
+
+    monkeypatch.setitem(xml_validation.VALIDATORS, "StationXML",
+                        validate_stationxml)
+    monkeypatch.setattr(xml_validation, "_RESULTS", ResultMemo(10))
+
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=8, traces=0)
+    document = np.frombuffer(STATIONXML.format(
+        network="XX", station="S0000").encode(), dtype=np.int8)
+    with h5py.File(filename, "a") as f:
+        for station in f["Waveforms"].values():
+            del station["StationXML"]
+            station["StationXML"] = document
+
+    paths = ["/Waveforms/XX.S%04i/StationXML" % _i for _i in range(8)]
+    results = list(validate_datasets(
+        "StationXML", filename, paths, backend=get_backend("h5py"),
+        registry=get_registry(), workers=4))
+    assert [_i[1] for _i in results] == [["invalid"]] * 8
+    assert len(validated) == 1
+
+
+def test_close_cancels_validations(tmpdir, monkeypatch):
+    """
+    Closing the results before they are used stops the validations.
+    """
+    pytest.importorskip("h5py")
+    import time
+    from . import xml_validation
+    from .cache import ResultMemo
+    from .synthetic import write_synthetic_asdf
+
+    validated = []
+
+    def validate_stationxml(data, registry):
+        time.sleep(0.1)
+        validated.append(data)
+        return []
+
+    monkeypatch.setitem(xml_validation.VALIDATORS, "StationXML",
+                        validate_stationxml)
+    monkeypatch.setattr(xml_validation, "_RESULTS", ResultMemo(10))
+
+    filename = os.path.join(tmpdir.strpath, "test.h5")
+    write_synthetic_asdf(filename, stations=8, traces=0)
+    paths = ["/Waveforms/XX.S%04i/StationXML" % _i for _i in range(8)]
+    results = validate_datasets(
+        "StationXML", filename, paths, backend=get_backend("h5py"),
+        registry=get_registry(), workers=2)
+    results.close()
+    # Only the running validations finished.
+    count = len(validated)
+    assert count <= 2
+    time.sleep(0.3)
+    assert len(validated) == count
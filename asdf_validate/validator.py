@@ -13,45 +13,27 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
 import argparse
-import datetime
-import time
-from calendar import timegm
-import inspect
+from concurrent import futures
 import io
 import json
 import os
-import re
-import shutil
 import sys
-import tempfile
 
-import jsonschema
-from lxml import etree
-import seis_prov_validate
-
-from .h5dump_wrapper import (get_header_as_dict, dump_array_to_file,
-                             is_hdf5_file, get_string_attribute,
-                             get_float_attribute)
-
-# Directory of the file.
-_DIR = os.path.dirname(
-    os.path.abspath(inspect.getfile(inspect.currentframe())))
-
-_QUAKEML_SCHEMA = os.path.join(_DIR, "schemas", "QuakeML-1.2.rng")
-_STATIONXML_SCHEMA = os.path.join(_DIR, "schemas",
-                                  "fdsn-station-1.0.xsd")
-
-# Dictionaries of ASDF schemas by version number.
-_ASDF_SCHEMAS = {
-    "0.0.2": os.path.join(_DIR, "schemas", "ASDF_0.0.2.json"),
-    "1.0.0": os.path.join(_DIR, "schemas", "ASDF_1.0.0.json"),
-    "1.0.1": os.path.join(_DIR, "schemas", "ASDF_1.0.1.json"),
-    "1.0.2": os.path.join(_DIR, "schemas", "ASDF_1.0.2.json")
-    "1.0.3": os.path.join(_DIR, "schemas", "ASDF_1.0.3.json")
-}
-
-PROVENANCE_ID_PATTERN = re.compile(
-    r"^{[a-z]+://[a-z./_0-9A-Z?#&$-.+!*'\(\),]+}\w+$")
+# NumPy, jsonschema, and lxml are only imported by the checks needing them -
+# many files fail the first checks and the startup time then dominates.
+from .backends import BACKENDS, get_backend
+from .cache import (DEFAULT_MAX_SIZE, default_cache_dir, file_identity,
+                    get_cache)
+from .checks import (AuxiliaryDataCheck, DataCheck, ProvenanceCheck,
+                     StationXMLCheck, WaveformCheck, visit)
+from .data_checks import parse_size
+from .profiling import Profile, ProfilingBackend, format_profile
+from .remote import is_remote, session
+from .report import ERROR, Finding, StopValidation, ValidationReport
+from .sampling import KINDS, STRATEGIES, Sampler
+from .schema_registry import ASDF_SCHEMAS, get_registry
+from .schema_validation import get_schema_errors
+from .xml_validation import EXECUTORS, validate_datasets
 
 
 def _log_error(message):
@@ -68,256 +50,821 @@ def _log_warning(message):
     print("WARNING:", message)
 
 
-def validate(filename):
-    # Start with the very basic checks. Check if the file exists.
-    if not os.path.exists(filename):
-        _log_error("Path '%s' does not exist." % filename)
-    # Make sure its a file.
-    if not os.path.isfile(filename):
-        _log_error("Path '%s' is not a file." % filename)
+def validate(filename, fail_fast=True, **kwargs):
+    """
+    Validate a file, print all warnings, and exit with the first error.
+
+    All keyword arguments are passed to :class:`Validator`.
+    """
+    report = check(filename, fail_fast=fail_fast, **kwargs)
+    for warning in report.warnings:
+        _log_warning(warning.message)
+    if not report.is_valid:
+        _log_error(report.errors[0].message)
 
-    if not is_hdf5_file(filename):
-        _log_error("Not an HDF5 file.")
 
-    file_format = get_string_attribute(filename, "file_format")
+def check(filename, **kwargs):
+    """
+    Validate a file and return all findings.
 
-    if file_format != "ASDF":
-        _log_error("'file_format' attribute in file is '%s' but "
-                   "must be 'ASDF'." % file_format)
-    file_format_version = get_string_attribute(filename, "file_format_version")
-    if file_format_version not in _ASDF_SCHEMAS.keys():
-        _log_error("Format version %s not known to validator. "
-                   "Known versions:\n\t%s" % (
-                    file_format_version, ", ".join(
-                        sorted(_ASDF_SCHEMAS.keys()))))
-
-    tempfolder = tempfile.mkdtemp(prefix="tmp_asdf_validate_")
-    try:
-        if file_format_version == "0.0.2":
-            _validate(filename, tmpdir=tempfolder, schema_version="0.0.2")
-        elif file_format_version == "1.0.0":
-            _validate(filename, tmpdir=tempfolder, schema_version="1.0.0")
-        elif file_format_version == "1.0.1":
-            _validate(filename, tmpdir=tempfolder, schema_version="1.0.1")
-        elif file_format_version == "1.0.2":
-            _validate(filename, tmpdir=tempfolder, schema_version="1.0.2")
-        elif file_format_version == "1.0.3":
-            _validate(filename, tmpdir=tempfolder, schema_version="1.0.3")
-        else:
-            raise NotImplementedError
-    # Always delete the directory!
-    finally:
+    Shortcut for validating a single file with a :class:`Validator`. All
+    keyword arguments are passed to it.
+
+    :rtype: :class:`~asdf_validate.report.ValidationReport`
+    """
+    return Validator(**kwargs).validate(filename)
+
+
+class Validator(object):
+    """
+    Reusable validator for ASDF files.
+
+    Keeps the backend and the compiled schemas across calls so validating
+    many files only pays the setup cost once. Never exits - all problems
+    are returned as part of the report. A single instance can be used from
+    many threads at once.
+
+    :param backend: Name of the backend used to read the files.
+    :param schema_cache: Optional directory to persist precompiled schemas
+        in.
+    :param xml_workers: Number of concurrent StationXML and provenance
+        validations per file.
+    :param xml_executor: ``"thread"`` or ``"process"`` - how to validate the
+        XML documents concurrently.
+    :param fail_fast: Stop at the first error. Otherwise the validation
+        carries on after errors as long as possible so a single run reports
+        all problems of a file. Only errors after which no further checks
+        can be performed, e.g. an invalid file structure, end it early.
+    :param schema_workers: Number of processes validating the structure of
+        a file against the schema. Only pays off for very large files.
+    :param station_workers: Number of processes checking the waveforms,
+        auxiliary data, and StationXML documents of a file. The file is
+        split by station and data type and every process reads its part of
+        the file on its own. Only pays off for very large files.
+    :param cache_dir: Optional directory of a
+        :class:`~asdf_validate.cache.ValidationCache`. Files that did not
+        change since their last validation are not validated again and the
+        results of known XML documents are reused.
+    :param cache_size: Maximum size of the cache in bytes.
+    :param profile: Attach a profile to every report with the time spent in
+        each phase and in the backend, the number of subprocesses, the
+        number of bytes read, and the peak memory usage.
+    :param on_phase: Optional function called as
+        ``on_phase(filename, phase, seconds)`` whenever a phase of a
+        validation finished.
+    :param cprofile: Also profile every validation with :mod:`cProfile`.
+        The profiler is available as ``report.profile.cprofile``.
+    :param sample: Only check this fraction of the waveforms and auxiliary
+        data of a file - between 0 and 1. The structure of the file and the
+        StationXML documents are always validated completely. The number
+        of checked objects is available as ``report.coverage``.
+    :param sample_strategy: How to choose the checked objects. See
+        :class:`~asdf_validate.sampling.Sampler`.
+    :param seed: Seed for choosing the checked objects.
+    :param check_data: Also read the samples of all waveforms and make sure
+        they contain no NaN or infinite values and are not all zero, and
+        that their number exactly matches the end time in their name.
+    :param data_budget: Maximum number of bytes of waveform data read per
+        file. Waveforms beyond it are not checked.
+    :param checks: Additional checks of the objects in the files -
+        subclasses of :class:`~asdf_validate.checks.HeaderCheck`.
+
+    >>> validator = Validator(backend="h5py")  # doctest: +SKIP
+    >>> report = validator.validate("seismo.h5")  # doctest: +SKIP
+    >>> report.is_valid  # doctest: +SKIP
+    True
+    """
+    def __init__(self, backend="h5dump", schema_cache=None, xml_workers=1,
+                 xml_executor="thread", fail_fast=False, schema_workers=1,
+                 cache_dir=None, cache_size=DEFAULT_MAX_SIZE,
+                 profile=False, on_phase=None, cprofile=False,
+                 sample=None, sample_strategy="random", seed=None,
+                 station_workers=1, check_data=False, data_budget=None,
+                 checks=()):
+        if xml_executor not in EXECUTORS:
+            raise ValueError("Unknown executor '%s'. Known executors: %s" % (
+                xml_executor, ", ".join(sorted(EXECUTORS.keys()))))
+        self.backend = get_backend(backend)
+        self.registry = get_registry(schema_cache)
+        self.xml_workers = xml_workers
+        self.xml_executor = xml_executor
+        self.fail_fast = fail_fast
+        self.schema_workers = schema_workers
+        self.station_workers = station_workers
+        self.check_data = check_data
+        self.data_budget = data_budget
+        self.checks = tuple(checks)
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.profile = profile or cprofile
+        self.on_phase = on_phase
+        self.cprofile = cprofile
+        if sample is not None:
+            # Fail early for invalid settings.
+            Sampler(sample, strategy=sample_strategy)
+        self.sample = sample
+        self.sample_strategy = sample_strategy
+        self.seed = seed
+
+    @property
+    def cache(self):
+        """
+        The cache of validation results or ``None``. It is only opened once
+        needed so files that do not even exist never touch it.
+        """
+        if not self.cache_dir:
+            return None
+        return get_cache(self.cache_dir, max_size=self.cache_size)
+
+    def warm_up(self):
+        """
+        Compile all schemas and import all optional validators so the first
+        validation is as fast as all others.
+        """
+        self.registry.warm_up()
         try:
-            shutil.rmtree(tempfolder)
-        except:
+            import seis_prov_validate  # NOQA
+        except ImportError:
             pass
 
+    def _report_key(self, filename):
+        """
+        Key of the whole report of a file in the cache - depends on all
+        settings changing the findings.
+        """
+        return "report|%s|%s|%s|%s|%s|%s" % (
+            file_identity(filename), self.backend.name, self.fail_fast,
+            self.check_data, self.data_budget,
+            ",".join("%s.%s" % (_i.__module__, _i.__name__)
+                     for _i in self.checks))
+
+    def validate(self, filename):
+        """
+        Validate a single file.
+
+        :rtype: :class:`~asdf_validate.report.ValidationReport`
+        """
+        key = None
+        # Reports of samples are never cached and profiles need an actual
+        # validation.
+        if self.cache_dir and self.sample is None and not self.profile \
+                and os.path.isfile(filename) and self.cache is not None:
+            key = self._report_key(filename)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return ValidationReport.from_dict(cached)
+
+        report = ValidationReport(filename, fail_fast=self.fail_fast)
+        profile = Profile(filename, callback=self.on_phase,
+                          cprofile=self.cprofile)
+        backend = self.backend
+        if self.profile:
+            backend = ProfilingBackend(backend, profile)
+            report.profile = profile
+        sampler = None
+        if self.sample is not None:
+            sampler = Sampler(self.sample, strategy=self.sample_strategy,
+                              seed=self.seed)
+        profile.start()
+        try:
+            # All reads of a remote file share a cache of its blocks.
+            with session(filename) as remote:
+                try:
+                    _check(report, filename, backend=backend,
+                           registry=self.registry,
+                           xml_workers=self.xml_workers,
+                           xml_executor=self.xml_executor,
+                           schema_workers=self.schema_workers,
+                           station_workers=self.station_workers,
+                           open_cache=lambda: self.cache, profile=profile,
+                           sampler=sampler,
+                           check_data=self.check_data,
+                           data_budget=self.data_budget, checks=self.checks)
+                finally:
+                    if remote is not None:
+                        profile.record_transfer(remote.requests,
+                                                remote.bytes_fetched)
+        except StopValidation:
+            pass
+        except SystemExit as e:
+            # The backends exit if something cannot be read.
+            report.findings.append(
+                Finding(ERROR, None, "read", "%s" % e.code))
+            return report
+        except IOError as e:
+            # Requests for remote files can fail at any time.
+            if not is_remote(filename):
+                raise
+            report.findings.append(Finding(
+                ERROR, None, "read", "Could not read '%s': %s" % (
+                    filename, e)))
+            return report
+        finally:
+            profile.stop()
+
+        if sampler is not None:
+            report.coverage = sampler.to_dict()
+            for kind, value in sorted(report.coverage.items()):
+                if value["checked"] == value["total"]:
+                    continue
+                report.warning(
+                    "sample", "Only checked a sample of %i of %i %s. If all "
+                    "of them are valid at most %.1f%% of all %s are "
+                    "invalid (95%% confidence)." % (
+                        value["checked"], value["total"], KINDS[kind],
+                        value["error_rate_bound"] * 100.0, KINDS[kind]))
+
+        # Do not cache the report if the file changed while validating it,
+        # or if the file could not be opened - that depends on the
+        # installed tools and not on the file.
+        if key is not None and key == self._report_key(filename) and \
+                not any(_i.check in ("file", "read") for _i in report.errors):
+            result = report.to_dict()
+            result.pop("profile", None)
+            self.cache.set(key, result)
+        return report
+
+
+def _check(report, filename, backend, registry, xml_workers, xml_executor,
+           schema_workers, open_cache, profile, sampler=None,
+           station_workers=1, check_data=False, data_budget=None, checks=()):
+    """
+    Check a file. ``open_cache`` returns the cache and is only called for
+    files passing the first checks.
+    """
+    with profile.phase("file"):
+        file_format_version = _check_file(report, filename, backend)
+
+    _validate(report, filename, schema_version=file_format_version,
+              backend=backend, registry=registry, xml_workers=xml_workers,
+              xml_executor=xml_executor, schema_workers=schema_workers,
+              cache=open_cache(), profile=profile, sampler=sampler,
+              station_workers=station_workers, check_data=check_data,
+              data_budget=data_budget, checks=checks)
+
+
+def _check_file(report, filename, backend):
+    """
+    Make sure the file is an ASDF file of a known version and return the
+    version.
+    """
+    if is_remote(filename):
+        # Missing remote files are reported by the backend.
+        if backend.name != "h5py":
+            report.error("file", "Remote files can only be read with the "
+                         "h5py backend.", fatal=True)
+    # Start with the very basic checks. Check if the file exists.
+    elif not os.path.exists(filename):
+        report.error("file", "Path '%s' does not exist." % filename,
+                     fatal=True)
+    # Make sure its a file.
+    elif not os.path.isfile(filename):
+        report.error("file", "Path '%s' is not a file." % filename,
+                     fatal=True)
+
+    if not backend.is_hdf5_file(filename):
+        report.error("file", "Not an HDF5 file.", fatal=True)
+
+    file_format = backend.get_string_attribute(filename, "file_format")
+
+    if file_format != "ASDF":
+        report.error("file-format", "'file_format' attribute in file is '%s' "
+                     "but must be 'ASDF'." % file_format, path="/",
+                     fatal=True)
+    file_format_version = backend.get_string_attribute(
+        filename, "file_format_version")
+    if file_format_version not in ASDF_SCHEMAS.keys():
+        report.error("file-format", "Format version %s not known to "
+                     "validator. Known versions:\n\t%s" % (
+                         file_format_version, ", ".join(
+                             sorted(ASDF_SCHEMAS.keys()))),
+                     path="/", fatal=True)
+    return file_format_version
+
+
+def _validate(report, filename, schema_version, backend, registry,
+              xml_workers=1, xml_executor="thread", schema_workers=1,
+              cache=None, profile=None, sampler=None, station_workers=1,
+              check_data=False, data_budget=None, checks=()):
+    if profile is None:
+        profile = Profile(filename)
 
-def _validate(filename, tmpdir, schema_version):
     # First validate against the scheme.
-    contents = _validate_scheme(filename, scheme_version=schema_version)
+    contents = _validate_scheme(report, filename,
+                                scheme_version=schema_version,
+                                backend=backend, registry=registry,
+                                schema_workers=schema_workers,
+                                profile=profile)
 
     # Next validate the QuakeML if any.
     if "datasets" in contents and "QuakeML" in contents["datasets"]:
-        qml_filename = os.path.join(tmpdir, "quake.xml")
-        dump_array_to_file(filename, "/QuakeML", qml_filename)
-
-        # Open schema and file.
-        relaxng = etree.RelaxNG(etree.parse(_QUAKEML_SCHEMA))
-        xmldoc = etree.parse(qml_filename)
-        valid = relaxng.validate(xmldoc)
-
-        if not valid:
-            msgs = ["Error validating QuakeMl:"]
-            for msg in relaxng.error_log:
-                msgs.append("\t%s" % msg)
-            _log_error("\n".join(msgs))
+        with profile.phase("quakeml"):
+            (_, errors), = validate_datasets(
+                "QuakeML", filename, ["/QuakeML"], backend=backend,
+                registry=registry, cache=cache)
+        if errors:
+            report.error("quakeml", "\n".join(
+                ["Error validating QuakeMl:"] +
+                ["\t%s" % _i for _i in errors]), path="/QuakeML")
     else:
-        _log_warning("No QuakeML found in the file.")
+        report.warning("quakeml", "No QuakeML found in the file.")
 
     # In theory legal but a bit suspicious so warn people.
     if "groups" not in contents:
-        _log_warning("Neither waveforms, nor provenance information, nor "
-                     "auxiliary data found.")
+        report.warning("structure", "Neither waveforms, nor provenance "
+                       "information, nor auxiliary data found.")
         return
 
-    # Loop over all provenance documents
+    provenance = None
     if "Provenance" in contents["groups"] and \
             "datasets" in contents["groups"]["Provenance"]:
-        prov_docs = list(contents["groups"]["Provenance"]["datasets"].keys())
-        prov_filename = os.path.join(tmpdir, "prov.xml")
-        for doc in prov_docs:
-            dump_array_to_file(filename, "/Provenance/" + doc, prov_filename)
-
-            result = seis_prov_validate.validate(prov_filename)
-            if result.is_valid:
-                continue
-            sys.exit("Validation of provenance document '%s' failed due "
-                     "to:\n\t%s" % (doc, "\n\t".join(result.errors)))
+        provenance = contents["groups"]["Provenance"]["datasets"]
 
+    aux_group = None
     if "AuxiliaryData" in contents["groups"] and \
             "groups" in contents["groups"]["AuxiliaryData"]:
         aux_group = contents["groups"]["AuxiliaryData"]["groups"]
-        data_types = list(aux_group.keys())
-        for t in data_types:
-            if "datasets" not in aux_group[t]:
-                continue
-            ds = aux_group[t]["datasets"]
-            for item in ds.keys():
-                if "attributes" not in ds[item]:
-                    continue
-                if "provenance_id" not in ds[item]["attributes"]:
-                    continue
-                prov_id = get_string_attribute(
-                    filename, "/AuxiliaryData/" + t + "/" +
-                    item + "/provenance_id")
-                if PROVENANCE_ID_PATTERN.match(prov_id) is None:
-                    sys.exit(
-                        "AuxiliaryData '%s/%s' has a provenance id of '%s' "
-                        "which does not match the regular expression '%s'" % (
-                            t, item, prov_id, PROVENANCE_ID_PATTERN.pattern))
-
-    # Loop over all waveforms.
+        if sampler is not None:
+            aux_group = sampler.select_auxiliary_data(aux_group)
+
+    wf = None
+    stations = []
     if "Waveforms" in contents["groups"] and \
             "groups" in contents["groups"]["Waveforms"]:
         wf = contents["groups"]["Waveforms"]["groups"]
-        for station, items in wf.items():
-            items = items["datasets"]
-
-            # Check various properties of the waveforms.
-            for name, value in items.items():
-                if name == "StationXML":
-                    continue
-
-                # Make sure it only contains items for the correct station.
-                this_station = ".".join(name.split(".")[:2])
-                if this_station != station:
-                    _log_error("Station group %s contains waveform %s which "
-                               "is from station %s." % (station, name,
-                                                        this_station))
-
-                # Make sure the times on the name are approximately correct.
-                starttime, endtime = name.split("__")[1:3]
-                # Get rid of eventual nanoseconds starting with version 1.0.2.
-                starttime = re.sub("\.\d{9}", "", starttime)
-                endtime = re.sub("\.\d{9}", "", endtime)
-                # Set as UTC and convert to seconds since epoch.
-                starttime = starttime + 'Z'
-                endtime = endtime + 'Z'
-                starttime = timegm(time.strptime(
-                    starttime.replace('Z', 'GMT'), "%Y-%m-%dT%H:%M:%S%Z"))
-                endtime = timegm(time.strptime(
-                    endtime.replace('Z', 'GMT'), "%Y-%m-%dT%H:%M:%S%Z"))
-
-                # Get the actual length of the data.
-                npts = value["Dataspace"]["SimpleDataspace"][
-                    "Dimension"]["@DimSize"]
-
-                # In the file its in nanoseconds.
-                starttime_in_file = get_float_attribute(
-                    filename,
-                    "/Waveforms/%s/%s/starttime" % (station, name)) / 1E9
-                sampling_rate = get_float_attribute(
-                    filename,
-                    "/Waveforms/%s/%s/sampling_rate" % (station, name))
-                endtime_in_file = starttime_in_file + \
-                    (npts - 1) / sampling_rate
-
-                # Make sure they are equal to within one second.
-                tolerance = 1.0
-                if abs(starttime - starttime_in_file) > tolerance:
-                    # Convert back to UTC for a pretty output.
-                    starttime_in_file = \
-                        datetime.datetime.utcfromtimestamp(starttime_in_file)
-                    sys.exit("Start time in the name of the waveform data set "
-                             "'%s' differs from the start time set as an "
-                             "attribute [%s]. Both have to agree within a "
-                             "certain tolerance" % (name, starttime_in_file))
-                if abs(endtime - endtime_in_file) > tolerance:
-                    # Convert back to UTC for a pretty output.
-                    endtime_in_file = \
-                        datetime.datetime.utcfromtimestamp(endtime_in_file)
-                    sys.exit("end time in the name of the waveform data set "
-                             "'%s' differs from the end time set as an "
-                             "attribute [%s]. Both have to agree within a "
-                             "certain tolerance" % (name, endtime_in_file))
-
-                if "provenance_id" in value["attributes"]:
-                    prov_id = get_string_attribute(
-                        filename, "/Waveforms/" + station + "/" + name +
-                        "/provenance_id")
-                    if PROVENANCE_ID_PATTERN.match(prov_id) is None:
-                        sys.exit(
-                            "Waveform '%s' has a provenance id of '%s' which "
-                            "does not match the regular expression '%s'" % (
-                                name, prov_id, PROVENANCE_ID_PATTERN.pattern))
-
-            if "StationXML" in items:
-                # Dump StationXML to file and validate.
-                sxml_filename = os.path.join(
-                    tmpdir, "%s.xml" % station.replace(".", "_"))
-                dump_array_to_file(
-                    filename, "/Waveforms/%s/StationXML" % station,
-                    sxml_filename)
-
-                # Open schema and file.
-                schema = etree.XMLSchema(etree.parse(_STATIONXML_SCHEMA))
-                xmldoc = etree.parse(sxml_filename)
-                valid = schema.validate(xmldoc)
-
-                if not valid:
-                    msgs = ["Error validating StationXML for %s:" % station]
-                    for msg in schema.error_log:
-                        msgs.append("\t%s" % msg)
-                    _log_error("\n".join(msgs))
+        stations = [_i for _i in wf if "StationXML" in wf[_i]["datasets"]]
+        if sampler is not None:
+            wf = sampler.select_waveforms(wf)
+
+    if station_workers > 1:
+        # Only the provenance documents are checked in this process.
+        if provenance is not None:
+            _check_objects(report, filename, backend=backend,
+                           registry=registry, attribute_groups=[],
+                           provenance=provenance, aux_group=None, wf=None,
+                           stations=[], xml_workers=xml_workers,
+                           xml_executor=xml_executor, cache=cache,
+                           profile=profile, checks=checks)
+        with profile.phase("chunks"):
+            _check_in_chunks(report, filename, backend=backend,
+                             registry=registry, aux_group=aux_group or {},
+                             wf=wf or {}, stations=stations,
+                             workers=station_workers, xml_workers=xml_workers,
+                             xml_executor=xml_executor, cache=cache,
+                             check_data=check_data, data_budget=data_budget,
+                             checks=checks)
     else:
+        # Read all attributes of waveforms and auxiliary data in one go -
+        # getting them one by one is prohibitively slow for large files.
+        _check_objects(report, filename, backend=backend, registry=registry,
+                       attribute_groups=["/" + _i for _i in (
+                           "AuxiliaryData", "Waveforms")
+                           if _i in contents["groups"]],
+                       provenance=provenance, aux_group=aux_group, wf=wf,
+                       stations=stations, xml_workers=xml_workers,
+                       xml_executor=xml_executor, cache=cache,
+                       profile=profile, check_data=check_data,
+                       data_budget=data_budget, checks=checks)
+
+    if wf is None:
         # Again warn as a bit funny.
-        _log_warning("No waveforms found in the file.")
+        report.warning("waveforms", "No waveforms found in the file.")
+
+
+def _check_objects(report, filename, backend, registry, attribute_groups,
+                   aux_group, wf, stations, xml_workers=1,
+                   xml_executor="thread", cache=None, profile=None,
+                   check_data=False, data_budget=None, provenance=None,
+                   checks=()):
+    """
+    Check the provenance documents, the auxiliary data, the waveforms, and
+    the StationXML documents of the given parts of the header in a single
+    traversal. See :mod:`asdf_validate.checks`.
+
+    :param attribute_groups: The groups whose attributes are needed for
+        the checks.
+    :param stations: The stations whose StationXML is validated.
+    :param check_data: Also check the samples of the waveforms.
+    :param data_budget: Maximum number of bytes of waveform data to read.
+    :param provenance: The provenance documents to validate.
+    :param checks: Additional checks.
+    """
+    if profile is None:
+        profile = Profile(filename)
+
+    attributes = {}
+    if attribute_groups:
+        with profile.phase("attributes"):
+            attributes = backend.get_attributes(filename, attribute_groups)
+
+    args = (report, filename, backend, attributes)
+    objects = []
+    if provenance is not None:
+        objects.append(ProvenanceCheck(*args, registry=registry,
+                                       workers=xml_workers,
+                                       executor=xml_executor, cache=cache))
+    if aux_group is not None:
+        objects.append(AuxiliaryDataCheck(*args))
+    if wf is not None:
+        objects.append(WaveformCheck(*args))
+        if check_data:
+            objects.append(DataCheck(*args, budget=data_budget))
+        # The StationXML documents are validated in the background while
+        # the other checks run - the StationXML phase is the time spent
+        # waiting for them afterwards.
+        objects.append(StationXMLCheck(*args, registry=registry,
+                                       stations=stations, workers=xml_workers,
+                                       executor=xml_executor, cache=cache))
+    objects.extend(_i(*args) for _i in checks)
+
+    try:
+        for check in objects:
+            with profile.phase(check.phase):
+                check.start()
+        with profile.phase("objects"):
+            visit(objects, provenance=provenance, aux_group=aux_group, wf=wf)
+        for check in objects:
+            with profile.phase(check.phase):
+                check.finish()
+    finally:
+        for check in objects:
+            check.close()
+
+
+def _check_chunk(task):
+    """
+    Check a chunk of a file in a worker process. Returns the findings.
+    """
+    (filename, backend, schema_cache, cache, fail_fast, aux_group, wf,
+     stations, xml_workers, xml_executor, check_data, data_budget,
+     checks) = task
+    report = ValidationReport(filename, fail_fast=fail_fast)
+    attribute_groups = ["/AuxiliaryData/" + _i for _i in aux_group] + \
+        ["/Waveforms/" + _i for _i in wf]
+    try:
+        _check_objects(report, filename, backend=get_backend(backend),
+                       registry=get_registry(schema_cache),
+                       attribute_groups=attribute_groups,
+                       aux_group=aux_group, wf=wf, stations=stations,
+                       xml_workers=xml_workers, xml_executor=xml_executor,
+                       cache=get_cache(*cache) if cache else None,
+                       check_data=check_data, data_budget=data_budget,
+                       checks=checks)
+    except StopValidation:
+        pass
+    return report.findings
+
+
+def _get_chunks(aux_group, wf, stations, count):
+    """
+    Split the auxiliary data types and the stations into at most ``count``
+    chunks of about the same number of objects.
 
+    Yields ``(aux_group, wf, stations)`` tuples for every chunk.
+    """
+    units = [("aux", _i, len(_v.get("datasets", {})))
+             for _i, _v in aux_group.items()]
+    # Including stations whose StationXML is validated but none of their
+    # waveforms.
+    units.extend(("wf", _i, len(wf.get(_i, {}).get("datasets", {})) + 1)
+                 for _i in list(wf) + [_j for _j in stations if _j not in wf])
+    stations = set(stations)
+    total = sum(_i[2] for _i in units)
+    size = max(1, -(-total // count))
+
+    chunk = []
+    objects = 0
+    for unit in units:
+        chunk.append(unit)
+        objects += unit[2]
+        if objects >= size:
+            yield _make_chunk(chunk, aux_group, wf, stations)
+            chunk = []
+            objects = 0
+    if chunk:
+        yield _make_chunk(chunk, aux_group, wf, stations)
+
+
+def _make_chunk(units, aux_group, wf, stations):
+    return (dict((_i, aux_group[_i]) for kind, _i, _ in units
+                 if kind == "aux"),
+            dict((_i, wf[_i]) for kind, _i, _ in units
+                 if kind == "wf" and _i in wf),
+            [_i for kind, _i, _ in units if kind == "wf" and _i in stations])
+
+
+def _check_in_chunks(report, filename, backend, registry, aux_group, wf,
+                     stations, workers, xml_workers=1, xml_executor="thread",
+                     cache=None, check_data=False, data_budget=None,
+                     checks=()):
+    """
+    Check the auxiliary data, the waveforms, and the StationXML documents
+    of a file split by data type and station with many processes. Every
+    process opens the file on its own.
 
-def filter_netcdf_things(node):
+    The findings are added to the report chunk after chunk. Every chunk
+    gets the same share of the data budget.
+    """
+    cache_args = (cache.cache_dir, cache.max_size) if cache else None
+    chunks = list(_get_chunks(aux_group, wf, stations, workers * 4))
+    if data_budget is not None and chunks:
+        data_budget //= len(chunks)
+    tasks = [(filename, backend.name, registry.cache_dir, cache_args,
+              report.fail_fast, chunk_aux, chunk_wf, chunk_stations,
+              xml_workers, xml_executor, check_data, data_budget, checks)
+             for chunk_aux, chunk_wf, chunk_stations in chunks]
+    with futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [pool.submit(_check_chunk, _i) for _i in tasks]
+        try:
+            for job in jobs:
+                for finding in job.result():
+                    if finding.severity == ERROR:
+                        report.error(finding.check, finding.message,
+                                     path=finding.path)
+                    else:
+                        report.warning(finding.check, finding.message,
+                                       path=finding.path)
+        finally:
+            for job in jobs:
+                job.cancel()
+
+
+def filter_netcdf_things(node, _filtered=None):
     """
     Filter out all netcdf related things.
+
+    Nodes without any are returned as they are so nodes shared within the
+    header stay shared.
     """
+    if _filtered is None:
+        _filtered = {}
+    if id(node) in _filtered:
+        return _filtered[id(node)]
     keep = {}
+    changed = False
     for key, value in node.items():
         if key == "_NCProperties" or key.startswith("ncdim"):
+            changed = True
             continue
         if isinstance(value, dict):
-            value = filter_netcdf_things(value)
+            filtered = filter_netcdf_things(value, _filtered)
+            changed = changed or filtered is not value
+            value = filtered
         keep[key] = value
-    return keep
-
-
-def _validate_scheme(filename, scheme_version):
-    header = get_header_as_dict(filename)
-
-    # Get rid of all netcdf things.
-    header = filter_netcdf_things(header)
-
-    # Open JSON schema.
-    with io.open(_ASDF_SCHEMAS[scheme_version], "rt") as fh:
-        schema = json.load(fh)
-
-    # Validate the schema itself to avoid silly errors.
-    jsonschema.Draft4Validator.check_schema(schema)
-
-    # Validate the h5dump output against the schema.
-    jsonschema.validate(header, schema)
+    result = keep if changed else node
+    _filtered[id(node)] = result
+    return result
+
+
+def _validate_scheme(report, filename, scheme_version, backend, registry,
+                     schema_workers=1, profile=None):
+    if profile is None:
+        profile = Profile(filename)
+
+    with profile.phase("header"):
+        header = backend.get_header_as_dict(filename)
+
+        # Get rid of all netcdf things.
+        header = filter_netcdf_things(header)
+
+    with profile.phase("schema"):
+        errors = get_schema_errors(header, scheme_version, registry,
+                                   fail_fast=report.fail_fast,
+                                   workers=schema_workers)
+    for path, message in errors:
+        report.error("schema", "Object '%s' does not conform to the ASDF %s "
+                     "schema: %s" % (path, scheme_version, message),
+                     path=path)
+    # All other checks rely on the structure enforced by the schema.
+    if errors:
+        raise StopValidation("Invalid file structure.")
     return header
 
 
 def main():
     parser = argparse.ArgumentParser(
         description="Validator for ASDF files.")
-    parser.add_argument("filename", help="Filename of the ASDF file.")
+    parser.add_argument("filenames", nargs="*", metavar="filename",
+                        help="Filename of the ASDF file, or an http(s):// "
+                             "or s3:// URL with the h5py backend. Passing "
+                             "more than one file validates all of them in "
+                             "batch mode.")
+    parser.add_argument("--backend", choices=sorted(BACKENDS.keys()),
+                        default="h5dump",
+                        help="Backend used to read the HDF5 file. The h5py "
+                             "backend works in-process and requires h5py "
+                             "to be installed.")
+    parser.add_argument("--schema-cache", metavar="DIR",
+                        help="Directory to persist precompiled schemas in.")
+    parser.add_argument("--xml-workers", type=int, default=1, metavar="N",
+                        help="Number of concurrent StationXML and provenance "
+                             "validations per file. Defaults to 1.")
+    parser.add_argument("--xml-executor", choices=sorted(EXECUTORS.keys()),
+                        default="thread",
+                        help="Validate the XML documents in threads or in "
+                             "processes. Defaults to threads.")
+    parser.add_argument("--schema-workers", type=int, default=1, metavar="N",
+                        help="Number of processes validating the structure "
+                             "of a file against the schema. Only pays off "
+                             "for very large files. Defaults to 1.")
+    parser.add_argument("--station-workers", type=int, default=1,
+                        metavar="N",
+                        help="Number of processes checking the waveforms, "
+                             "auxiliary data, and StationXML documents of a "
+                             "file, split by station. Only pays off for "
+                             "very large files. Defaults to 1.")
+    parser.add_argument("--check-data", action="store_true",
+                        help="Also read the samples of all waveforms and "
+                             "make sure they contain no NaN or infinite "
+                             "values, are not all zero, and that their "
+                             "number exactly matches the end time in the "
+                             "waveform name.")
+    parser.add_argument("--data-budget", type=parse_size, metavar="SIZE",
+                        help="Maximum amount of waveform data read per file "
+                             "with --check-data, e.g. '10G'. Unlimited by "
+                             "default.")
+    parser.add_argument("--cache-dir", metavar="DIR",
+                        default=default_cache_dir(),
+                        help="Directory of the cache of validation results. "
+                             "Files that did not change since the last run "
+                             "are not validated again and the results of "
+                             "known XML documents are reused. The cache is "
+                             "on by default and emptied whenever the "
+                             "validator changes. Defaults to "
+                             "'%(default)s'.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not use or update the cache.")
+    parser.add_argument("--all-errors", action="store_true",
+                        help="Do not stop at the first error but report all "
+                             "problems of a file.")
+    parser.add_argument("--format", choices=["json", "text"], default="text",
+                        help="Output format for single files. 'json' "
+                             "writes all findings as a JSON document. Batch "
+                             "mode always writes one JSON document per "
+                             "file and line.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Measure the time spent in each phase and in "
+                             "the backend, the number of subprocesses, the "
+                             "bytes read, and the peak memory usage. "
+                             "Printed to stderr or added to the JSON "
+                             "output.")
+    parser.add_argument("--cprofile", metavar="FILE",
+                        help="Profile the validation of a single file with "
+                             "cProfile and write the statistics to FILE. "
+                             "Implies --profile.")
+    parser.add_argument("--sample", type=float, metavar="FRACTION",
+                        help="Validate the structure of a file completely "
+                             "but only check this fraction, between 0 and "
+                             "1, of its waveforms and auxiliary data. The "
+                             "StationXML documents are always validated. "
+                             "Reports the coverage and a bound of the "
+                             "fraction of invalid objects.")
+    parser.add_argument("--sample-strategy", choices=STRATEGIES,
+                        default="random",
+                        help="'random' samples uniformly across the file, "
+                             "'station' samples the waveforms of every "
+                             "station. Defaults to 'random'.")
+    parser.add_argument("--seed", type=int,
+                        help="Seed for choosing the sample.")
+
+    batch = parser.add_argument_group(
+        "batch mode", "Validate many files at once and write one JSON "
+                      "document per file and line.")
+    batch.add_argument("--file-list", metavar="FILE",
+                       help="File with one filename per line. '-' reads "
+                            "the list from stdin.")
+    batch.add_argument("-r", "--recursive", action="store_true",
+                       help="Search all given directories recursively.")
+    batch.add_argument("--pattern", default="*.h5",
+                       help="Pattern of files to validate in directories. "
+                            "Defaults to '*.h5'.")
+    batch.add_argument("-j", "--workers", type=int, default=None,
+                       help="Number of worker processes. Defaults to the "
+                            "number of CPUs.")
+    batch.add_argument("-o", "--output", metavar="FILE",
+                       help="Write the results to this file instead of "
+                            "stdout.")
+
+    server = parser.add_argument_group(
+        "server mode", "Keep the validator running and validate files on "
+                       "request. See asdf_validate.server for the API.")
+    server.add_argument("--serve", nargs="?", metavar="ADDRESS",
+                        const="127.0.0.1:8765",
+                        help="Serve HTTP on HOST:PORT or on the Unix socket "
+                             "unix:PATH. Defaults to '%(const)s'.")
+    server.add_argument("--allow-remote", action="store_true",
+                        help="Allow serving on addresses other than "
+                             "localhost. The server has no authentication "
+                             "and validates any file it can read.")
+    server.add_argument("--concurrency", type=int, default=4, metavar="N",
+                        help="Number of files validated at the same time. "
+                             "Defaults to 4.")
+    server.add_argument("--max-queue", type=int, default=100, metavar="N",
+                        help="Maximum number of files waiting to be "
+                             "validated. Defaults to 100.")
+
+    watch = parser.add_argument_group(
+        "watch mode", "Validate all files arriving in a directory and write "
+                      "one JSON document per file and line. Also uses "
+                      "--pattern, --recursive, --workers, --output, and "
+                      "--max-queue.")
+    watch.add_argument("--watch", metavar="DIR",
+                       help="Watch this directory until interrupted.")
+    watch.add_argument("--poll-interval", type=float, default=1.0,
+                       metavar="SECONDS",
+                       help="Seconds between two scans of the directory. "
+                            "Defaults to 1.")
+    watch.add_argument("--settle", type=float, default=2.0,
+                       metavar="SECONDS",
+                       help="A file is validated once its size and "
+                            "modification time did not change for this "
+                            "many seconds. Defaults to 2.")
     args = parser.parse_args()
 
-    filename = args.filename
+    options = dict(backend=args.backend, schema_cache=args.schema_cache,
+                   xml_workers=args.xml_workers,
+                   xml_executor=args.xml_executor,
+                   schema_workers=args.schema_workers,
+                   station_workers=args.station_workers,
+                   cache_dir=None if args.no_cache else args.cache_dir,
+                   profile=args.profile or bool(args.cprofile),
+                   sample=args.sample, sample_strategy=args.sample_strategy,
+                   seed=args.seed, check_data=args.check_data,
+                   data_budget=args.data_budget)
+
+    if args.sample is not None and not 0.0 < args.sample <= 1.0:
+        parser.error("--sample must be larger than 0 and at most 1")
+
+    if args.serve:
+        from .server import serve
+
+        if args.filenames or args.file_list:
+            parser.error("--serve does not take any files")
+        serve(args.serve, concurrency=args.concurrency,
+              max_queue=args.max_queue, allow_remote=args.allow_remote,
+              **options)
+        return
 
-    validate(filename)
+    if args.watch:
+        from .watch import watch as watch_mode
+
+        if args.filenames or args.file_list:
+            parser.error("--watch does not take any files")
+        kwargs = dict(pattern=args.pattern, recursive=args.recursive,
+                      interval=args.poll_interval, settle=args.settle,
+                      workers=args.workers, max_queue=args.max_queue,
+                      fail_fast=not args.all_errors, **options)
+        if args.output:
+            with io.open(args.output, "at") as fh:
+                sys.exit(watch_mode(args.watch, fh, **kwargs))
+        sys.exit(watch_mode(args.watch, sys.stdout, **kwargs))
+
+    if args.file_list or args.recursive or len(args.filenames) > 1:
+        if args.cprofile:
+            parser.error("--cprofile only works for a single file")
+        from . import batch as batch_mode
+
+        filenames = batch_mode.find_files(
+            args.filenames, file_list=args.file_list,
+            recursive=args.recursive, pattern=args.pattern)
+        if args.output:
+            with io.open(args.output, "wt") as fh:
+                sys.exit(batch_mode.run(filenames, fh, workers=args.workers,
+                                        fail_fast=not args.all_errors,
+                                        **options))
+        sys.exit(batch_mode.run(filenames, sys.stdout, workers=args.workers,
+                                fail_fast=not args.all_errors, **options))
+
+    if len(args.filenames) != 1:
+        parser.error("a filename is required")
+    filename = args.filenames[0]
+
+    if args.format == "text" and not args.all_errors and \
+            not options["profile"]:
+        validate(filename, **options)
+        print("Valid ASDF File!")
+        return
 
-    print("Valid ASDF File!")
+    report = check(filename, fail_fast=not args.all_errors,
+                   cprofile=bool(args.cprofile), **options)
+    if report.profile is not None and report.profile.cprofile is not None:
+        report.profile.cprofile.dump_stats(args.cprofile)
+    if args.format == "json":
+        print(json.dumps(report.to_dict(), indent=4, sort_keys=True))
+    else:
+        for finding in report.findings:
+            if finding.severity == ERROR:
+                sys.stderr.write("%s\n" % finding.message)
+            else:
+                _log_warning(finding.message)
+        if report.profile is not None:
+            sys.stderr.write("%s\n" % format_profile(
+                report.profile.to_dict()))
+        if report.is_valid:
+            print("Valid ASDF File!")
+        else:
+            sys.stderr.write("Found %i errors.\n" % len(report.errors))
+    sys.exit(0 if report.is_valid else 1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Continuous validation of the files arriving in a directory.
+
+The directory is polled for files matching a pattern. A file counts as
+complete once its size and modification time did not change for a while -
+files still being written are left alone. Complete files are validated by a
+pool of long lived workers, each with a validator that compiled all schemas
+once at startup, and every result is written as one line of JSON as soon as
+it is available::
+
+    $ asdf-validate --watch /data/landing --workers 4 > results.ndjson
+
+The result is the same JSON document as in batch mode plus the ``latency``
+in seconds from the moment the file was found to be complete to its result.
+At most ``workers + max_queue`` files are handed to the workers at a time.
+The directory is only scanned again once all complete files of the last
+scan have been handed out, so while the workers fall behind the files pile
+up on disk and not in memory. Files modified after their validation are
+validated again. If a worker dies, all files handed to the workers at that
+moment are reported as invalid and the workers are started again.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import collections
+from concurrent import futures
+import fnmatch
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from .batch import exit_on_sigterm, validate_file
+
+# The validator of the current worker.
+_VALIDATOR = None
+
+
+class FolderWatcher(object):
+    """
+    Finds the complete files in a directory.
+
+    :param directory: The watched directory.
+    :param pattern: Glob pattern of the files.
+    :param recursive: Also watch all subdirectories.
+    :param settle: Number of seconds the size and modification time of a
+        file must not change before it counts as complete.
+    """
+    def __init__(self, directory, pattern="*.h5", recursive=False,
+                 settle=2.0):
+        self.directory = directory
+        self.pattern = pattern
+        self.recursive = recursive
+        self.settle = settle
+        # Path -> [(size, mtime), time of the last change].
+        self._candidates = {}
+        # Path -> (size, mtime) when it was found to be complete.
+        self._complete = {}
+
+    def _scan(self):
+        for root, dirs, files in os.walk(self.directory):
+            if not self.recursive:
+                dirs[:] = []
+            dirs.sort()
+            for name in sorted(fnmatch.filter(files, self.pattern)):
+                filename = os.path.join(root, name)
+                try:
+                    stat = os.stat(filename)
+                except OSError:
+                    # Removed in the meanwhile.
+                    continue
+                yield filename, (stat.st_size, stat.st_mtime_ns)
+
+    def poll(self, now=None):
+        """
+        Scan the directory once.
+
+        Returns a list of ``(filename, time)`` tuples of all files that
+        became complete since the last call, ``time`` being the moment they
+        were found to be complete.
+        """
+        now = time.time() if now is None else now
+        found = set()
+        complete = []
+        for filename, identity in self._scan():
+            found.add(filename)
+            # Empty files are not even started.
+            if not identity[0] or self._complete.get(filename) == identity:
+                continue
+            candidate = self._candidates.get(filename)
+            if candidate is None or candidate[0] != identity:
+                self._candidates[filename] = [identity, now]
+            elif now - candidate[1] >= self.settle:
+                del self._candidates[filename]
+                self._complete[filename] = identity
+                complete.append((filename, now))
+
+        # Forget files that have been moved away.
+        for files in (self._candidates, self._complete):
+            for filename in set(files) - found:
+                del files[filename]
+        return complete
+
+
+def _init_worker(kwargs):
+    global _VALIDATOR
+    from .validator import Validator
+
+    _VALIDATOR = Validator(**kwargs)
+    _VALIDATOR.warm_up()
+
+
+def _ready():
+    pass
+
+
+def _validate(filename):
+    return validate_file(filename, validator=_VALIDATOR)
+
+
+def watch(directory, output, pattern="*.h5", recursive=False, interval=1.0,
+          settle=2.0, workers=None, max_queue=100, max_files=None,
+          **kwargs):
+    """
+    Validate all files arriving in a directory until interrupted and write
+    one JSON document per line to ``output``.
+
+    Returns the exit code - 0 if all files were valid, 1 otherwise.
+
+    :param interval: Seconds between two scans of the directory.
+    :param settle: See :class:`FolderWatcher`.
+    :param workers: The number of worker processes. Defaults to the number
+        of CPUs, ``1`` validates all files in a thread of the current
+        process.
+    :param max_queue: Number of complete files handed to the workers in
+        addition to the ones being validated.
+    :param max_files: Stop after this many files.
+
+    All other keyword arguments are passed to
+    :class:`~asdf_validate.validator.Validator`.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    watcher = FolderWatcher(directory, pattern=pattern, recursive=recursive,
+                            settle=settle)
+
+    def start():
+        if workers == 1:
+            pool = futures.ThreadPoolExecutor(
+                max_workers=1, initializer=_init_worker, initargs=(kwargs,))
+        else:
+            pool = futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker,
+                initargs=(kwargs,))
+        # Start and warm up the workers before the first file arrives.
+        futures.wait([pool.submit(_ready) for _ in range(workers)])
+        return pool
+
+    waiting = collections.deque()
+    # Future -> (filename, time the file was found to be complete).
+    running = {}
+    total = 0
+    invalid = 0
+    # Set once a worker died - all files it had are lost.
+    broken = []
+
+    def write(future):
+        filename, found = running.pop(future)
+        try:
+            result = future.result()
+        except futures.BrokenExecutor as e:
+            # E.g. a crash of the HDF5 library or the out of memory killer.
+            broken.append(e)
+            result = {"filename": filename, "valid": False, "findings": [],
+                      "message": "%s: %s" % (e.__class__.__name__, e),
+                      "warnings": [],
+                      "duration": round(time.time() - found, 6)}
+        result["latency"] = round(time.time() - found, 6)
+        output.write(json.dumps(result, sort_keys=True) + "\n")
+        output.flush()
+        return result["valid"]
+
+    pool = start()
+
+    with exit_on_sigterm():
+        try:
+            while max_files is None or total < max_files:
+                if not waiting:
+                    waiting.extend(watcher.poll())
+                while waiting and not broken and \
+                        len(running) < workers + max_queue:
+                    filename, found = waiting.popleft()
+                    running[pool.submit(_validate, filename)] = \
+                        (filename, found)
+
+                if not running:
+                    time.sleep(interval)
+                    continue
+                # Wake up for the next scan unless the workers are busy.
+                done, _ = futures.wait(
+                    running, return_when=futures.FIRST_COMPLETED,
+                    timeout=None if waiting else interval)
+                for future in done:
+                    total += 1
+                    if not write(future):
+                        invalid += 1
+                # A broken pool takes no more files - replace it once all of
+                # its files have been reported as failed.
+                if broken and not running:
+                    del broken[:]
+                    pool.shutdown(wait=True)
+                    pool = start()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            # Finish the files that are already being validated.
+            for future in list(running):
+                if future.cancel():
+                    del running[future]
+            for future in futures.as_completed(list(running)):
+                total += 1
+                if not write(future):
+                    invalid += 1
+            pool.shutdown(wait=True)
+
+    sys.stderr.write("%i of %i files are valid ASDF files.\n" % (
+        total - invalid, total))
+    return 1 if invalid else 0
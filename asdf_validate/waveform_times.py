@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Consistency checks of the times of waveform data sets.
+
+The names of waveform data sets contain their start and end times which have
+to agree with the ``starttime`` and ``sampling_rate`` attributes and the
+length of the data. Large files contain millions of waveforms so all of them
+are checked at once with NumPy arrays.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from calendar import timegm
+import time
+
+import numpy as np
+
+# Length of a time without fractional seconds, e.g. 2014-01-01T00:00:00.
+_TIME_LENGTH = 19
+
+
+def _parse_time(value):
+    return timegm(time.strptime(value + "GMT", "%Y-%m-%dT%H:%M:%S%Z"))
+
+
+def _parse_fraction(value):
+    """
+    Nanoseconds of the fractional seconds following a time, e.g. ``.25``.
+    """
+    if not value.startswith("."):
+        return 0
+    digits = value[1:10]
+    return int(digits.ljust(9, "0")) if digits.isdigit() else 0
+
+
+def parse_name_times(names):
+    """
+    Get the start and end times encoded in the names of waveform data sets.
+
+    Returns two int64 arrays with the times in nanoseconds since the epoch.
+    Fractional seconds are kept up to nanosecond precision.
+    """
+    parts = [_i.split("__") for _i in names]
+    values = [_i[1] for _i in parts] + [_i[2] for _i in parts]
+    times = np.array([_i[:_TIME_LENGTH] for _i in values],
+                     dtype="U%i" % _TIME_LENGTH)
+    try:
+        seconds = times.astype("datetime64[s]").astype(np.int64)
+    except ValueError:
+        # Leap seconds are allowed in the names but not supported by NumPy.
+        seconds = np.array([_parse_time(_i) for _i in times],
+                           dtype=np.int64)
+    nanoseconds = seconds * 10 ** 9 + np.array(
+        [_parse_fraction(_i[_TIME_LENGTH:]) for _i in values],
+        dtype=np.int64)
+    return nanoseconds[:len(parts)], nanoseconds[len(parts):]
+
+
+def check_times(names, npts, starttimes, sampling_rates, tolerance=1.0):
+    """
+    Compare the times in the names of waveform data sets to their actual
+    times.
+
+    :param names: The names of the data sets.
+    :param npts: The number of samples of each data set.
+    :param starttimes: The ``starttime`` attributes in nanoseconds.
+    :param sampling_rates: The ``sampling_rate`` attributes.
+    :param tolerance: Allowed difference in seconds.
+
+    Returns two boolean arrays marking the data sets with diverging start
+    and end times and two arrays with the actual start and end times in
+    seconds since the epoch.
+    """
+    starttimes_in_name, endtimes_in_name = parse_name_times(names)
+    starttimes = np.asarray(starttimes, dtype=np.float64) / 1E9
+    endtimes = starttimes + (np.asarray(npts, dtype=np.float64) - 1) / \
+        np.asarray(sampling_rates, dtype=np.float64)
+    return (np.abs(starttimes_in_name / 1E9 - starttimes) > tolerance,
+            np.abs(endtimes_in_name / 1E9 - endtimes) > tolerance,
+            starttimes, endtimes)
+
+
+def check_lengths(names, npts, starttimes, sampling_rates):
+    """
+    Check that the number of samples of waveform data sets matches the end
+    times in their names. The actual end time must be within half a sample
+    interval of the end time in the name.
+
+    Parameters as for :func:`check_times`. Returns a boolean array marking
+    the data sets with a wrong number of samples and an array with their
+    actual end times in seconds since the epoch.
+    """
+    _, endtimes_in_name = parse_name_times(names)
+    # All in nanoseconds - floating point seconds since the epoch are not
+    # precise enough for high sampling rates.
+    delta = 1E9 / np.asarray(sampling_rates, dtype=np.float64)
+    endtimes = np.asarray(starttimes, dtype=np.int64) + np.round(
+        (np.asarray(npts, dtype=np.int64) - 1) * delta).astype(np.int64)
+    return (np.abs(endtimes - endtimes_in_name) > delta / 2,
+            endtimes / 1E9)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Validation of the XML documents embedded in ASDF files.
+
+Many files contain identical documents, e.g. the same StationXML in all
+files of an archive. Results are thus memoized by the content of the
+documents and every distinct document is only validated once per process.
+
+All StationXML and provenance documents are independent of each other so
+they can be validated concurrently. lxml releases the GIL while validating
+thus a thread pool already scales; a process pool is available for the
+parts of the provenance validation that are pure Python.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from concurrent import futures
+import io
+
+from .backends import get_backend
+from .cache import ResultMemo, checksum, get_cache
+from .schema_registry import get_registry
+
+# Names of the executor classes - only looked up when used as the process
+# pool pulls in multiprocessing.
+EXECUTORS = {
+    "thread": "ThreadPoolExecutor",
+    "process": "ProcessPoolExecutor"
+}
+
+
+def _validate_with_schema(data, schema_context):
+    from lxml import etree
+
+    try:
+        xmldoc = etree.parse(io.BytesIO(data))
+    except etree.XMLSyntaxError as e:
+        # Return it like the other errors - lxml exceptions cannot be passed
+        # between processes.
+        return ["Could not parse document: %s" % e]
+    with schema_context as schema:
+        if schema.validate(xmldoc):
+            return []
+        return ["%s" % _i for _i in schema.error_log]
+
+
+def validate_quakeml(data, registry):
+    """
+    Validate a QuakeML document. Returns a list of errors which is empty
+    for valid documents.
+    """
+    return _validate_with_schema(data, registry.quakeml_schema())
+
+
+def validate_stationxml(data, registry):
+    """
+    Validate a StationXML document. Returns a list of errors which is empty
+    for valid documents.
+    """
+    return _validate_with_schema(data, registry.stationxml_schema())
+
+
+def validate_provenance(data, registry=None):
+    """
+    Validate a SEIS-PROV document. Returns a list of errors which is empty
+    for valid documents.
+    """
+    # Only needed for files with provenance information.
+    import seis_prov_validate
+
+    result = seis_prov_validate.validate(io.BytesIO(data))
+    if result.is_valid:
+        return []
+    return list(result.errors)
+
+
+VALIDATORS = {
+    "QuakeML": validate_quakeml,
+    "StationXML": validate_stationxml,
+    "Provenance": validate_provenance
+}
+
+
+# Results of all documents validated in this process by their content.
+_RESULTS = ResultMemo(max_entries=10000)
+
+
+def _validate_document(kind, data, registry, cache=None):
+    """
+    Validate a document only if no document with the same content has been
+    validated before.
+    """
+    key = "xml|%s|%s" % (kind, checksum(data))
+
+    def _validate():
+        errors = cache.get(key) if cache is not None else None
+        if errors is None:
+            errors = VALIDATORS[kind](data, registry)
+            if cache is not None:
+                cache.set(key, errors)
+        return errors
+
+    return _RESULTS.get_or_compute(key, _validate)
+
+
+def _validate_dataset(kind, backend, filename, path, registry, cache=None):
+    return _validate_document(kind, backend.read_array(filename, path),
+                              registry, cache=cache)
+
+
+def _validate_dataset_in_process(task):
+    kind, backend, filename, path, schema_cache, cache = task
+    return _validate_dataset(kind, get_backend(backend), filename, path,
+                             get_registry(schema_cache),
+                             get_cache(*cache) if cache else None)
+
+
+def validate_datasets(kind, filename, paths, backend, registry, workers=1,
+                      executor="thread", cache=None):
+    """
+    Validate XML documents stored in datasets of an HDF5 file.
+
+    With more than one worker all documents are submitted right away and
+    validated in the background while the caller continues. The returned
+    iterator yields ``(path, errors)`` tuples in the order of ``paths`` -
+    independent of the number of workers. Its ``close()`` method cancels
+    all validations that did not start yet and waits for the running ones.
+
+    :param kind: ``"QuakeML"``, ``"StationXML"``, or ``"Provenance"``.
+    :param workers: The number of concurrent validations.
+    :param executor: ``"thread"`` or ``"process"``.
+    :param cache: Optional :class:`~asdf_validate.cache.ValidationCache`
+        to reuse the results of unchanged documents.
+    """
+    paths = list(paths)
+    if workers <= 1 or len(paths) <= 1:
+        return ((_i, _validate_dataset(kind, backend, filename, _i, registry,
+                                       cache)) for _i in paths)
+
+    pool = getattr(futures, EXECUTORS[executor])(max_workers=workers)
+    if executor == "process":
+        cache_args = (cache.cache_dir, cache.max_size) if cache else None
+        jobs = [pool.submit(_validate_dataset_in_process, (
+            kind, backend.name, filename, _i, registry.cache_dir, cache_args))
+            for _i in paths]
+    else:
+        jobs = [pool.submit(_validate_dataset, kind, backend, filename, _i,
+                            registry, cache) for _i in paths]
+    return _Results(pool, paths, jobs)
+
+
+class _Results(object):
+    """
+    Iterator over the results of the documents submitted to a pool.
+    """
+    def __init__(self, pool, paths, jobs):
+        self._pool = pool
+        self._jobs = list(zip(paths, jobs))
+        self._index = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._index >= len(self._jobs):
+            self.close()
+            raise StopIteration
+        path, job = self._jobs[self._index]
+        self._index += 1
+        return path, job.result()
+
+    def close(self):
+        # Do not waste time on jobs nobody is interested in anymore.
+        for _, job in self._jobs:
+            job.cancel()
+        self._pool.shutdown(wait=True)
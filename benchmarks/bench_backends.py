@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare the timings of the h5dump and the h5py backends.
+
+Requires ``h5py`` - the h5dump backend is only timed if ``h5dump`` and
+``h5ls`` are in the PATH.
+
+    $ python benchmarks/bench_backends.py
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import argparse
+import os
+import shutil
+import tempfile
+import timeit
+
+from asdf_validate.backends import get_backend
+from asdf_validate.synthetic import write_synthetic_asdf
+
+
+def _operations(backend, filename, tmpdir):
+    output = os.path.join(tmpdir, "%s.xml" % backend.name)
+    return [
+        ("is_hdf5_file", lambda: backend.is_hdf5_file(filename)),
+        ("get_header_as_dict", lambda: backend.get_header_as_dict(filename)),
+        ("get_attributes",
+         lambda: backend.get_attributes(filename, ["/Waveforms"])),
+        ("dump_array_to_file",
+         lambda: backend.dump_array_to_file(filename, "/QuakeML", output))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stations", type=int, nargs="+",
+                        default=[10, 100, 1000])
+    parser.add_argument("--traces-per-station", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    backends = [get_backend("h5py")]
+    if shutil.which("h5dump") and shutil.which("h5ls"):
+        backends.insert(0, get_backend("h5dump"))
+    else:
+        print("h5dump/h5ls not found - only timing the h5py backend.")
+
+    tmpdir = tempfile.mkdtemp(prefix="tmp_asdf_validate_bench_")
+    cwd = os.getcwd()
+    try:
+        os.chdir(tmpdir)
+        print("%10s %20s %s" % ("stations", "operation", " ".join(
+            "%12s" % ("%s [s]" % _i.name) for _i in backends)))
+        for stations in args.stations:
+            filename = os.path.join(tmpdir, "bench_%i.h5" % stations)
+            write_synthetic_asdf(filename, stations=stations,
+                                 traces=args.traces_per_station)
+            timings = [_operations(_i, filename, tmpdir) for _i in backends]
+            for ops in zip(*timings):
+                times = [min(timeit.repeat(_i[1], number=1,
+                                           repeat=args.repeat))
+                         for _i in ops]
+                print("%10i %20s %s" % (stations, ops[0][0], " ".join(
+                    "%12.4f" % _i for _i in times)))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
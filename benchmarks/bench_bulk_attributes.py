@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark reading the waveform attributes with a single h5dump call versus
+one h5dump call per attribute.
+
+Requires ``h5dump`` in the PATH and ``h5py`` to generate the files.
+
+    $ python benchmarks/bench_bulk_attributes.py
+
+The time per trace of the bulk reader should stay constant with a growing
+number of traces, i.e. it scales linearly.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import argparse
+import os
+import shutil
+import tempfile
+import timeit
+
+from asdf_validate.h5dump_wrapper import (get_attributes,
+                                          get_float_attribute,
+                                          get_string_attribute)
+from asdf_validate.synthetic import write_synthetic_asdf
+
+
+def _per_attribute(filename, paths):
+    for path in paths:
+        get_float_attribute(filename, path + "/starttime")
+        get_float_attribute(filename, path + "/sampling_rate")
+        try:
+            get_string_attribute(filename, path + "/provenance_id")
+        except SystemExit:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--traces", type=int, nargs="+",
+                        default=[1000, 2000, 4000, 8000, 16000],
+                        help="Total number of traces per file.")
+    parser.add_argument("--traces-per-station", type=int, default=100)
+    parser.add_argument("--per-attribute-limit", type=int, default=2000,
+                        help="Only time the per-attribute reader up to this "
+                             "number of traces.")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="tmp_asdf_validate_bench_")
+    try:
+        print("%10s %14s %16s %18s" % (
+            "traces", "bulk [s]", "bulk/trace [us]", "single/trace [us]"))
+        for count in args.traces:
+            filename = os.path.join(tmpdir, "bench_%i.h5" % count)
+            stations = max(count // args.traces_per_station, 1)
+            write_synthetic_asdf(filename, stations=stations,
+                                 traces=count // stations)
+            count = stations * (count // stations)
+
+            bulk = min(timeit.repeat(
+                lambda: get_attributes(filename, ["/Waveforms"]),
+                number=1, repeat=args.repeat))
+
+            single = float("nan")
+            if count <= args.per_attribute_limit:
+                attributes = get_attributes(filename, ["/Waveforms"])
+                single = min(timeit.repeat(
+                    lambda: _per_attribute(filename, attributes.keys()),
+                    number=1, repeat=1))
+
+            print("%10i %14.3f %16.2f %18.2f" % (
+                count, bulk, bulk / count * 1E6, single / count * 1E6))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark all phases of the validation on synthetic files of different
+sizes and ASDF versions.
+
+Every case runs in its own process to measure its peak memory usage. The
+results are appended to a JSON history file in the cache directory of the
+validator and compared to the previous run with the same backend so
+regressions are easy to spot.
+
+    $ python benchmarks/bench_validation.py --regimes small medium
+    $ python benchmarks/bench_validation.py --fail-on-regression 20
+
+Requires ``h5py`` to generate the files.
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+# Stations, traces per station, auxiliary data sets, provenance documents.
+REGIMES = {
+    "tiny": (1, 1, 0, 0),
+    "small": (10, 10, 10, 2),
+    "medium": (100, 50, 100, 10),
+    "large": (500, 100, 1000, 50)
+}
+
+PHASES = ["is_hdf5_file", "header", "schema", "quakeml", "provenance",
+          "attributes", "objects", "stationxml", "total"]
+
+
+def _time_phases(filename, version, backend_name, repeat):
+    """
+    Time all phases of the validation of a single file.
+    """
+    from asdf_validate import validator, xml_validation
+    from asdf_validate.backends import get_backend
+    from asdf_validate.cache import ResultMemo
+    from asdf_validate.checks import AuxiliaryDataCheck, WaveformCheck, visit
+    from asdf_validate.report import ValidationReport
+    from asdf_validate.schema_registry import get_registry
+    from asdf_validate.schema_validation import get_schema_errors
+
+    backend = get_backend(backend_name)
+    registry = get_registry()
+    # Compile all schemas outside of the measurements.
+    registry.get_asdf_shard_validators(version)
+    for schema in (registry.quakeml_schema, registry.stationxml_schema):
+        with schema():
+            pass
+
+    header = backend.get_header_as_dict(filename)
+    groups = header.get("groups", {})
+    stations = sorted(groups.get("Waveforms", {}).get("groups", {}))
+    documents = sorted(groups.get("Provenance", {}).get("datasets", {}))
+    attributes = backend.get_attributes(
+        filename, ["/" + _i for _i in ("AuxiliaryData", "Waveforms")
+                   if _i in groups])
+    report = ValidationReport(filename)
+
+    def _provenance():
+        for doc in documents:
+            xml_validation.validate_provenance(
+                backend.read_array(filename, "/Provenance/" + doc))
+
+    def _stationxml():
+        for station in stations:
+            xml_validation.validate_stationxml(backend.read_array(
+                filename, "/Waveforms/%s/StationXML" % station), registry)
+
+    def _objects():
+        checks = [AuxiliaryDataCheck(report, filename, backend, attributes),
+                  WaveformCheck(report, filename, backend, attributes)]
+        visit(checks, aux_group=groups.get("AuxiliaryData", {}).get(
+            "groups", {}), wf=groups.get("Waveforms", {}).get("groups", {}))
+        for check in checks:
+            check.finish()
+
+    def _total():
+        # Results of identical documents are only reused within a run.
+        xml_validation._RESULTS = ResultMemo(
+            xml_validation._RESULTS.max_entries)
+        validator.Validator(backend=backend_name).validate(filename)
+
+    phases = {
+        "is_hdf5_file": lambda: backend.is_hdf5_file(filename),
+        "header": lambda: backend.get_header_as_dict(filename),
+        "schema": lambda: get_schema_errors(header, version, registry),
+        "quakeml": lambda: xml_validation.validate_quakeml(
+            backend.read_array(filename, "/QuakeML"), registry),
+        "provenance": _provenance,
+        "attributes": lambda: backend.get_attributes(
+            filename, ["/" + _i for _i in ("AuxiliaryData", "Waveforms")
+                       if _i in groups]),
+        "objects": _objects,
+        "stationxml": _stationxml,
+        "total": _total
+    }
+    if documents:
+        try:
+            import seis_prov_validate  # NOQA
+        except ImportError:
+            del phases["provenance"]
+            del phases["total"]
+
+    timings = {}
+    for name in PHASES:
+        if name not in phases:
+            timings[name] = None
+            continue
+        timings[name] = min(timeit.repeat(phases[name], number=1,
+                                          repeat=repeat))
+    return timings
+
+
+def _run_case(case):
+    """
+    Run a single case - called in a fresh process.
+    """
+    timings = _time_phases(case["filename"], case["version"],
+                           case["backend"], case["repeat"])
+    # Kilobytes on Linux, bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024.0
+    return {"phases": timings, "peak_rss_mb": round(peak / 1024.0, 1)}
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _load_history(filename):
+    if not os.path.exists(filename):
+        return []
+    with io.open(filename, "rt") as fh:
+        return json.load(fh)
+
+
+def _compare(run, previous, threshold):
+    """
+    Print the ratios to the previous run and return the regressions.
+    """
+    previous = dict(((_i["name"], _i["version"]), _i)
+                    for _i in previous["cases"])
+    regressions = []
+    for case in run["cases"]:
+        old = previous.get((case["name"], case["version"]))
+        if old is None:
+            continue
+        ratios = []
+        for phase in PHASES + ["peak_rss_mb"]:
+            if phase == "peak_rss_mb":
+                new_value, old_value = case[phase], old[phase]
+            else:
+                new_value = case["phases"].get(phase)
+                old_value = old["phases"].get(phase)
+            if not new_value or not old_value:
+                continue
+            ratio = new_value / old_value
+            ratios.append("%s %.2fx" % (phase, ratio))
+            # Ignore noise in very short phases.
+            if ratio > 1.0 + threshold / 100.0 and (
+                    phase == "peak_rss_mb" or new_value > 1E-2):
+                regressions.append("%s %s %s: %.2fx" % (
+                    case["name"], case["version"], phase, ratio))
+        print("%-8s %-6s %s" % (case["name"], case["version"],
+                                ", ".join(ratios)))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--regimes", nargs="+", choices=sorted(REGIMES),
+                        default=["tiny", "small", "medium"])
+    parser.add_argument("--versions", nargs="+",
+                        default=["1.0.0", "1.0.1", "1.0.2", "1.0.3"])
+    parser.add_argument("--backend", default="h5dump")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--data-dir",
+                        help="Keep the generated files in this directory "
+                             "and reuse them in later runs.")
+    parser.add_argument("--history",
+                        help="JSON file the results are appended to. "
+                             "Defaults to 'benchmark_history.json' in the "
+                             "cache directory of the validator.")
+    parser.add_argument("--fail-on-regression", type=float, metavar="PCT",
+                        help="Exit with a non-zero code if any phase is "
+                             "more than PCT percent slower than in the "
+                             "previous run.")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(_run_case(json.loads(args.run_case))))
+        return
+
+    from asdf_validate.synthetic import write_synthetic_asdf
+
+    data_dir = args.data_dir or tempfile.mkdtemp(
+        prefix="tmp_asdf_validate_bench_")
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+
+    run = {"date": datetime.datetime.utcnow().isoformat(),
+           "commit": _git_commit(),
+           "python": platform.python_version(),
+           "platform": platform.platform(),
+           "backend": args.backend,
+           "cases": []}
+    try:
+        print("%-8s %-6s %s" % ("regime", "version", " ".join(
+            "%14s" % _i for _i in PHASES + ["peak MB"])))
+        for name in args.regimes:
+            stations, traces, aux_data, provenance = REGIMES[name]
+            for version in args.versions:
+                filename = os.path.join(data_dir, "%s_%s.h5" % (
+                    name, version))
+                if not os.path.exists(filename):
+                    write_synthetic_asdf(
+                        filename, stations=stations, traces=traces,
+                        version=version, aux_data=aux_data,
+                        provenance=provenance)
+                output = subprocess.check_output([
+                    sys.executable, os.path.abspath(__file__),
+                    "--run-case", json.dumps({
+                        "filename": filename, "version": version,
+                        "backend": args.backend, "repeat": args.repeat})])
+                case = json.loads(output.decode().strip().splitlines()[-1])
+                case.update({"name": name, "version": version,
+                             "stations": stations, "traces": traces,
+                             "aux_data": aux_data, "provenance": provenance})
+                run["cases"].append(case)
+                print("%-8s %-6s %s %14.1f" % (name, version, " ".join(
+                    "%14s" % ("-" if case["phases"][_i] is None else
+                              "%.4f" % case["phases"][_i])
+                    for _i in PHASES), case["peak_rss_mb"]))
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir)
+
+    if not args.history:
+        from asdf_validate.cache import default_cache_dir
+
+        # Outside of the source tree so it is never committed by accident.
+        cache_dir = default_cache_dir()
+        os.makedirs(cache_dir, exist_ok=True)
+        args.history = os.path.join(cache_dir, "benchmark_history.json")
+    history = _load_history(args.history)
+    previous = [_i for _i in history if _i["backend"] == args.backend]
+    history.append(run)
+    with io.open(args.history, "wt") as fh:
+        json.dump(history, fh, indent=1, sort_keys=True)
+
+    if not previous:
+        return
+    print("\nCompared to the run from %s (%s):" % (
+        previous[-1]["date"], previous[-1]["commit"]))
+    regressions = _compare(run, previous[-1],
+                           threshold=args.fail_on_regression or 0.0)
+    if args.fail_on_regression is not None and regressions:
+        print("\nRegressions:\n\t%s" % "\n\t".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark the vectorized waveform time check versus parsing the times of
+every waveform name on its own.
+
+Works on in-memory names and attributes so no files are needed.
+
+    $ python benchmarks/bench_waveform_times.py
+
+:copyright:
+    Lion Krischer (lion.krischer@gmail.com), 2015-2019
+:license:
+    BSD 3-Clause ("BSD New" or "BSD Simplified")
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import argparse
+from calendar import timegm
+import datetime
+import re
+import time
+import timeit
+
+from asdf_validate.waveform_times import check_times
+
+
+def _per_name(names, npts, starttimes, sampling_rates, tolerance=1.0):
+    """
+    The previous implementation checking one name at a time.
+    """
+    bad = []
+    for name, n, starttime_in_file, sampling_rate in zip(
+            names, npts, starttimes, sampling_rates):
+        starttime, endtime = name.split("__")[1:3]
+        starttime = re.sub(r"\.\d{9}", "", starttime)
+        endtime = re.sub(r"\.\d{9}", "", endtime)
+        starttime = timegm(time.strptime(starttime + "GMT",
+                                         "%Y-%m-%dT%H:%M:%S%Z"))
+        endtime = timegm(time.strptime(endtime + "GMT",
+                                       "%Y-%m-%dT%H:%M:%S%Z"))
+        starttime_in_file = starttime_in_file / 1E9
+        endtime_in_file = starttime_in_file + (n - 1) / sampling_rate
+        if abs(starttime - starttime_in_file) > tolerance or \
+                abs(endtime - endtime_in_file) > tolerance:
+            bad.append(name)
+    return bad
+
+
+def _make_traces(count):
+    start = datetime.datetime(2014, 1, 1)
+    names, npts, starttimes, sampling_rates = [], [], [], []
+    for i in range(count):
+        t = start + datetime.timedelta(seconds=i)
+        n = 100 + i % 1000
+        names.append("XX.S%04i..BHZ__%s.000000000__%s.000000000__raw" % (
+            i // 100, t.strftime("%Y-%m-%dT%H:%M:%S"),
+            (t + datetime.timedelta(seconds=n - 1)).strftime(
+                "%Y-%m-%dT%H:%M:%S")))
+        npts.append(n)
+        starttimes.append(timegm(t.timetuple()) * 10 ** 9)
+        sampling_rates.append(1.0)
+    return names, npts, starttimes, sampling_rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--traces", type=int, nargs="+",
+                        default=[100000, 1000000],
+                        help="Number of waveforms to check.")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print("%10s %14s %14s %10s" % (
+        "traces", "per name [s]", "vectorized [s]", "speedup"))
+    for count in args.traces:
+        traces = _make_traces(count)
+        # Make sure both implementations agree.
+        bad_start, bad_end, _, _ = check_times(*traces)
+        assert not (bad_start | bad_end).any()
+        assert not _per_name(*traces)
+
+        per_name = min(timeit.repeat(lambda: _per_name(*traces), number=1,
+                                     repeat=args.repeat))
+        vectorized = min(timeit.repeat(lambda: check_times(*traces),
+                                       number=1, repeat=args.repeat))
+        print("%10i %14.3f %14.3f %9.1fx" % (
+            count, per_name, vectorized, per_name / vectorized))
+
+
+if __name__ == "__main__":
+    main()